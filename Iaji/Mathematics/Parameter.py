@@ -14,6 +14,59 @@ from Iaji.Utilities import strutils
 print_separator = "-----------------------------------------------"
 _ACCEPTED_TYPES = ["scalar", "vector"]
 NUMBER_TYPES = [int, numpy.int64, float, numpy.float64, complex, numpy.complex64, numpy.complex128]
+# In[lazy name]
+class LazyName:
+    """
+    This class describes the name of the result of an operation, that is only
+    rendered into a string when it is needed.
+    It consists of:
+        - a template string, with one '%s' placeholder per operand
+        - the names of the operands (str or LazyName)
+    Names of long chains of operations are thus stored as a tree of small objects,
+    instead of as nested LateX strings.
+    """
+    __slots__ = ("_template", "_operands", "_rendered")
+    # ----------------------------------------------------------
+    def __init__(self, template, *operands):
+        self._template = template
+        self._operands = operands
+        self._rendered = None
+    # ----------------------------------------------------------
+    def __str__(self):
+        if self._rendered is None:
+            self._rendered = self._render()
+        return self._rendered
+    # ----------------------------------------------------------
+    def __repr__(self):
+        return self.__str__()
+    # ----------------------------------------------------------
+    def _render(self):
+        #Iterative rendering, so that arbitrarily long chains of operations
+        #do not hit the recursion limit
+        pieces = []
+        stack = [self]
+        while len(stack) > 0:
+            item = stack.pop()
+            if type(item) is not LazyName:
+                pieces.append(str(item))
+            elif item._rendered is not None:
+                pieces.append(item._rendered)
+            else:
+                parts = item._template.split("%s")
+                sequence = [parts[0]]
+                for operand, part in zip(item._operands, parts[1:]):
+                    sequence += [operand, part]
+                stack.extend(reversed(sequence))
+        return "".join(pieces)
+    # ----------------------------------------------------------
+    #A lazy name is immutable, so it can be shared by copies
+    def __copy__(self):
+        return self
+    def __deepcopy__(self, memo):
+        return self
+    # ----------------------------------------------------------
+    def __reduce__(self):
+        return (str, (self.__str__(),))
 # In[parameter]
 class Parameter:
     """
@@ -76,6 +129,10 @@ class Parameter:
     # ----------------------------------------------------------
     @property
     def symbolic(self):
+        #The symbolic part may have been deferred by a numeric-only Iaji Matrix operation
+        if getattr(self, "_symbolic_builder", None) is not None:
+            self._symbolic = self._symbolic_builder()
+            self._symbolic_builder = None
         return self._symbolic
     
     @symbolic.deleter
@@ -681,7 +738,9 @@ class ParameterNumeric:
     """
     # ----------------------------------------------------------
     def __init__(self, name="x", type="scalar", value=None):
-        self.symbol = sympy.symbols(names=name)
+        #The name and the symbol are only rendered when accessed
+        self._symbol = None
+        self._symbol_assumptions = {}
         self._name = name
         self.type = type
         self.value_changed = Signal()
@@ -703,17 +762,23 @@ class ParameterNumeric:
     # ----------------------------------------------------------
     @property
     def name(self):
+        if type(self._name) is LazyName:
+            self._name = self._name.__str__()
         return self._name
     @name.setter
     def name(self, name):
         self._name = name
-        self._symbol = sympy.symbols(names=name, real=self.symbol.is_real, nonnegative=self.symbol.is_nonnegative)
+        if self._symbol is not None:
+            self._symbol_assumptions = {"real": self._symbol.is_real, "nonnegative": self._symbol.is_nonnegative}
+            self._symbol = None
     @name.deleter
     def name(self):
         del self._name
     # ----------------------------------------------------------
     @property
     def symbol(self):
+        if self._symbol is None:
+            self._symbol = sympy.symbols(names=self.name, **self._symbol_assumptions)
         return self._symbol
 
     @symbol.setter
@@ -757,7 +822,7 @@ class ParameterNumeric:
     # ----------------------------------------------------------
     def __add__(self, other):
         other_temp = self.prepare_other(other)
-        name = "\\left(%s+%s\\right)"%(self.name, other_temp.name)
+        name = LazyName("\\left(%s+%s\\right)", self._name, other_temp._name)
         x = ParameterNumeric(name=name)
         self_value = self.value
         other_value = other_temp.value
@@ -769,7 +834,7 @@ class ParameterNumeric:
     # ----------------------------------------------------------
     def __sub__(self, other):
         other_temp = self.prepare_other(other)
-        name = "\\left(%s-%s\\right)"%(self.name, other_temp.name)
+        name = LazyName("\\left(%s-%s\\right)", self._name, other_temp._name)
         x = ParameterNumeric(name=name)
         self_value = self.value
         other_value = other_temp.value
@@ -782,7 +847,7 @@ class ParameterNumeric:
     #Elementwise multiplication
     def __mul__(self, other):
         other_temp = self.prepare_other(other)
-        name = "%s*%s"%(self.name, other_temp.name)
+        name = LazyName("%s*%s", self._name, other_temp._name)
         x = ParameterNumeric(name=name)
         self_value = self.value
         other_value = other_temp.value
@@ -798,7 +863,7 @@ class ParameterNumeric:
         Elementwise division
         """
         other_temp = self.prepare_other(other)
-        name = "\\frac{%s}{%s}"%(self.name, other_temp.name)
+        name = LazyName("\\frac{%s}{%s}", self._name, other_temp._name)
         x = ParameterNumeric(name=name)
         self_value = self.value
         other_value = other_temp.value
@@ -812,7 +877,7 @@ class ParameterNumeric:
         """
         Power
         """
-        name = "\\left(%s\\right)^{%.1f}"%(self.name, y)
+        name = LazyName("\\left(%%s\\right)^{%.1f}"%y, self._name)
         x = ParameterNumeric(name=name, type=self.type)
         x.value = self.value
         if self.type == "scalar":
@@ -825,7 +890,7 @@ class ParameterNumeric:
         """
         Power
         """
-        name = "\\left|%s\\right|"%self.name
+        name = LazyName("\\left|%s\\right|", self._name)
         x = ParameterNumeric(name=name, type=self.type)
         x.value = self.value
         if self.type == "scalar":
@@ -838,7 +903,7 @@ class ParameterNumeric:
         """
         Complex conjugate
         """
-        name = "\\left(%s\\right)^*"%self.name
+        name = LazyName("\\left(%s\\right)^*", self._name)
         x = ParameterNumeric(name=name)
         if self.value is None:
             raise TypeError("unsupported operand type for Conjugate: %s" % (type(self.value)))
@@ -850,7 +915,7 @@ class ParameterNumeric:
         """
         Complex argument
         """
-        name = "arg\\left(%s\\right)"%self.name
+        name = LazyName("arg\\left(%s\\right)", self._name)
         x = ParameterNumeric(name=name)
         if self.value is None:
             raise TypeError("unsupported operand type for Conjugate: %s" % (type(self.value)))
@@ -862,7 +927,7 @@ class ParameterNumeric:
         """
         cosine
         """
-        name = "e^{%s}"%self.name
+        name = LazyName("e^{%s}", self._name)
         x = ParameterNumeric(name=name)
         if self.value is None:
             raise TypeError("unsupported operand type for Exp: %s" % (type(self.value)))
@@ -874,7 +939,7 @@ class ParameterNumeric:
         """
         cosine
         """
-        name = "\\cos\\left(%s\\right)"%self.name
+        name = LazyName("\\cos\\left(%s\\right)", self._name)
         x = ((self*1j).Exp() + (self*(-1j)).Exp())/2
         x.name = name
         return x
@@ -883,7 +948,7 @@ class ParameterNumeric:
         """
         arc cosine
         """
-        name = "\\arccos\\left(%s\\right)"%self.name
+        name = LazyName("\\arccos\\left(%s\\right)", self._name)
         x = ParameterNumeric(name=name)
         x.value = numpy.acos(x)
         return x
@@ -892,7 +957,7 @@ class ParameterNumeric:
         """
         sine
         """
-        name = "\\sin\\left(%s\\right)"%self.name
+        name = LazyName("\\sin\\left(%s\\right)", self._name)
         x = ParameterNumeric(name=name)
         x = ((self*1j).Exp() - (self*(-1j)).Exp())/(2j)
         x.name = name
@@ -902,7 +967,7 @@ class ParameterNumeric:
         """
         arc sine
         """
-        name = "\\arcsin\\left(%s\\right)"%self.name
+        name = LazyName("\\arcsin\\left(%s\\right)", self._name)
         x = ParameterNumeric(name=name)
         x.value = numpy.asin(x)
         return x
@@ -911,7 +976,7 @@ class ParameterNumeric:
         """
         tangent
         """
-        name = "\\tan\\left(%s\\right)"%self.name
+        name = LazyName("\\tan\\left(%s\\right)", self._name)
         x = ParameterNumeric(name=name)
         x = self.Sin()/self.Cos()
         x.name = name
@@ -921,7 +986,7 @@ class ParameterNumeric:
         """
         hyperbolic cosine
         """
-        name = "\\cosh\\left(%s\\right)"%self.name
+        name = LazyName("\\cosh\\left(%s\\right)", self._name)
         x = ParameterNumeric(name=name)
         x = (self.Exp() + self.Exp())/(2)
         x.name = name
@@ -931,7 +996,7 @@ class ParameterNumeric:
         """
         hyperbolic sine
         """
-        name = "\\sinh\\left(%s\\right)"%self.name
+        name = LazyName("\\sinh\\left(%s\\right)", self._name)
         x = ParameterNumeric(name=name)
         x = (self.Exp() - self.Exp())/(2)
         x.name = name
@@ -941,7 +1006,7 @@ class ParameterNumeric:
         """
         hyperbolic tangent
         """
-        name = "\\tanh\\left(%s\\right)"%self.name
+        name = LazyName("\\tanh\\left(%s\\right)", self._name)
         x = ParameterNumeric(name=name)
         x = self.Sinh()/self.Cosh()
         x.name = name
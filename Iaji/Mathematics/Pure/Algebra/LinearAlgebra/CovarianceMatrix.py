@@ -2,7 +2,7 @@
 This module describes a covariance matrix
 """
 # In[]:
-from Iaji.Mathematics.Pure.Algebra.LinearAlgebra.Matrix import MatrixSymbolic, MatrixNumeric, Matrix
+from Iaji.Mathematics.Pure.Algebra.LinearAlgebra.Matrix import MatrixSymbolic, MatrixNumeric, Matrix, ACCEPTED_DTYPES
 from .Exceptions import TestFailedError, TestFailedWarning, InconsistentShapeError
 from Iaji.Mathematics.Parameter import Parameter, ParameterSymbolic, ParameterNumeric
 import numpy, sympy
@@ -117,8 +117,21 @@ class CovarianceMatrixNumeric(MatrixNumeric):
     This class describes a numerical covariance matrix.
     """
     # ----------------------------------------------------------
-    def __init__(self, name="Sigma", value=None):
-        super().__init__(name=name, value=value)
+    def __init__(self, name="Sigma", value=None, dtype=None, copy=None):
+        """
+        INPUTS
+        ----------
+            dtype : type in ACCEPTED_DTYPES
+                Data type used to store the value. If None, the data type of the input value 
+                is kept if it is accepted, and numpy.float64 is used otherwise.
+            
+            See MatrixNumeric for the other inputs.
+        """
+        if dtype is None:
+            dtype = value.dtype if hasattr(value, "dtype") else numpy.asarray(value).dtype
+            if numpy.dtype(dtype) not in [numpy.dtype(t) for t in ACCEPTED_DTYPES]:
+                dtype = numpy.float64
+        super().__init__(name=name, value=value, dtype=dtype, copy=copy)
     # ----------------------------------------------------------
     # ----------------------------------------------------------
     @property
@@ -128,20 +141,19 @@ class CovarianceMatrixNumeric(MatrixNumeric):
     @value.setter
     def value(self, value):
         if value is not None:
-            self._value = numpy.matrix(value)
+            self._value = self._prepare_value(value)
             self._shape = self._value.shape
+            self._clearCache()
             if not self.isCovarianceMatrix()[0]:
                 error_message = "Value of matrix "+self.name.__str__()+" does not represent a covariance matrix. \n"+self.__str__()
                 self._value = None
                 self._shape = None
-                self._eigenvalues, self._rank, self._trace, self._determinant = [None for j in range(4)]
+                self._clearCache()
                 raise TypeError(error_message)
         else:
             self._value = None
             self._shape = None
-        self._eigenvalues, self._rank  = [None for j in range(2)]
-        self._trace = ParameterNumeric(name="Tr\\left(%s\\right)"%self.name)
-        self._determinant = ParameterNumeric(name="\\left|%s\\right|"%self.name)
+        self._clearCache()
         self.value_changed.emit()  # emit value changed signal
 
     @value.deleter
@@ -116,8 +116,8 @@ class DensityMatrixNumeric(MatrixNumeric):
     This class describes a numerical density matrix.
     """
     # ----------------------------------------------------------
-    def __init__(self, name="Rho", value=None):
-        super().__init__(name=name, value=value)
+    def __init__(self, name="Rho", value=None, dtype=numpy.complex128, copy=None):
+        super().__init__(name=name, value=value, dtype=dtype, copy=copy)
     # ----------------------------------------------------------
     # ----------------------------------------------------------
     @property
@@ -127,20 +127,19 @@ class DensityMatrixNumeric(MatrixNumeric):
     @value.setter
     def value(self, value):
         if value is not None:
-            self._value = numpy.matrix(value)
+            self._value = self._prepare_value(value)
             self._shape = self._value.shape
+            self._clearCache()
             if not self.isDensityMatrix()[0]:
                 error_message = "Value of matrix "+self.name.__str__()+" cannot represent a density matrix\n"+self.isDensityMatrix()[1].__str__()
                 self._value = None
                 self._shape = None
-                self._eigenvalues, self._rank, self._trace, self._determinant = [None for j in range(4)]
+                self._clearCache()
                 raise TypeError(error_message)
         else:
             self._value = None
             self._shape = None
-        self._eigenvalues, self._rank  = [None for j in range(2)]
-        self._trace = ParameterNumeric(name="Tr\\left(%s\\right)"%self.name)
-        self._determinant = ParameterNumeric(name="\\left|%s\\right|"%self.name)
+        self._clearCache()
         self.value_changed.emit()  # emit value changed signal
 
     @value.deleter
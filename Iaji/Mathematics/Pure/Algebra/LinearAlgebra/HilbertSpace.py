@@ -3,7 +3,7 @@ This module describes a HilberSpace
 """
 #%%
 import sympy, numpy
-from Iaji.Mathematics.Pure.Algebra.LinearAlgebra.Matrix import Matrix
+from Iaji.Mathematics.Pure.Algebra.LinearAlgebra.Matrix import Matrix, MatrixSymbolic
 from Iaji.Mathematics.Parameter import Parameter, ParameterSymbolic, ParameterNumeric
 from Iaji.Utilities import strutils
 #%%
@@ -11,6 +11,16 @@ print_separator = "---------------------------------------------------------"
 ACCEPTED_TYPES = {sympy.sets.fancysets.Reals, sympy.sets.fancysets.Complexes}
 NUMBER_TYPES = [int, numpy.int64, float, numpy.float64, complex, numpy.complex64, numpy.complex128]
 #%%
+def canonicalBasisColumn(dimension, n):
+    """
+    Returns the n-th canonical basis vector of a space with the input dimension, 
+    as a read-only complex column of shape (dimension, 1)
+    """
+    column = numpy.zeros((dimension, 1), dtype=complex)
+    column[n] = 1
+    column.setflags(write=False)
+    return column
+#%%
 class HilbertSpace:
     """
     This class describes a Hilbert space on the field of complex numbers.
@@ -102,6 +112,8 @@ class HilbertSpace:
     # ---------------------------------------------------------------
     @property
     def canonical_basis(self):
+        if getattr(self, "_canonical_basis", None) is None:
+            self.CanonicalBasis()
         return self._canonical_basis
 
     @canonical_basis.deleter
@@ -120,16 +132,11 @@ class HilbertSpace:
     def CanonicalBasis(self):
         """
         Sets and returns the canonical basis.
+        The numeric basis vectors are read-only columns, and their symbolic 
+        expressions are only built when requested.
         """
         if self.isFiniteDimensional():
-            self._canonical_basis = [None for j in range(self.dimension)]
-            for j in range(self.dimension):
-                expression = sympy.zeros(*(self.dimension, 1))
-                expression[j] = 1
-                self._canonical_basis[j] = Matrix(name="e_{"+(j+1).__str__()+"}")
-                self._canonical_basis[j].symbolic.expression = expression
-                self._canonical_basis[j].numeric.value = self._canonical_basis[j].symbolic.expression_lambda()
-                    
+            self._canonical_basis = [self.CanonicalBasisVector(j) for j in range(self.dimension)]
         else:
            # raise NotImplementedError("Infinite-dimensional Hilbert spaces are not yet handeled.")
             self._canonical_basis = None
@@ -140,13 +147,20 @@ class HilbertSpace:
         """
         Sets and returns the n-th canonical basis vector.
         Vectors are numbered from 0.
+        The numeric value is built directly as a read-only column, while the symbolic
+        expression is only built when the symbolic part of the vector is accessed.
         """
-        vector = Matrix(name="e_{"+(n+1).__str__()+"}")
-        expression = sympy.zeros(*(self.dimension, 1))
-        expression[n] = 1
-        vector.symbolic.expression = expression
-        vector.numeric.value = numpy.matrix(numpy.zeros((self.dimension, 1)))   
-        vector.numeric.value[n] = 1
+        name = "e_{"+(n+1).__str__()+"}"
+        vector = Matrix(name=name, numeric_only=True)
+        vector.numeric.value = canonicalBasisColumn(self.dimension, n)
+        dimension = self.dimension
+        def symbolic():
+            x = MatrixSymbolic(name=name)
+            expression = sympy.zeros(*(dimension, 1))
+            expression[n] = 1
+            x.expression = expression
+            return x
+        vector._symbolic_builder = symbolic
         return vector
     # ---------------------------------------------------------------
     def __str__(self):
@@ -3,14 +3,15 @@ This module describes a matrix as a parameter
 """
 #%%
 import numpy, sympy
-from scipy.linalg import expm, sqrtm
+from scipy.linalg import expm, sqrtm, logm, fractional_matrix_power
+import scipy.sparse
 from scipy.special import binom
 from sympy.physics.quantum import TensorProduct
 import uncertainties
 from uncertainties import unumpy
 import numpy.linalg
 import Iaji
-from Iaji.Mathematics.Parameter import Parameter, ParameterSymbolic, ParameterNumeric
+from Iaji.Mathematics.Parameter import Parameter, ParameterSymbolic, ParameterNumeric, LazyName
 from Iaji.Exceptions import InvalidArgumentError, InconsistentArgumentsError, MissingArgumentsError, MethodNotImplementedError
 from .Exceptions import InconsistentShapeError, TestFailedError
 from Iaji.Utilities import strutils
@@ -20,22 +21,132 @@ ACCEPTED_VALUE_TYPES = [numpy.matrix, numpy.ndarray, uncertainties.unumpy.core.m
 ACCEPTED_SHAPE_TYPES = [tuple, list, numpy.array, numpy.ndarray]
 NUMBER_TYPES = [int, numpy.int64, float, numpy.float64, complex, numpy.complex64, numpy.complex128]
 print_separator = "-----------------------------------------------"
+#Storage policy of numeric matrix values: accepted and default data types,
+#and whether input values are copied when their data type already matches
+ACCEPTED_DTYPES = [numpy.complex128, numpy.complex64, numpy.float64]
+DEFAULT_DTYPE = numpy.complex128
+COPY_VALUES = True
+#Sparse numeric matrix values are stored in this scipy.sparse format
+SPARSE_FORMAT = "csr"
+#If True, Iaji Matrix objects are created in numeric-only mode by default:
+#their symbolic part is only constructed when it is first accessed.
+NUMERIC_ONLY = False
+#%%
+def _isReadOnly(value):
+    """
+    Returns True if and only if the input value is a numpy.ndarray, or a scipy.sparse array,
+    whose buffers cannot be written
+    """
+    if scipy.sparse.issparse(value):
+        return all([not getattr(value, attribute).flags.writeable \
+                    for attribute in ["data", "indices", "indptr"] if hasattr(value, attribute)])
+    return isinstance(value, numpy.ndarray) and not value.flags.writeable
+#%%
+def _realSpectrum(w, valid):
+    """
+    Returns the eigenvalues 'w' unchanged if the condition 'valid' holds for all of them,
+    and promoted to complex otherwise, so that a matrix function stays real whenever it can
+    """
+    return w if numpy.all(valid) else w.astype(complex)
+#%%
+def _numeric_only(*operands):
+    """
+    Returns True if any of the input operands is in numeric-only mode
+    """
+    return any([getattr(operand, "numeric_only", False) for operand in operands])
+#%%
+def _symbolic_thunk(x):
+    """
+    Returns a function that computes the symbolic part of the input Iaji Matrix
+    or Parameter. The function does not hold a reference to the numeric part of x.
+    """
+    if getattr(x, "_symbolic_builder", None) is not None:
+        builder, name = x._symbolic_builder, getattr(x, "_symbolic_name", None)
+        def thunk():
+            symbolic = builder()
+            if name is not None:
+                symbolic.name = name
+            return symbolic
+        return thunk
+    elif getattr(x, "_symbolic", None) is not None:
+        symbolic = x._symbolic
+        return lambda: symbolic
+    else:
+        name = x.name
+        return lambda: MatrixSymbolic(name=name)
+#%%
+def _set_symbolic(x, function, *operands):
+    """
+    Sets the symbolic part of x as function(*[operand.symbolic for operand in operands]).
+    If x or any operand is in numeric-only mode, the evaluation is deferred 
+    until the symbolic part of x is accessed.
+    
+    INPUTS
+    ---------------
+        x : Iaji Matrix or Parameter
+        function : callable
+        operands : iterable of Iaji Matrix or Parameter
+    """
+    if getattr(x, "numeric_only", False) or _numeric_only(*operands):
+        thunks = [_symbolic_thunk(operand) for operand in operands]
+        x._symbolic_builder = lambda: function(*[thunk() for thunk in thunks])
+        x._symbolic_name = None
+        if isinstance(x, Matrix):
+            x._symbolic = None
+    else:
+        x._symbolic = function(*[operand.symbolic for operand in operands])
+#%%
+def _filled_symbolic(name, value, shape):
+    """
+    Returns a symbolic matrix of the given shape, with all entries equal to value
+    """
+    x = MatrixSymbolic(name=name)
+    x.expression = value*sympy.ones(*shape)
+    return x
 #%%
 class Matrix:
     """
     This class describes a matrix as a parameter.
+    
+    In numeric-only mode (numeric_only=True, or NUMERIC_ONLY=True at module level),
+    the symbolic part is not computed by the matrix operations, but only
+    when self.symbolic is first accessed.
     """
     # ----------------------------------------------------------
-    def __init__(self, name="M", value=None, real=False, nonnegative=False):
-        self._symbolic = MatrixSymbolic(name=name, real=False, nonnegative=False)
+    def __init__(self, name="M", value=None, real=False, nonnegative=False, numeric_only=None):
+        if numeric_only is None:
+            numeric_only = NUMERIC_ONLY
+        self._numeric_only = numeric_only
+        self._symbolic_builder, self._symbolic_name = None, None
+        if numeric_only:
+            self._symbolic = None
+        else:
+            self._symbolic = MatrixSymbolic(name=name, real=False, nonnegative=False)
         self._numeric = MatrixNumeric(name=name, value=value)
         self.name = name
         self.type = "vector"
         # Connect property changed signals to chech functions
         self.numeric.value_changed.connect(self.check_shapes)
-        self.symbolic.expression_changed.connect(self.check_shapes)
+        if self._symbolic is not None:
+            self._symbolic.expression_changed.connect(self.check_shapes)
+    # ----------------------------------------------------------
+    @property
+    def numeric_only(self):
+        return self._numeric_only
+
+    @numeric_only.deleter
+    def numeric_only(self):
+        del self._numeric_only
+    # ----------------------------------------------------------
     @property
     def symbolic(self):
+        if self._symbolic is None:
+            if self._symbolic_builder is not None:
+                self._symbolic = _symbolic_thunk(self)()
+            else:
+                self._symbolic = MatrixSymbolic(name=self.name)
+                self._symbolic.expression_changed.connect(self.check_shapes)
+            self._symbolic_builder, self._symbolic_name = None, None
         return self._symbolic
 
     @symbolic.deleter
@@ -59,7 +170,10 @@ class Matrix:
     def name(self, name):
         self._name = name
         self.numeric.name = name
-        self.symbolic.name = name
+        if self._symbolic is not None:
+            self._symbolic.name = name
+        else:
+            self._symbolic_name = name
 
     @name.deleter
     def name(self):
@@ -68,6 +182,8 @@ class Matrix:
 
     # ----------------------------------------------------------
     def check_shapes(self, **kwargs):
+        if self._symbolic is None:
+            return
         if self.numeric.shape is not None and self.symbolic.shape is not None:
             if self.numeric.shape != self.symbolic.shape:
                 raise InconsistentShapeError(
@@ -89,7 +205,7 @@ class Matrix:
         """
         name = "Tr\\left(%s\\right)"%self.name
         x = Parameter(name=name, type="scalar")
-        x._symbolic = self.symbolic.Trace()
+        _set_symbolic(x, lambda s: s.Trace(), self)
         x._numeric = self.numeric.Trace()
         return x
     # ----------------------------------------------------------
@@ -99,7 +215,7 @@ class Matrix:
         """
         name = "\\left|%s\\right|"%self.name
         x = Parameter(name=name, type="scalar", real=True, nonnegative=True)
-        x._symbolic = self.symbolic.Determinant()
+        _set_symbolic(x, lambda s: s.Determinant(), self)
         x._numeric = self.numeric.Determinant()
         return x
     # ----------------------------------------------------------
@@ -109,8 +225,8 @@ class Matrix:
         """
         other_temp = self.prepare_other(other)
         name = "\\left(%s+%s\\right)"%(self.name, other_temp.name)
-        x = Matrix(name=name)
-        x._symbolic = self.symbolic + other_temp.symbolic
+        x = Matrix(name=name, numeric_only=_numeric_only(self, other_temp))
+        _set_symbolic(x, lambda s, o: s + o, self, other_temp)
         x._numeric = self.numeric + other_temp.numeric
         return x
     # ----------------------------------------------------------
@@ -121,8 +237,8 @@ class Matrix:
         """
         other_temp = self.prepare_other(other)
         name = "\\left(%s-%s\\right)"%(self.name, other_temp.name)
-        x = Matrix(name=name)
-        x._symbolic = self.symbolic - other_temp.symbolic
+        x = Matrix(name=name, numeric_only=_numeric_only(self, other_temp))
+        _set_symbolic(x, lambda s, o: s - o, self, other_temp)
         x._numeric = self.numeric - other_temp.numeric
         return x
     # ----------------------------------------------------------
@@ -132,8 +248,8 @@ class Matrix:
         """
         other_temp = self.prepare_other(other)
         name = "%s*%s"%(self.name, other_temp.name)
-        x = Matrix(name=name)
-        x._symbolic = self.symbolic * other_temp.symbolic
+        x = Matrix(name=name, numeric_only=_numeric_only(self, other_temp))
+        _set_symbolic(x, lambda s, o: s * o, self, other_temp)
         x._numeric = self.numeric * other_temp.numeric
         return x
     # ----------------------------------------------------------
@@ -143,8 +259,8 @@ class Matrix:
         """
         other_temp = self.prepare_other(other)
         name = "%s/%s"%(self.name, other_temp.name)
-        x = Matrix(name=name)
-        x._symbolic = self.symbolic / other_temp.symbolic
+        x = Matrix(name=name, numeric_only=_numeric_only(self, other_temp))
+        _set_symbolic(x, lambda s, o: s / o, self, other_temp)
         x._numeric = self.numeric / other_temp.numeric
         return x
     # ----------------------------------------------------------
@@ -154,8 +270,8 @@ class Matrix:
         """
         other_temp = self.prepare_other(other)
         name = "%s%s"%(self.name, other_temp.name)
-        x = Matrix(name=name)
-        x._symbolic = self.symbolic @ other_temp.symbolic
+        x = Matrix(name=name, numeric_only=_numeric_only(self, other_temp))
+        _set_symbolic(x, lambda s, o: s @ o, self, other_temp)
         x._numeric = self.numeric @ other_temp.numeric
         return x
     # ----------------------------------------------------------
@@ -164,8 +280,8 @@ class Matrix:
         Matrix-multiplication power
         """
         name = "\\left(%s\\right)^{%d}"%(self.name, n)
-        x = Matrix(name=name)
-        x._symbolic = self.symbolic**n
+        x = Matrix(name=name, numeric_only=_numeric_only(self))
+        _set_symbolic(x, lambda s: s**n, self)
         x._numeric = self.numeric**n
         return x
     # ----------------------------------------------------------
@@ -175,7 +291,7 @@ class Matrix:
         """
         name = "\\left|%s\\right|"%(self.name)
         x = Parameter(name=name, type="scalar", real=True)
-        x.symbolic.expression = self.symbolic.__abs__()
+        _set_symbolic(x, lambda s: abs(s), self)
         x.numeric.value = self.numeric.__abs__()
         return x
     # ----------------------------------------------------------
@@ -184,8 +300,8 @@ class Matrix:
         Inversion with respect to addition
         """
         name = "-%s"%(self.name)
-        x = Matrix(name=name)
-        x._symbolic = -self.symbolic
+        x = Matrix(name=name, numeric_only=_numeric_only(self))
+        _set_symbolic(x, lambda s: -s, self)
         x._numeric = -self.numeric
         return x
     # ----------------------------------------------------------
@@ -195,8 +311,8 @@ class Matrix:
         """
         other_temp = self.prepare_other(other)
         name = "\\left(%s\\oplus\\;%s\\right)"%(self.name, other_temp.name)
-        x = Matrix(name=name)
-        x._symbolic = self.symbolic.Oplus(other_temp.symbolic)
+        x = Matrix(name=name, numeric_only=_numeric_only(self, other_temp))
+        _set_symbolic(x, lambda s, o: s.Oplus(o), self, other_temp)
         x._numeric = self.numeric.Oplus(other_temp.numeric)
         return x
     # ----------------------------------------------------------
@@ -206,8 +322,8 @@ class Matrix:
         """
         other_temp = self.prepare_other(other)
         name = "%s\\otimes\\;%s"%(self.name, other_temp.name)
-        x = Matrix(name=name)
-        x._symbolic = self.symbolic.Otimes(other_temp.symbolic)
+        x = Matrix(name=name, numeric_only=_numeric_only(self, other_temp))
+        _set_symbolic(x, lambda s, o: s.Otimes(o), self, other_temp)
         x._numeric = self.numeric.Otimes(other_temp.numeric)
         return x
     # ----------------------------------------------------------
@@ -217,8 +333,8 @@ class Matrix:
         """
         other_temp = self.prepare_other(other)
         name = "\\left[%s,%s\\right]"%(self.name, other_temp.name)
-        x = Matrix(name=name)
-        x._symbolic = self.symbolic.Commutator(other_temp.symbolic)
+        x = Matrix(name=name, numeric_only=_numeric_only(self, other_temp))
+        _set_symbolic(x, lambda s, o: s.Commutator(o), self, other_temp)
         x._numeric = self.numeric.Commutator(other_temp.numeric)
         return x
     # ----------------------------------------------------------
@@ -228,8 +344,8 @@ class Matrix:
         """
         other_temp = self.prepare_other(other)
         name = "\\left[%s,%s\\right]_{+}"%(self.name, other_temp.name)
-        x = Matrix(name=name)
-        x._symbolic = self.symbolic.Anticommutator(other_temp.symbolic)
+        x = Matrix(name=name, numeric_only=_numeric_only(self, other_temp))
+        _set_symbolic(x, lambda s, o: s.Anticommutator(o), self, other_temp)
         x._numeric = self.numeric.Anticommutator(other_temp.numeric)
         return x
     # ----------------------------------------------------------
@@ -238,9 +354,9 @@ class Matrix:
         Hermitian conjugate
         """
         name = "\\left(%s\\right)^\\dagger"%self.name
-        x = Matrix(name=name)
+        x = Matrix(name=name, numeric_only=_numeric_only(self))
         x._numeric = self.numeric.Dagger()
-        x._symbolic = self.symbolic.Dagger()
+        _set_symbolic(x, lambda s: s.Dagger(), self)
         return x
     # ----------------------------------------------------------
     def T(self):
@@ -248,15 +364,15 @@ class Matrix:
         T
         """
         name = "\\left(%s^T\\right)"%self.name
-        x = Matrix(name=name)
+        x = Matrix(name=name, numeric_only=_numeric_only(self))
         x._numeric = self.numeric.T()
-        x._symbolic = self.symbolic.T()
+        _set_symbolic(x, lambda s: s.T(), self)
         return x
     # ----------------------------------------------------------
     def Conjugate(self):
         name = "\\left(%s^*\\right)"%self.name
         x = Parameter(name=name, type=self.type)
-        x._symbolic = self.symbolic.Conjugate()
+        _set_symbolic(x, lambda s: s.Conjugate(), self)
         x._numeric = self.numeric.Conjugate()
         return x
     # ----------------------------------------------------------
@@ -265,9 +381,9 @@ class Matrix:
         Moore-Penrose inverse
         """
         name = "\\left(%s^+\\right)"%self.name
-        x = Matrix(name=name)
+        x = Matrix(name=name, numeric_only=_numeric_only(self))
         x._numeric = self.numeric.Inverse()
-        x._symbolic = self.symbolic.Inverse()
+        _set_symbolic(x, lambda s: s.Inverse(), self)
         return x
     # ----------------------------------------------------------
     def Exp(self):
@@ -275,9 +391,9 @@ class Matrix:
         Matrix exponential
         """
         name = "e^{%s}"%self.name
-        x = Matrix(name=name)
+        x = Matrix(name=name, numeric_only=_numeric_only(self))
         x._numeric = self.numeric.Exp()
-        x._symbolic = self.symbolic.Exp()
+        _set_symbolic(x, lambda s: s.Exp(), self)
         return x
     # ----------------------------------------------------------
     def ExpTruncated(self, n):
@@ -286,9 +402,9 @@ class Matrix:
         in the MacLaurin expansion
         """
         name = "\\tilde{e}^{%s}"%self.name
-        x = Matrix(name=name)
+        x = Matrix(name=name, numeric_only=_numeric_only(self))
         x._numeric = self.numeric.ExpTruncated(n)
-        x._symbolic = self.symbolic.ExpTruncated(n)
+        _set_symbolic(x, lambda s: s.ExpTruncated(n), self)
         return x
     # ----------------------------------------------------------
     def Sqrt(self):
@@ -296,9 +412,9 @@ class Matrix:
         Matrix square root
         """
         name = "\\sqrt{%s}"%self.name
-        x = Matrix(name=name)
+        x = Matrix(name=name, numeric_only=_numeric_only(self))
         x._numeric = self.numeric.Sqrt()
-        x._symbolic = self.symbolic.Sqrt()
+        _set_symbolic(x, lambda s: s.Sqrt(), self)
         return x
     # ----------------------------------------------------------
     def TraceDistance(self, other):
@@ -308,7 +424,7 @@ class Matrix:
         other_temp = self.prepare_other(other)
         name = "\\left||%s-%s\\right||_{1}"%(self.name, other_temp.name)
         x = Parameter(name=name, type="scalar", real=True, nonnegative=True)
-        x._symbolic = self.symbolic.TraceDistance(other_temp.symbolic)
+        _set_symbolic(x, lambda s, o: s.TraceDistance(o), self, other_temp)
         x._numeric = self.numeric.TraceDistance(other_temp.numeric)
         return x
     # ----------------------------------------------------------
@@ -316,9 +432,9 @@ class Matrix:
         """
         Returns the Hermitian part of the matrix
         """
-        x = Matrix(name=self.name)
+        x = Matrix(name=self.name, numeric_only=_numeric_only(self))
         x._numeric = self.numeric.Hermitian()
-        x._symbolic = self.symbolic.Hermitian()
+        _set_symbolic(x, lambda s: s.Hermitian(), self)
         return x
     # ----------------------------------------------------------
     def prepare_other(self, other):
@@ -334,8 +450,9 @@ class Matrix:
                 is_real = other.symbol.is_real is True
                 is_nonnegative = other.symbol.is_nonnegative is True
                 other_temp = Matrix(name=other.name, \
-                                    real=is_real, nonnegative=is_nonnegative)
-                other_temp.symbolic.expression = other.symbolic.expression*sympy.ones(*self.symbolic.shape)
+                                    real=is_real, nonnegative=is_nonnegative, numeric_only=_numeric_only(self))
+                shape = self.numeric.shape
+                _set_symbolic(other_temp, lambda: _filled_symbolic(other.name, other.symbolic.expression, shape))
                 other_temp.numeric.value = other.numeric.value*numpy.ones(self.numeric.shape)
                 return other_temp
         except:
@@ -345,15 +462,16 @@ class Matrix:
                 is_real = numpy.isclose(numpy.imag(other), 0)
                 is_nonnegative = is_real and (other >= 0)
                 other_temp = Matrix(name=str(other), \
-                                    real=is_real, nonnegative=is_nonnegative)
-                other_temp.symbolic.expression = other*sympy.ones(*self.symbolic.shape)
+                                    real=is_real, nonnegative=is_nonnegative, numeric_only=_numeric_only(self))
+                shape = self.numeric.shape
+                _set_symbolic(other_temp, lambda: _filled_symbolic(str(other), other, shape))
                 other_temp.numeric.value = other*numpy.ones(self.numeric.shape)
             else:
                 raise TypeError("Incompatible operand types (%s. %s)"%(type(self), type(other)))
             return other_temp
     # ----------------------------------------------------------
     @classmethod
-    def Zeros(cls, shape, name=None):
+    def Zeros(cls, shape, name=None, numeric_only=None):
         """
         Creates a matrix filled with zeros, of the given shape
         """
@@ -361,13 +479,13 @@ class Matrix:
             name = "\\mathbf{0}_{{%s\\times%s}"%(shape[0], shape[1])
         else:    
             name = "\\mathbf{0}^{\\left(%s\\right)}_{%s\\times%s}"%(name, shape[0], shape[1])
-        x = Matrix(name=name)
-        x._symbolic = MatrixSymbolic.Zeros(shape)
+        x = Matrix(name=name, numeric_only=numeric_only)
+        _set_symbolic(x, lambda: MatrixSymbolic.Zeros(shape))
         x._numeric = MatrixNumeric.Zeros(shape)
         return x
     # ----------------------------------------------------------
     @classmethod
-    def Ones(cls, shape, name=None):
+    def Ones(cls, shape, name=None, numeric_only=None):
         """
         Creates a matrix filled with zeros, of the given shape
         """
@@ -375,13 +493,13 @@ class Matrix:
             name = "\\mathbf{1}_{{%s\\times%s}"%(shape[0], shape[1])
         else:    
             name = "\\mathbf{1}^{\\left(%s\\right)}_{%s\\times%s}"%(name, shape[0], shape[1])
-        x = Matrix(name=name)
-        x._symbolic = MatrixSymbolic.Ones(shape)
+        x = Matrix(name=name, numeric_only=numeric_only)
+        _set_symbolic(x, lambda: MatrixSymbolic.Ones(shape))
         x._numeric = MatrixNumeric.Ones(shape)
         return x
     # ----------------------------------------------------------
     @classmethod
-    def Eye(cls, n, name=None):
+    def Eye(cls, n, name=None, numeric_only=None):
         """
         Creates a matrix filled with zeros, of the given shape
         """
@@ -389,37 +507,47 @@ class Matrix:
             name = "\\mathbb{I}_{%d}"%(n)
         else:    
             name = "\\mathbb{I}^{\\left(%s\\right)}_{%d}"%(name, n)
-        x = Matrix(name=name)
-        x._symbolic = MatrixSymbolic.Eye(n)
+        x = Matrix(name=name, numeric_only=numeric_only)
+        _set_symbolic(x, lambda: MatrixSymbolic.Eye(n))
         x._numeric = MatrixNumeric.Eye(n)
         return x
     # ----------------------------------------------------------
     @classmethod
-    def TensorProduct(cls, matrices):
+    def TensorProduct(cls, matrices, numeric_only=None):
         """
         Calculates the tensor product of a list of matrices
         INPUTS
         ---------------
             matrices: 1D array-like of Iaji Matrix
         """
-        x = Matrix()
-        x._symbolic = MatrixSymbolic.TensorProduct([m.symbolic for m in matrices])
+        if numeric_only is None:
+            numeric_only = _numeric_only(*matrices)
+        x = Matrix(numeric_only=numeric_only)
+        _set_symbolic(x, lambda *s: MatrixSymbolic.TensorProduct(list(s)), *matrices)
         x._numeric = MatrixNumeric.TensorProduct([m.numeric for m in matrices])
-        x.name = x.symbolic.name
+        if x.numeric_only:
+            x.name = x.numeric.name
+        else:
+            x.name = x.symbolic.name
         return x
     # ----------------------------------------------------------
     @classmethod
-    def DirectSum(cls, matrices):
+    def DirectSum(cls, matrices, numeric_only=None):
         """
         Calculates the direct sum of a list of matrices
         INPUTS
         ---------------
             matrices: 1D array-like of Iaji Matrix
         """
-        x = Matrix()
-        x._symbolic = MatrixSymbolic.DirectSum([m.symbolic for m in matrices])
+        if numeric_only is None:
+            numeric_only = _numeric_only(*matrices)
+        x = Matrix(numeric_only=numeric_only)
+        _set_symbolic(x, lambda *s: MatrixSymbolic.DirectSum(list(s)), *matrices)
         x._numeric = MatrixNumeric.DirectSum([m.numeric for m in matrices])
-        x.name = x.symbolic.name
+        if x.numeric_only:
+            x.name = x.numeric.name
+        else:
+            x.name = x.symbolic.name
         return x
     # ----------------------------------------------------------
 # In[]
@@ -1174,13 +1302,45 @@ um
 class MatrixNumeric(ParameterNumeric):
     """
     This class describes a numerical matrix.
+    Its value is stored as a 2D numpy.ndarray, or as a scipy.sparse CSR array
+    if the matrix is sparse.
+    
+    Read-only values (see Freeze) follow copy-on-write semantics: they are shared,
+    instead of copied, when assigned to another matrix or when the matrix is deep-copied.
+    A read-only value is modified by assigning a new value to the matrix.
     """
     # ----------------------------------------------------------
-    def __init__(self, name="M", value=None):
+    def __init__(self, name="M", value=None, dtype=None, copy=None, sparse=None):
+        """
+        INPUTS
+        ----------
+            name : str
+                Name of the matrix
+            value : array-like
+                Value of the matrix
+            dtype : type in ACCEPTED_DTYPES
+                Data type used to store the value. If None, DEFAULT_DTYPE is used.
+                A real data type is automatically promoted to complex if a complex
+                value is assigned.
+            copy : bool
+                If False, an input numpy.ndarray of the same data type is stored
+                without being copied. If None, COPY_VALUES is used.
+            sparse : bool
+                If True, the value is stored as a scipy.sparse array; if False, as a
+                dense numpy.ndarray. If None, the storage follows the assigned value,
+                i.e., scipy.sparse values stay sparse and array-like values stay dense.
+        """
+        if dtype is None:
+            dtype = DEFAULT_DTYPE
+        if copy is None:
+            copy = COPY_VALUES
+        if numpy.dtype(dtype) not in [numpy.dtype(t) for t in ACCEPTED_DTYPES]:
+            raise InvalidArgumentError("Invalid data type %s. Accepted data types are %s"%(dtype, ACCEPTED_DTYPES))
+        self._dtype = numpy.dtype(dtype)
+        self._copy = copy
+        self._sparse = sparse
+        self._clearCache()
         super().__init__(name=name, type="vector", value=value)
-        self._eigenvalues, self._rank  = [None for j in range(2)]
-        self._trace = ParameterNumeric(name="Tr\\left(%s\\right)"%self.name)
-        self._determinant = ParameterNumeric(name="\\left|%s\\right|"%self.name)
     # ----------------------------------------------------------
     # ----------------------------------------------------------
     @property
@@ -1215,6 +1375,8 @@ class MatrixNumeric(ParameterNumeric):
     # ----------------------------------------------------------
     @property
     def trace(self):
+        if self._trace is None:
+            self._trace = ParameterNumeric(name=LazyName("Tr\\left(%s\\right)", self._name))
         return self._trace
 
     @trace.deleter
@@ -1225,6 +1387,8 @@ class MatrixNumeric(ParameterNumeric):
     # ----------------------------------------------------------
     @property
     def determinant(self):
+        if self._determinant is None:
+            self._determinant = ParameterNumeric(name=LazyName("\\left|%s\\right|", self._name))
         return self._determinant
 
     @determinant.deleter
@@ -1234,26 +1398,198 @@ class MatrixNumeric(ParameterNumeric):
     # ----------------------------------------------------------
     # ----------------------------------------------------------
     @property
+    def dtype(self):
+        return self._dtype
+
+    @dtype.setter
+    def dtype(self, dtype):
+        if numpy.dtype(dtype) not in [numpy.dtype(t) for t in ACCEPTED_DTYPES]:
+            raise InvalidArgumentError("Invalid data type %s. Accepted data types are %s"%(dtype, ACCEPTED_DTYPES))
+        self._dtype = numpy.dtype(dtype)
+        if self.value is not None:
+            self.value = self.value
+
+    @dtype.deleter
+    def dtype(self):
+        del self._dtype
+    # ----------------------------------------------------------
+    # ----------------------------------------------------------
+    @property
+    def copy(self):
+        return self._copy
+
+    @copy.setter
+    def copy(self, copy):
+        self._copy = copy
+
+    @copy.deleter
+    def copy(self):
+        del self._copy
+    # ----------------------------------------------------------
+    # ----------------------------------------------------------
+    @property
+    def sparse(self):
+        """
+        True if and only if the value of the matrix is stored as a scipy.sparse array
+        """
+        return scipy.sparse.issparse(self._value)
+
+    @sparse.setter
+    def sparse(self, sparse):
+        self._sparse = sparse
+        if self.value is not None:
+            self.value = self.value
+    # ----------------------------------------------------------
+    # ----------------------------------------------------------
+    def _prepare_value(self, value):
+        """
+        Converts the input value to a 2D numpy.ndarray, or to a scipy.sparse array,
+        with the data type of the matrix.
+        The value is copied only if self.copy is True or if a conversion is needed.
+        If a complex value is assigned to a real matrix, the data type of the
+        matrix is promoted to complex.
+        """
+        if scipy.sparse.issparse(value):
+            if self._sparse is False:
+                value = value.toarray()
+            else:
+                if value.dtype.kind == "c" and self._dtype.kind == "f":
+                    self._dtype = numpy.dtype(numpy.complex128)
+                if _isReadOnly(value) and value.format == "csr" and value.dtype == self._dtype:
+                    #An immutable buffer can be shared without being copied
+                    return value
+                return scipy.sparse.csr_array(value, dtype=self._dtype, copy=bool(self._copy))
+        value = numpy.asarray(value)
+        if value.dtype.kind == "c" and self._dtype.kind == "f":
+            self._dtype = numpy.dtype(numpy.complex128)
+        if _isReadOnly(value) and value.dtype == self._dtype and value.ndim == 2 and not self._sparse:
+            #An immutable buffer can be shared without being copied
+            return value
+        value = numpy.array(value, dtype=self._dtype, copy=self._copy or None)
+        if value.ndim < 2:
+            value = numpy.atleast_2d(value)
+        if self._sparse:
+            value = scipy.sparse.csr_array(value)
+        return value
+    # ----------------------------------------------------------
+    @property
+    def read_only(self):
+        """
+        True if and only if the value of the matrix cannot be modified in place
+        """
+        return _isReadOnly(self._value)
+    # ----------------------------------------------------------
+    def Freeze(self):
+        """
+        Makes the value of the matrix read-only, so that it is shared by copies
+        of the matrix instead of being duplicated. 
+        
+        OUTPUTS
+        -------------
+            self
+        """
+        if self.sparse:
+            for attribute in ["data", "indices", "indptr"]:
+                getattr(self._value, attribute).setflags(write=False)
+        elif self._value is not None:
+            self._value.setflags(write=False)
+        return self
+    # ----------------------------------------------------------
+    def __deepcopy__(self, memo):
+        """
+        Deep copy, where read-only values are shared instead of being copied
+        """
+        x = self.__class__.__new__(self.__class__)
+        memo[id(self)] = x
+        for key, item in self.__dict__.items():
+            if key == "_value" and _isReadOnly(item):
+                x.__dict__[key] = item
+            else:
+                x.__dict__[key] = copy(item, memo)
+        return x
+    # ----------------------------------------------------------
+    def _dense_value(self):
+        """
+        Returns the value of the matrix as a dense numpy.ndarray
+        """
+        if self.sparse:
+            return self._value.toarray()
+        return self._value
+    # ----------------------------------------------------------
+    # ----------------------------------------------------------
+    @property
     def value(self):
         return self._value
 
     @value.setter
     def value(self, value):
         if value is not None:
-            self._value = numpy.matrix(value, dtype=numpy.complex64)
+            self._value = self._prepare_value(value)
             self._shape = self._value.shape
         else:
             self._value = None
             self._shape = None
-        self._eigenvalues, self._rank  = [None for j in range(2)]
-        self._trace = ParameterNumeric(name="Tr\\left(%s\\right)"%self.name)
-        self._determinant = ParameterNumeric(name="\\left|%s\\right|"%self.name)
+        self._clearCache()
         self.value_changed.emit()  # emit value changed signal
 
     @value.deleter
     def value(self):
         del self._value
-        # ----------------------------------------------------------
+    # ----------------------------------------------------------
+    # ----------------------------------------------------------
+    def _clearCache(self):
+        """
+        Clears the quantities that are cached for the current value of the matrix.
+        It must be called whenever the value changes. 
+        In-place modifications of self.value are not detected.
+        """
+        self._eigenvalues, self._rank  = [None for j in range(2)]
+        self._trace, self._determinant = [None for j in range(2)]
+        self._eigh = None
+    # ----------------------------------------------------------
+    # ----------------------------------------------------------
+    def EigenDecomposition(self, tolerance=1e-12):
+        """
+        This function computes the eigendecomposition of a Hermitian matrix,
+        M = V diag(w) V^\dagger, with real eigenvalues w sorted in ascending order
+        and unitary V. The result is cached until the value of the matrix changes.
+
+        INPUTS
+        -------------
+            tolerance : float (>0)
+                relative tolerance of the Hermitianity test
+
+        OUTPUTS
+        -------------
+            (w, V) if the matrix is Hermitian, None otherwise
+        """
+        if self._eigh is None:
+            if self.value is None:
+                raise TypeError("Cannot compute the eigendecomposition because the value of matrix "+self.name+" is None")
+            elif not self.isSquare():
+                raise TypeError("Cannot compute the eigendecomposition because the value of matrix "+self.name+" is not square")
+            value = self._dense_value()
+            scale = numpy.max(numpy.abs(value)) if value.size > 0 else 0
+            if numpy.allclose(value, numpy.conjugate(value.T), rtol=0, atol=tolerance*scale):
+                self._eigh = numpy.linalg.eigh(value)
+            else:
+                #Remember that the matrix is not Hermitian
+                self._eigh = False
+        if self._eigh is False:
+            return None
+        return self._eigh
+    # ----------------------------------------------------------
+    # ----------------------------------------------------------
+    def _functionHermitian(self, function):
+        """
+        Applies a scalar function to a Hermitian matrix via its cached eigendecomposition.
+        Returns None if the matrix is not Hermitian.
+        """
+        eigh = self.EigenDecomposition()
+        if eigh is None:
+            return None
+        w, V = eigh
+        return (V * function(w)) @ numpy.conjugate(V.T)
     # ----------------------------------------------------------
     def __str__(self):
         s = super().__str__()
@@ -1279,7 +1615,11 @@ class MatrixNumeric(ParameterNumeric):
         elif not self.isSquare():
             raise TypeError("Cannot compute the eigenvalues because the value of matrix "+self.name+" is not square\n"+self.__str__())
         else:
-            self._eigenvalues = numpy.linalg.eigvals(self.value)
+            eigh = self.EigenDecomposition()
+            if eigh is not None:
+                self._eigenvalues = eigh[0]
+            else:
+                self._eigenvalues = numpy.linalg.eigvals(self._dense_value())
         return self.eigenvalues
     # ----------------------------------------------------------
     # ----------------------------------------------------------
@@ -1294,8 +1634,13 @@ class MatrixNumeric(ParameterNumeric):
 
         if self.value is None:
             raise TypeError("Cannot compute the rank because the value of matrix " + self.name + " is None\n"+self.__str__())
+        elif self.isSquare() and self.EigenDecomposition() is not None:
+            #Same default tolerance as numpy.linalg.matrix_rank
+            w = numpy.abs(self.EigenDecomposition()[0])
+            tolerance = numpy.max(w, initial=0) * self.shape[0] * numpy.finfo(w.dtype).eps
+            self._rank = int(numpy.sum(w > tolerance))
         else:
-            self._rank = numpy.linalg.matrix_rank(self.value)
+            self._rank = numpy.linalg.matrix_rank(self._dense_value())
         return self.rank
     # ----------------------------------------------------------
     # ----------------------------------------------------------
@@ -1314,13 +1659,40 @@ class MatrixNumeric(ParameterNumeric):
         elif not self.isSquare():
             raise TypeError("Cannot compute the eigenvalues because the value of matrix "+self.name+" is not square\n"+self.__str__())
         else:
-            name = "Tr\\left(%s\\right)"%self.name
+            name = LazyName("Tr\\left(%s\\right)", self._name)
             x = ParameterNumeric(name=name, type="scalar")
-            x.value = numpy.trace(self.value)
+            if self.sparse:
+                x.value = self.value.diagonal().sum()
+            else:
+                x.value = numpy.trace(self.value)
             self._trace = x
             return x
     # ----------------------------------------------------------
     # ----------------------------------------------------------
+    def TraceProduct(self, other):
+        """
+        This function computes the trace of the matrix product of self and other,
+        Tr(self @ other), without computing the product.
+        If either matrix is sparse, only its nonzero elements are visited.
+
+        OUTPUTS
+        -------------
+            The trace of the matrix product
+        """
+        other_temp = self.prepare_other(other)
+        if self.value is None or other_temp.value is None:
+            raise TypeError("Incompatible operand types (%s. %s)"%(type(self), type(other)))
+        name = LazyName("Tr\\left(%s%s\\right)", self._name, other_temp._name)
+        x = ParameterNumeric(name=name, type="scalar")
+        if other_temp.sparse:
+            x.value = other_temp.value.multiply(self.value.T).sum()
+        elif self.sparse:
+            x.value = self.value.multiply(other_temp.value.T).sum()
+        else:
+            x.value = numpy.sum(self.value * other_temp.value.T)
+        return x
+    # ----------------------------------------------------------
+    # ----------------------------------------------------------
     def Determinant(self):
         """
         This function computes the determinant of the matrix
@@ -1331,9 +1703,9 @@ class MatrixNumeric(ParameterNumeric):
         """
         if self.eigenvalues is None:
             self.Eigenvalues()
-        name = "\\left|%s\\right|"%self.name
+        name = LazyName("\\left|%s\\right|", self._name)
         x = ParameterNumeric(name=name, type="scalar")
-        x.value = numpy.linalg.det(self.value)
+        x.value = numpy.linalg.det(self._dense_value())
         self._determinant = x
         return x
     # ----------------------------------------------------------
@@ -1411,7 +1783,8 @@ class MatrixNumeric(ParameterNumeric):
             min_eigenvalue = numpy.min(
                 numpy.abs(self.eigenvalues))  # modulus of the minimum eigenvalue of the input matrix
             tolerance = tolerance * min_eigenvalue
-            return numpy.allclose(self.value, self.value.T, atol=tolerance)
+            value = self._dense_value()
+            return numpy.allclose(value, value.T, atol=tolerance)
     # ----------------------------------------------------------
     # ----------------------------------------------------------
     def isSquare(self):
@@ -1472,7 +1845,7 @@ class MatrixNumeric(ParameterNumeric):
             raise TypeError(
                 "Cannot test Hermitianity because the value of matrix " + self.name + " is not square.\n" + self.__str__())
         else:
-            return numpy.all(numpy.real(self.value) >= 0)
+            return numpy.all(numpy.real(self.eigenvalues) >= -tolerance)
     # ----------------------------------------------------------
     # ----------------------------------------------------------
     def isHermitian(self, tolerance=1/100):
@@ -1513,12 +1886,12 @@ class MatrixNumeric(ParameterNumeric):
         -----------
         True if M has trace(M^2) <= 1
         """
-        return numpy.abs(numpy.trace(self.value @ self.value)) <= 1
+        return numpy.abs(self.TraceProduct(self).value) <= 1
     # ----------------------------------------------------------
     def __add__(self, other):
         other_temp = self.prepare_other(other)
-        name = "\\left(%s+%s\\right)"%(self.name, other_temp.name)
-        x = MatrixNumeric(name=name)
+        name = LazyName("\\left(%s+%s\\right)", self._name, other_temp._name)
+        x = MatrixNumeric(name=name, dtype=self.dtype, copy=self.copy)
         self_value = self.value
         other_value = other_temp.value
         if self_value is None or other_value is None:
@@ -1529,8 +1902,8 @@ class MatrixNumeric(ParameterNumeric):
     # ----------------------------------------------------------
     def __sub__(self, other):
         other_temp = self.prepare_other(other)
-        name = "\\left(%s-%s\\right)"%(self.name, other_temp.name)
-        x = MatrixNumeric(name=name)
+        name = LazyName("\\left(%s-%s\\right)", self._name, other_temp._name)
+        x = MatrixNumeric(name=name, dtype=self.dtype, copy=self.copy)
         self_value = self.value
         other_value = other_temp.value
         if self_value is None or other_value is None:
@@ -1542,14 +1915,22 @@ class MatrixNumeric(ParameterNumeric):
     #Elementwise multiplication
     def __mul__(self, other):
         other_temp = self.prepare_other(other)
-        name = "%s*%s"%(self.name, other_temp.name)
-        x = MatrixNumeric(name=name)
+        name = LazyName("%s*%s", self._name, other_temp._name)
+        x = MatrixNumeric(name=name, dtype=self.dtype, copy=self.copy)
         self_value = self.value
         other_value = other_temp.value
         if self_value is None or other_value is None:
             raise TypeError("unsupported operand type(s) for *: %s and %s" % (type(self_value, other_value)))
         else:
-            x.value = numpy.multiply(self_value, other_value)
+            scalar = self._scalar_value(other)
+            if scalar is not None:
+                x.value = self_value * scalar
+            elif scipy.sparse.issparse(self_value):
+                x.value = self_value.multiply(other_value)
+            elif scipy.sparse.issparse(other_value):
+                x.value = other_value.multiply(self_value)
+            else:
+                x.value = numpy.multiply(self_value, other_value)
         return x
     # ----------------------------------------------------------
     def __truediv__(self, other):
@@ -1557,21 +1938,25 @@ class MatrixNumeric(ParameterNumeric):
         Elementwise division
         """
         other_temp = self.prepare_other(other)
-        name = "%s/%s"%(self.name, other_temp.name)
-        x = MatrixNumeric(name=name)
+        name = LazyName("%s/%s", self._name, other_temp._name)
+        x = MatrixNumeric(name=name, dtype=self.dtype, copy=self.copy)
         self_value = self.value
         other_value = other_temp.value
         if self_value is None or other_value is None:
             raise TypeError("unsupported operand type(s) for *: %s and %s" % (type(self_value, other_value)))
         else:
-            x.value = numpy.divide(self_value, other_value)
+            scalar = self._scalar_value(other)
+            if scalar is not None:
+                x.value = self_value / scalar
+            else:
+                x.value = numpy.divide(self_value, other_temp._dense_value())
         return x
     # ----------------------------------------------------------
     #Matrix multiplication
     def __matmul__(self, other):
         other_temp = self.prepare_other(other)
-        name = "%s%s"%(self.name, other_temp.name)
-        x = MatrixNumeric(name=name)
+        name = LazyName("%s%s", self._name, other_temp._name)
+        x = MatrixNumeric(name=name, dtype=self.dtype, copy=self.copy)
         self_value = self.value
         other_value = other_temp.value
         if self_value is None or other_value is None:
@@ -1589,9 +1974,12 @@ class MatrixNumeric(ParameterNumeric):
             integer exponent
         """
         assert n == int(n)
-        name = "\\left(%s\\right)^{%d}"%(self.name, n)
-        x = MatrixNumeric(name=name)
-        x.value = numpy.eye(self.shape[0])
+        name = LazyName("\\left(%%s\\right)^{%d}"%n, self._name)
+        x = MatrixNumeric(name=name, dtype=self.dtype, copy=self.copy)
+        if self.sparse:
+            x.value = scipy.sparse.identity(self.shape[0], format=SPARSE_FORMAT)
+        else:
+            x.value = numpy.eye(self.shape[0])
         for j in range(n):
             x @= self
         x.name = name
@@ -1605,22 +1993,25 @@ class MatrixNumeric(ParameterNumeric):
             return self.Determinant()
     # ----------------------------------------------------------
     def __neg__(self):
-        name = "-%s"%(self.name)
-        x = MatrixNumeric(name=name)
+        name = LazyName("-%s", self._name)
+        x = MatrixNumeric(name=name, dtype=self.dtype, copy=self.copy)
         x.value = -self.value
         return x
     # ----------------------------------------------------------
     #Matrix direct sum
     def Oplus(self, other):
         other_temp = self.prepare_other(other)
-        name = "\\left(%s\\oplus\\;%s\\right)"%(self.name, other_temp.name)
-        x = MatrixNumeric(name=name)
+        name = LazyName("\\left(%s\\oplus\\;%s\\right)", self._name, other_temp._name)
+        x = MatrixNumeric(name=name, dtype=self.dtype, copy=self.copy)
         self_value = self.value
         other_value = other_temp.value
         if self_value is None:
             self_value = numpy.matrix([])
         if other_value is None:
             self_value = numpy.matrix([])
+        if scipy.sparse.issparse(self_value) or scipy.sparse.issparse(other_value):
+            x.value = scipy.sparse.block_diag([self_value, other_value], format=SPARSE_FORMAT)
+            return x
         x.value = numpy.zeros(tuple(numpy.array(self_value.shape) + numpy.array(other_value.shape)))
         x.value[0:self_value.shape[0], 0:self_value.shape[1]] = self_value
         x.value[self_value.shape[0]:, self_value.shape[1]:] = other_value
@@ -1629,9 +2020,12 @@ class MatrixNumeric(ParameterNumeric):
     # Matrix Kronecker tensor product
     def Otimes(self, other):
         other_temp = self.prepare_other(other)
-        name = "%s\\otimes\\;%s"%(self.name, other_temp.name)
-        x = MatrixNumeric(name=name)
-        x.value = numpy.kron(self.value, other_temp.value)
+        name = LazyName("%s\\otimes\\;%s", self._name, other_temp._name)
+        x = MatrixNumeric(name=name, dtype=self.dtype, copy=self.copy)
+        if self.sparse or other_temp.sparse:
+            x.value = scipy.sparse.kron(self.value, other_temp.value, format=SPARSE_FORMAT)
+        else:
+            x.value = numpy.kron(self.value, other_temp.value)
         return x
     # ----------------------------------------------------------
     def Commutator(self, other):
@@ -1639,8 +2033,8 @@ class MatrixNumeric(ParameterNumeric):
         Canonical commutator
         """
         other_temp = self.prepare_other(other)
-        name = "\\left[%s,%s\\right]"%(self.name, other_temp.name)
-        x = MatrixNumeric(name=name)
+        name = LazyName("\\left[%s,%s\\right]", self._name, other_temp._name)
+        x = MatrixNumeric(name=name, dtype=self.dtype, copy=self.copy)
         x.value = self.value @ other_temp.value - other_temp.value @ self.value
         return x
     # ----------------------------------------------------------   
@@ -1649,8 +2043,8 @@ class MatrixNumeric(ParameterNumeric):
         Canonical anticommutator
         """
         other_temp = self.prepare_other(other)
-        name = "\\left[%s,%s\\right]_{+}"%(self.name, other_temp.name)
-        x = MatrixNumeric(name=name)
+        name = LazyName("\\left[%s,%s\\right]_{+}", self._name, other_temp._name)
+        x = MatrixNumeric(name=name, dtype=self.dtype, copy=self.copy)
         x.value = self.value @ other_temp.value + other_temp.value @ self.value
         return x
     # ----------------------------------------------------------   
@@ -1658,7 +2052,7 @@ class MatrixNumeric(ParameterNumeric):
         """
         Hermitian conjugate
         """
-        name = "\\left(%s\\right)^\\dagger"%self.name
+        name = LazyName("\\left(%s\\right)^\\dagger", self._name)
         x = self.Conjugate().T()
         x.value = x.value.astype(self.value.dtype)
         x.name = name
@@ -1668,48 +2062,51 @@ class MatrixNumeric(ParameterNumeric):
         """
         T
         """
-        name = "\\left(%s^T\\right)"%self.name
-        x = MatrixNumeric(name=name)
+        name = LazyName("\\left(%s^T\\right)", self._name)
+        x = MatrixNumeric(name=name, dtype=self.dtype, copy=self.copy)
         if self.value is None:
             raise TypeError("unsupported operand type for T: %s" % (type(self.value)))
         else:
-            x.value = numpy.transpose(self.value)
+            x.value = self.value.T
         return x
     # ----------------------------------------------------------
     def Conjugate(self):
         """
         Complex conjugate
         """
-        name = "\\left(%s^*\\right)"%self.name
-        x = MatrixNumeric(name=name)
+        name = LazyName("\\left(%s^*\\right)", self._name)
+        x = MatrixNumeric(name=name, dtype=self.dtype, copy=self.copy)
         if self.value is None:
             raise TypeError("unsupported operand type for Conjugate: %s" % (type(self.value)))
         else:
-            x.value = numpy.conjugate(self.value)
+            x.value = self.value.conj()
         return x
     # ----------------------------------------------------------
     def Inverse(self):
         """
         Moore-Penrose inverse 
         """
-        name = "\\left(%s^+\\right)"%self.name
-        x = MatrixNumeric(name=name)
+        name = LazyName("\\left(%s^+\\right)", self._name)
+        x = MatrixNumeric(name=name, dtype=self.dtype, copy=self.copy)
         if self.value is None:
             raise TypeError("unsupported operand type for Inverse: %s" % (type(self.value)))
         else:
-            x.value = numpy.linalg.inv(self.value)
+            x.value = numpy.linalg.inv(self._dense_value())
         return x
     # ----------------------------------------------------------
     def Exp(self):
         """
         Matrix exponential
         """
-        name = "e^{%s}"%self.name
-        x = MatrixNumeric(name=name)
+        name = LazyName("e^{%s}", self._name)
+        x = MatrixNumeric(name=name, dtype=self.dtype, copy=self.copy)
         if self.value is None:
             raise TypeError("unsupported operand type for Inverse: %s" % (type(self.value)))
         else:
-            x.value = expm(self.value)
+            value = self._functionHermitian(numpy.exp)
+            if value is None:
+                value = expm(self._dense_value())
+            x.value = value
         return x
     # ----------------------------------------------------------
     def ExpTruncated(self, n):
@@ -1717,8 +2114,8 @@ class MatrixNumeric(ParameterNumeric):
         Matrix exponential truncated up to finite order 'n'
         in the MacLaurin expansion
         """
-        name = "\\tilde{e}^{%s}"%self.name
-        x = MatrixNumeric(name=name)
+        name = LazyName("\\tilde{e}^{%s}", self._name)
+        x = MatrixNumeric(name=name, dtype=self.dtype, copy=self.copy)
         if self.value is None:
             raise TypeError("unsupported operand type for Inverse: %s" % (type(self.value)))
         else:
@@ -1731,12 +2128,62 @@ class MatrixNumeric(ParameterNumeric):
         """
         Matrix square root
         """
-        name = "\\sqrt{%s}"%self.name
-        x = MatrixNumeric(name=name)
+        name = LazyName("\\sqrt{%s}", self._name)
+        x = MatrixNumeric(name=name, dtype=self.dtype, copy=self.copy)
         if self.value is None:
             raise TypeError("unsupported operand type for Inverse: %s" % (type(self.value)))
         else:
-            x.value = sqrtm(self.value)
+            value = self._functionHermitian(lambda w: numpy.sqrt(_realSpectrum(w, w >= 0)))
+            if value is None:
+                value = sqrtm(self._dense_value())
+            x.value = value
+        return x
+    # ----------------------------------------------------------
+    def Log(self):
+        """
+        Matrix natural logarithm
+        """
+        name = LazyName("\\log\\left(%s\\right)", self._name)
+        x = MatrixNumeric(name=name, dtype=self.dtype, copy=self.copy)
+        if self.value is None:
+            raise TypeError("unsupported operand type for Log: %s" % (type(self.value)))
+        else:
+            value = self._functionHermitian(lambda w: numpy.log(_realSpectrum(w, w > 0)))
+            if value is None:
+                value = logm(self._dense_value())
+            x.value = value
+        return x
+    # ----------------------------------------------------------
+    def Power(self, y):
+        """
+        Matrix power with real exponent 'y'
+        """
+        name = LazyName("\\left(%%s\\right)^{%s}"%y, self._name)
+        x = MatrixNumeric(name=name, dtype=self.dtype, copy=self.copy)
+        if self.value is None:
+            raise TypeError("unsupported operand type for Power: %s" % (type(self.value)))
+        else:
+            value = self._functionHermitian(lambda w: numpy.power(_realSpectrum(w, w >= 0), y))
+            if value is None:
+                value = fractional_matrix_power(self._dense_value(), y)
+            x.value = value
+        return x
+    # ----------------------------------------------------------
+    def VonNeumannEntropy(self, base=2):
+        """
+        Von Neumann entropy -Tr(M log(M)) of a density matrix M, 
+        computed from its eigenvalues
+
+        INPUTS
+        -------------
+            base : float (>0)
+                base of the logarithm
+        """
+        name = LazyName("S\\left(%s\\right)", self._name)
+        x = ParameterNumeric(name=name, type="scalar")
+        w = numpy.real(self.Eigenvalues())
+        w = w[w > 0]
+        x.value = -numpy.sum(w*numpy.log(w))/numpy.log(base)
         return x
     # ----------------------------------------------------------
     def SqrtTruncated(self, n):
@@ -1744,8 +2191,8 @@ class MatrixNumeric(ParameterNumeric):
         Matrix square root truncated up to finite order 'n'
         in the Taylor expansion
         """
-        name = "\\tilde{\\sqrt{%s}}"%self.name
-        x = MatrixNumeric(name=name)
+        name = LazyName("\\tilde{\\sqrt{%s}}", self._name)
+        x = MatrixNumeric(name=name, dtype=self.dtype, copy=self.copy)
         if self.value is None:
             raise TypeError("unsupported operand type for Inverse: %s" % (type(self.value)))
         else:
@@ -1760,7 +2207,7 @@ class MatrixNumeric(ParameterNumeric):
         Matrix trace distance
         """
         other_temp = self.prepare_other(other)
-        name = "\\left||%s-%s\\right||_{1}"%(self.name, other_temp.name)
+        name = LazyName("\\left||%s-%s\\right||_{1}", self._name, other_temp._name)
         if self.value is None or other_temp.value is None:
             raise TypeError("Incompatible operand types (%s. %s)"%(type(self), type(other)))
         else:
@@ -1775,9 +2222,35 @@ class MatrixNumeric(ParameterNumeric):
         Returns the Hermitian part of the matrix
         """
         x = (self+self.Dagger())/2
-        x.name = self.name
+        x.name = self._name
+        return x
+    # ----------------------------------------------------------
+    def ToSparse(self):
+        """
+        Returns a copy of the matrix, whose value is stored as a scipy.sparse array
+        """
+        x = MatrixNumeric(name=self._name, dtype=self.dtype, copy=self.copy, sparse=True)
+        x.value = self.value
+        return x
+    # ----------------------------------------------------------
+    def ToDense(self):
+        """
+        Returns a copy of the matrix, whose value is stored as a dense numpy.ndarray
+        """
+        x = MatrixNumeric(name=self._name, dtype=self.dtype, copy=self.copy, sparse=False)
+        x.value = self.value
         return x
     # ----------------------------------------------------------
+    def _scalar_value(self, other):
+        """
+        Returns the value of the other operand if it is a scalar, and None otherwise
+        """
+        if type(other) in NUMBER_TYPES:
+            return other
+        elif getattr(other, "type", None) == "scalar":
+            return other.value
+        return None
+    # ----------------------------------------------------------
     def prepare_other(self, other):
         """
         Checks if the other operand is of the same type as self and, in case not
@@ -1787,21 +2260,21 @@ class MatrixNumeric(ParameterNumeric):
             if other.type == "vector":
                 return other
             elif other.type == "scalar":
-                other_temp = MatrixNumeric(name=other.name)
+                other_temp = MatrixNumeric(name=other.name, dtype=self.dtype, copy=self.copy)
                 other_temp.value = other.value*numpy.ones(self.shape)
                 return other_temp
         except:
             if type(other) in NUMBER_TYPES:
                 if "int" in str(type(other)):
                     other = float(other)
-                other_temp = MatrixNumeric(name=str(other))
+                other_temp = MatrixNumeric(name=str(other), dtype=self.dtype, copy=self.copy)
                 other_temp.value = other*numpy.ones(self.shape)
             else:
                 raise TypeError("Incompatible operand types (%s. %s)"%(type(self), type(other)))
             return other_temp
     #-------------------------------------------------------------
     @classmethod
-    def Zeros(cls, shape, name=None):
+    def Zeros(cls, shape, name=None, dtype=None, sparse=None):
         """
         Creates a matrix filled with zeros, of the given shape
         """
@@ -1809,12 +2282,15 @@ class MatrixNumeric(ParameterNumeric):
             name = "\\mathbf{0}_{{%s\\times%s}"%(shape[0], shape[1])
         else:    
             name = "\\mathbf{0}^{\\left(%s\\right)}_{%s\\times%s}"%(name, shape[0], shape[1])
-        x = MatrixNumeric(name=name)
-        x.value = numpy.zeros(shape)
+        x = MatrixNumeric(name=name, dtype=dtype, sparse=sparse)
+        if sparse:
+            x.value = scipy.sparse.csr_array(tuple(shape))
+        else:
+            x.value = numpy.zeros(shape)
         return x
     #-------------------------------------------------------------
     @classmethod
-    def Ones(cls, shape, name=None):
+    def Ones(cls, shape, name=None, dtype=None):
         """
         Creates a matrix filled with ones, of the given shape
         """
@@ -1822,12 +2298,12 @@ class MatrixNumeric(ParameterNumeric):
             name = "\\mathbf{1}_{{%s\\times%s}"%(shape[0], shape[1])
         else:    
             name = "\\mathbf{1}^{\\left(%s\\right)}_{%s\\times%s}"%(name, shape[0], shape[1])
-        x = MatrixNumeric(name=name)
+        x = MatrixNumeric(name=name, dtype=dtype)
         x.value = numpy.ones(shape)
         return x
     #-------------------------------------------------------------
     @classmethod
-    def Eye(cls, n, name=None):
+    def Eye(cls, n, name=None, dtype=None, sparse=None):
         """
         Creates an identity matrix, of the given size 
         """
@@ -1835,8 +2311,11 @@ class MatrixNumeric(ParameterNumeric):
             name = "\\mathbb{I}_{%d}"%(n)
         else:    
             name = "\\mathbb{I}^{\\left(%s\\right)}_{%d}"%(name, n)
-        x = MatrixNumeric(name=name)
-        x.value = numpy.eye(n)
+        x = MatrixNumeric(name=name, dtype=dtype, sparse=sparse)
+        if sparse:
+            x.value = scipy.sparse.identity(n, format=SPARSE_FORMAT)
+        else:
+            x.value = numpy.eye(n)
         return x
     #-------------------------------------------------------------
     @classmethod
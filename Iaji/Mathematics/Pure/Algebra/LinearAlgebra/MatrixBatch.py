@@ -0,0 +1,322 @@
+"""
+This module describes a batch of numerical matrices of the same shape,
+stored as a single (B, n, m) array, so that operations on many matrices
+(e.g., parameter sweeps) are computed with vectorized numpy calls.
+"""
+#%%
+import numpy
+from scipy.linalg import expm
+from Iaji.Mathematics.Parameter import ParameterNumeric, LazyName
+from Iaji.Mathematics.Pure.Algebra.LinearAlgebra.Matrix import MatrixNumeric, \
+    ACCEPTED_DTYPES, DEFAULT_DTYPE, NUMBER_TYPES
+from Iaji.Exceptions import InvalidArgumentError
+from .Exceptions import InconsistentShapeError
+#%%
+print_separator = "-----------------------------------------------"
+#%%
+class MatrixBatchNumeric(ParameterNumeric):
+    """
+    This class describes a batch of B numerical matrices of shape (n, m).
+    Its value is stored as a numpy.ndarray of shape (B, n, m).
+    Operations are applied to each matrix of the batch. A single MatrixNumeric
+    operand is broadcast to all the matrices of the batch.
+    """
+    # ----------------------------------------------------------
+    def __init__(self, name="M", value=None, dtype=None):
+        """
+        INPUTS
+        ----------
+            name : str
+                Name of the batch
+            value : array-like of shape (B, n, m)
+                Values of the matrices
+            dtype : type in ACCEPTED_DTYPES
+                Data type used to store the value. If None, DEFAULT_DTYPE is used.
+        """
+        if dtype is None:
+            dtype = DEFAULT_DTYPE
+        if numpy.dtype(dtype) not in [numpy.dtype(t) for t in ACCEPTED_DTYPES]:
+            raise InvalidArgumentError("Invalid data type %s. Accepted data types are %s"%(dtype, ACCEPTED_DTYPES))
+        self._dtype = numpy.dtype(dtype)
+        self._eigenvalues = None
+        super().__init__(name=name, type="vector", value=value)
+    # ----------------------------------------------------------
+    # ----------------------------------------------------------
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        if value is not None:
+            value = numpy.asarray(value)
+            if value.dtype.kind == "c" and self._dtype.kind == "f":
+                self._dtype = numpy.dtype(numpy.complex128)
+            value = numpy.asarray(value, dtype=self._dtype)
+            if value.ndim != 3:
+                raise InconsistentShapeError("The value of a matrix batch must have shape (B, n, m), but has shape %s"%(value.shape,))
+            self._value = value
+            self._shape = value.shape
+        else:
+            self._value = None
+            self._shape = None
+        self._eigenvalues = None
+        self.value_changed.emit()  # emit value changed signal
+
+    @value.deleter
+    def value(self):
+        del self._value
+    # ----------------------------------------------------------
+    # ----------------------------------------------------------
+    @property
+    def shape(self):
+        return self._shape
+
+    @shape.deleter
+    def shape(self):
+        del self._shape
+    # ----------------------------------------------------------
+    # ----------------------------------------------------------
+    @property
+    def dtype(self):
+        return self._dtype
+
+    @dtype.deleter
+    def dtype(self):
+        del self._dtype
+    # ----------------------------------------------------------
+    # ----------------------------------------------------------
+    @property
+    def eigenvalues(self):
+        return self._eigenvalues
+
+    @eigenvalues.deleter
+    def eigenvalues(self):
+        del self._eigenvalues
+    # ----------------------------------------------------------
+    # ----------------------------------------------------------
+    def __str__(self):
+        s = super().__str__()
+        s += "\n" \
+             + "shape: " + self.shape.__str__()
+        return s.replace("PARAMETER", "MATRIX BATCH")
+    # ----------------------------------------------------------
+    def __len__(self):
+        return self.shape[0]
+    # ----------------------------------------------------------
+    def __getitem__(self, index):
+        """
+        Returns the matrix of the batch at the input index, as an Iaji MatrixNumeric
+        """
+        x = MatrixNumeric(name=LazyName("%s_{%d}"%("%s", index), self._name), dtype=self.dtype)
+        x.value = self.value[index]
+        return x
+    # ----------------------------------------------------------
+    def ToList(self):
+        """
+        Converts the batch to a list of Iaji MatrixNumeric
+        """
+        return [self[j] for j in range(len(self))]
+    # ----------------------------------------------------------
+    @classmethod
+    def FromList(cls, matrices, name=None):
+        """
+        Creates a batch from a list of matrices of the same shape
+
+        INPUTS
+        ---------------
+            matrices: 1D array-like of Iaji MatrixNumeric or numpy.ndarray
+        """
+        assert len(matrices) > 0, \
+            "At least one input matrix is expected"
+        value = numpy.stack([getattr(m, "value", m) for m in matrices])
+        if name is None:
+            name = "\\left\\{%s\\right\\}"%getattr(matrices[0], "name", "M")
+        dtype = value.dtype if value.dtype in [numpy.dtype(t) for t in ACCEPTED_DTYPES] else None
+        return cls(name=name, value=value, dtype=dtype)
+    # ----------------------------------------------------------
+    def isSquare(self):
+        """
+        This function returns True if and only if the matrices are square
+        """
+        if self.value is None:
+            raise TypeError("Cannot check shape because the value of matrix batch " + self.name + " is None")
+        return self.shape[1] == self.shape[2]
+    # ----------------------------------------------------------
+    def isHermitian(self, tolerance=1e-12):
+        """
+        This function returns True if and only if all the matrices are Hermitian,
+        within the input relative tolerance
+        """
+        value = self.value
+        scale = numpy.max(numpy.abs(value)) if value.size > 0 else 0
+        return self.isSquare() and \
+            numpy.allclose(value, numpy.conjugate(numpy.swapaxes(value, -1, -2)), rtol=0, atol=tolerance*scale)
+    # ----------------------------------------------------------
+    def _result(self, name, value):
+        x = MatrixBatchNumeric(name=name, dtype=self.dtype)
+        x.value = value
+        return x
+    # ----------------------------------------------------------
+    def prepare_other(self, other):
+        """
+        Returns the value of the other operand, in a shape that broadcasts
+        against the value of the batch, and its name.
+        A MatrixNumeric is broadcast to all the matrices of the batch;
+        a 1D array of length B multiplies each matrix by the corresponding element.
+        """
+        if isinstance(other, MatrixBatchNumeric):
+            if len(other) != len(self):
+                raise InconsistentShapeError("Incompatible batch sizes %d and %d"%(len(self), len(other)))
+            return other.value, other._name
+        elif isinstance(other, ParameterNumeric):
+            value = numpy.asarray(other.value)
+            if other.type == "scalar" or value.ndim == 1:
+                value = numpy.reshape(value, (-1, 1, 1))
+            return value, other._name
+        elif type(other) in NUMBER_TYPES:
+            return other, str(other)
+        else:
+            value = numpy.asarray(other)
+            if value.ndim == 1:
+                value = numpy.reshape(value, (-1, 1, 1))
+            return value, "X"
+    # ----------------------------------------------------------
+    def __add__(self, other):
+        other_value, other_name = self.prepare_other(other)
+        return self._result(LazyName("\\left(%s+%s\\right)", self._name, other_name), self.value + other_value)
+    # ----------------------------------------------------------
+    def __sub__(self, other):
+        other_value, other_name = self.prepare_other(other)
+        return self._result(LazyName("\\left(%s-%s\\right)", self._name, other_name), self.value - other_value)
+    # ----------------------------------------------------------
+    def __mul__(self, other):
+        """
+        Elementwise multiplication
+        """
+        other_value, other_name = self.prepare_other(other)
+        return self._result(LazyName("%s*%s", self._name, other_name), self.value * other_value)
+    # ----------------------------------------------------------
+    def __truediv__(self, other):
+        """
+        Elementwise division
+        """
+        other_value, other_name = self.prepare_other(other)
+        return self._result(LazyName("%s/%s", self._name, other_name), self.value / other_value)
+    # ----------------------------------------------------------
+    def __matmul__(self, other):
+        """
+        Matrix multiplication
+        """
+        other_value, other_name = self.prepare_other(other)
+        return self._result(LazyName("%s%s", self._name, other_name), self.value @ other_value)
+    # ----------------------------------------------------------
+    def __rmatmul__(self, other):
+        other_value, other_name = self.prepare_other(other)
+        return self._result(LazyName("%s%s", other_name, self._name), other_value @ self.value)
+    # ----------------------------------------------------------
+    def __neg__(self):
+        return self._result(LazyName("-%s", self._name), -self.value)
+    # ----------------------------------------------------------
+    def Dagger(self):
+        """
+        Hermitian conjugate
+        """
+        return self._result(LazyName("\\left(%s\\right)^\\dagger", self._name), \
+                            numpy.conjugate(numpy.swapaxes(self.value, -1, -2)))
+    # ----------------------------------------------------------
+    def T(self):
+        """
+        Transpose
+        """
+        return self._result(LazyName("\\left(%s^T\\right)", self._name), numpy.swapaxes(self.value, -1, -2))
+    # ----------------------------------------------------------
+    def Conjugate(self):
+        """
+        Complex conjugate
+        """
+        return self._result(LazyName("\\left(%s^*\\right)", self._name), numpy.conjugate(self.value))
+    # ----------------------------------------------------------
+    def Hermitian(self):
+        """
+        Returns the Hermitian part of the matrices
+        """
+        x = self._result(self._name, (self.value + numpy.conjugate(numpy.swapaxes(self.value, -1, -2)))/2)
+        return x
+    # ----------------------------------------------------------
+    def Otimes(self, other):
+        """
+        Kronecker tensor product of each matrix of the batch with the corresponding
+        matrix of other (or with other, if it is a single matrix)
+        """
+        other_value, other_name = self.prepare_other(other)
+        other_value = numpy.asarray(other_value)
+        if other_value.ndim == 2:
+            other_value = other_value[numpy.newaxis]
+        B, n, m = self.shape
+        p, q = other_value.shape[-2:]
+        value = numpy.einsum("bij,bkl->bikjl", self.value, \
+                             numpy.broadcast_to(other_value, (B, p, q))).reshape((B, n*p, m*q))
+        return self._result(LazyName("%s\\otimes\\;%s", self._name, other_name), value)
+    # ----------------------------------------------------------
+    def Inverse(self):
+        """
+        Inverse of each matrix
+        """
+        return self._result(LazyName("\\left(%s^+\\right)", self._name), numpy.linalg.inv(self.value))
+    # ----------------------------------------------------------
+    def Exp(self):
+        """
+        Matrix exponential of each matrix.
+        Batches of Hermitian matrices are exponentiated via their eigendecomposition.
+        """
+        if self.isHermitian():
+            w, V = numpy.linalg.eigh(self.value)
+            self._eigenvalues = w
+            value = (V * numpy.exp(w)[:, numpy.newaxis, :]) @ numpy.conjugate(numpy.swapaxes(V, -1, -2))
+        else:
+            value = expm(self.value)
+        return self._result(LazyName("e^{%s}", self._name), value)
+    # ----------------------------------------------------------
+    def Trace(self):
+        """
+        Trace of each matrix
+
+        OUTPUTS
+        -------------
+            Iaji ParameterNumeric of type "vector", with value of shape (B,)
+        """
+        x = ParameterNumeric(name=LazyName("Tr\\left(%s\\right)", self._name), type="vector")
+        x.value = numpy.trace(self.value, axis1=-2, axis2=-1)
+        return x
+    # ----------------------------------------------------------
+    def Determinant(self):
+        """
+        Determinant of each matrix
+
+        OUTPUTS
+        -------------
+            Iaji ParameterNumeric of type "vector", with value of shape (B,)
+        """
+        x = ParameterNumeric(name=LazyName("\\left|%s\\right|", self._name), type="vector")
+        x.value = numpy.linalg.det(self.value)
+        return x
+    # ----------------------------------------------------------
+    def Eigenvalues(self):
+        """
+        Eigenvalues of each matrix.
+
+        OUTPUTS
+        -------------
+            numpy.ndarray of shape (B, n). For batches of Hermitian matrices,
+            the eigenvalues are real and sorted in ascending order.
+        """
+        if not self.isSquare():
+            raise TypeError("Cannot compute the eigenvalues because the matrices of batch "+self.name+" are not square")
+        if self._eigenvalues is None:
+            if self.isHermitian():
+                self._eigenvalues = numpy.linalg.eigvalsh(self.value)
+            else:
+                self._eigenvalues = numpy.linalg.eigvals(self.value)
+        return self._eigenvalues
+    # ----------------------------------------------------------
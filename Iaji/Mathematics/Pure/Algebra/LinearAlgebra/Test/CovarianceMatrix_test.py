@@ -14,3 +14,6 @@ V.symbolic.expression = expression
 V.numeric.value = value
 print("Variables of covariance matrix %s:"%V.name)
 print(V)
+#Functions of a real covariance matrix with non-negative eigenvalues stay real
+for function in ["Sqrt", "Log"]:
+    print("%s - data type: %s"%(function, getattr(V.numeric, function)().dtype))
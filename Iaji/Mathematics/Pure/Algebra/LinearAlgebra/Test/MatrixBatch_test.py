@@ -0,0 +1,27 @@
+"""
+This script tests the module MatrixBatch.py
+"""
+
+from Iaji.Mathematics.Pure.Algebra.LinearAlgebra.MatrixBatch import MatrixBatchNumeric
+from Iaji.Mathematics.Pure.Algebra.LinearAlgebra.Matrix import MatrixNumeric
+import numpy
+
+B, n = 5, 3
+values = numpy.random.randn(B, n, n) + 1j*numpy.random.randn(B, n, n)
+A = MatrixBatchNumeric(name="A", value=values)
+print(A)
+H = (A + A.Dagger())/2
+print("Traces of %s:"%H.name)
+print(H.Trace().value)
+print("Determinants of %s:"%H.name)
+print(H.Determinant().value)
+print("Eigenvalues of %s:"%H.name)
+print(H.Eigenvalues())
+X = MatrixNumeric(name="X", value=numpy.eye(2))
+print("Shape of %s:"%(A.Otimes(X).name))
+print(A.Otimes(X).shape)
+matrices = A.Exp().ToList()
+print(matrices[0])
+print("Maximum deviation of %s from %s:"%((A @ A.Inverse()).name, "I"))
+print(numpy.max(numpy.abs((A @ A.Inverse()).value - numpy.eye(n))))
+print(MatrixBatchNumeric.FromList(matrices))
@@ -450,7 +450,8 @@ class QuantumStateNumeric:
         #self._density_operator.value /= numpy.trace(self.density_operator.value)
         #other._density_operator = other.density_operator.Hermitian()
         #other._density_operator.value /= numpy.trace(other.density_operator.value)
-        x = (((self.density_operator.Sqrt() @ other.density_operator @ self.density_operator.Sqrt()).Sqrt()).Trace())**2
+        sqrt_rho = self.density_operator.Sqrt()
+        x = (((sqrt_rho @ other.density_operator @ sqrt_rho).Sqrt()).Trace())**2
         x.name = "\\mathcal{F}\\left(%s\\;%s\\right)"\
             %(self.density_operator.name, other.density_operator.name)
         return x
@@ -463,7 +464,9 @@ class QuantumStateNumeric:
         Compute the average value of the input linear operator
         given the quantum state
         """
-        result = (self.density_operator @ operator).Trace()
+        #Tr(rho @ O) is computed without forming the product, so that
+        #sparse operators are only visited at their nonzero elements
+        result = self.density_operator.TraceProduct(operator)
         result.name = "\\left\\langle%s\\right\\rangle_{%s}"\
                       %(operator.name, self.density_operator.name)
         return result
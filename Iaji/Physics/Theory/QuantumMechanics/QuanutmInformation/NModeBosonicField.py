@@ -15,13 +15,134 @@ from Iaji.Physics.Theory.QuantumMechanics.QuanutmInformation.OneModeBosonicField
 from Iaji.Mathematics.Pure.Algebra.LinearAlgebra.Matrix import \
     MatrixSymbolic, MatrixNumeric, Matrix
 from Iaji.Mathematics.Parameter import \
-    ParameterSymbolic, ParameterNumeric, Parameter
+    ParameterSymbolic, ParameterNumeric, Parameter, LazyName
 from Iaji.Mathematics.Pure.Algebra.LinearAlgebra.HilbertSpace import \
     HilbertSpace
+from Iaji.Physics.Theory.QuantumMechanics.SimpleHarmonicOscillator.SimpleHarmonicOscillator import \
+    lossKrausOperators, amplifierKrausOperators, measurementBasis, MEASUREMENT_GRID_SIZE
+from Iaji.Utilities.statistics import DiscreteSampler
 from copy import deepcopy as copy
+import scipy.sparse
 # In[]
-MEASURABLES = ["n", "x"]
+MEASURABLES = ["n", "x", "a"]
 POVM_TYPES = ["on/off detection"]
+MAX_JOINT_OUTCOMES = 2**22 #maximum number of outcomes of a joint measurement on several modes
+# In[]
+def partialTrace(rho, dimensions, traced_indices):
+    """
+    Computes the partial trace of a density operator on a tensor product 
+    of Hilbert spaces, over the selected subsystems.
+    The density operator is viewed as a tensor of shape (d_1, ..., d_N, d_1, ..., d_N),
+    and all the selected subsystems are traced out with a single contraction.
+    
+    INPUTS
+    ---------------
+        rho : 2-D array-like
+            density operator, of shape (prod(dimensions), prod(dimensions))
+        dimensions : iterable of int
+            Hilbert space dimensions of the subsystems (d_1, ..., d_N)
+        traced_indices : iterable of int
+            indices of the subsystems to be traced out
+    OUTPUTS
+    -------------
+        reduced density operator : 2-D numpy.ndarray
+    """
+    if scipy.sparse.issparse(rho):
+        rho = rho.toarray()
+    dimensions = [int(d) for d in dimensions]
+    N = len(dimensions)
+    traced_indices = set(int(j) for j in numpy.atleast_1d(traced_indices))
+    kept_indices = [j for j in range(N) if j not in traced_indices]
+    rho_tensor = numpy.reshape(rho, dimensions+dimensions)
+    #Row axes are labeled 0, ..., N-1; column axes are labeled N, ..., 2N-1, 
+    #except for the traced subsystems, whose column axes have the same label as the row axes.
+    rho_axes = list(range(N)) + [j if j in traced_indices else N+j for j in range(N)]
+    output_axes = kept_indices + [N+j for j in kept_indices]
+    D = int(numpy.prod([dimensions[j] for j in kept_indices]))
+    return numpy.einsum(rho_tensor, rho_axes, output_axes).reshape((D, D))
+# In[]
+def applyLocalOperator(rho, dimensions, operator, indices):
+    """
+    Computes U rho U^\dagger, where the operator U acts only on the selected 
+    subsystems of a tensor product of Hilbert spaces, without embedding U
+    in the full Hilbert space.
+    The density operator is viewed as a tensor of shape (d_1, ..., d_N, d_1, ..., d_N),
+    and U is contracted with the axes of the selected subsystems only,
+    as in quantum circuit simulations. The cost scales as D^2 * d_local, where
+    D is the total dimension and d_local is the dimension of U.
+    
+    INPUTS
+    ---------------
+        rho : 2-D array-like
+            density operator, of shape (prod(dimensions), prod(dimensions))
+        dimensions : iterable of int
+            Hilbert space dimensions of the subsystems (d_1, ..., d_N)
+        operator : 2-D array-like
+            local operator, acting on the tensor product of the selected subsystems,
+            in the order given by 'indices'
+        indices : iterable of int
+            indices of the subsystems the operator acts on
+    OUTPUTS
+    -------------
+        transformed density operator : 2-D numpy.ndarray
+    """
+    if scipy.sparse.issparse(rho):
+        rho = rho.toarray()
+    if scipy.sparse.issparse(operator):
+        operator = operator.toarray()
+    dimensions = [int(d) for d in dimensions]
+    indices = [int(j) for j in numpy.atleast_1d(indices)]
+    N, k = len(dimensions), len(indices)
+    D = int(numpy.prod(dimensions))
+    local_dimensions = [dimensions[j] for j in indices]
+    U = numpy.reshape(operator, local_dimensions+local_dimensions)
+    rho_tensor = numpy.reshape(rho, dimensions+dimensions)
+    #U rho: contract the input axes of U with the row axes of the selected subsystems
+    rho_tensor = numpy.tensordot(U, rho_tensor, axes=(list(range(k, 2*k)), indices))
+    rho_tensor = numpy.moveaxis(rho_tensor, list(range(k)), indices)
+    #(U rho) U^\dagger: contract the input axes of U^* with the column axes of the selected subsystems
+    column_indices = [N+j for j in indices]
+    rho_tensor = numpy.tensordot(numpy.conjugate(U), rho_tensor, axes=(list(range(k, 2*k)), column_indices))
+    rho_tensor = numpy.moveaxis(rho_tensor, list(range(k)), column_indices)
+    return rho_tensor.reshape((D, D))
+# In[]
+def applyLocalChannel(rho, dimensions, kraus_operators, indices):
+    """
+    Computes sum_k K_k rho K_k^\dagger, where the Kraus operators K_k act only on the selected 
+    subsystems of a tensor product of Hilbert spaces.
+    The Kraus operators are combined into the superoperator sum_k K_k (x) K_k^*, which is
+    contracted with the row and column axes of the selected subsystems in a single operation.
+    
+    INPUTS
+    ---------------
+        rho : 2-D array-like
+            density operator, of shape (prod(dimensions), prod(dimensions))
+        dimensions : iterable of int
+            Hilbert space dimensions of the subsystems (d_1, ..., d_N)
+        kraus_operators : 3-D array-like
+            Kraus operators, of shape (number of Kraus operators, d_local, d_local), acting on 
+            the tensor product of the selected subsystems, in the order given by 'indices'
+        indices : iterable of int
+            indices of the subsystems the channel acts on
+    OUTPUTS
+    -------------
+        transformed density operator : 2-D numpy.ndarray
+    """
+    if scipy.sparse.issparse(rho):
+        rho = rho.toarray()
+    dimensions = [int(d) for d in dimensions]
+    indices = [int(j) for j in numpy.atleast_1d(indices)]
+    N, k = len(dimensions), len(indices)
+    D = int(numpy.prod(dimensions))
+    local_dimensions = [dimensions[j] for j in indices]
+    #Superoperator S[a, c, b, d] = sum_k K_k[a, b] K_k[c, d]^*
+    S = numpy.einsum("kab,kcd->acbd", kraus_operators, numpy.conjugate(kraus_operators))
+    S = numpy.reshape(S, 4*local_dimensions)
+    rho_tensor = numpy.reshape(rho, dimensions+dimensions)
+    axes = indices + [N+j for j in indices]
+    rho_tensor = numpy.tensordot(S, rho_tensor, axes=(list(range(2*k, 4*k)), axes))
+    rho_tensor = numpy.moveaxis(rho_tensor, list(range(2*k)), axes)
+    return rho_tensor.reshape((D, D))
 # In[N-mode bosonic field]
 class NModeBosonicField: #TODO
     """
@@ -263,36 +384,36 @@ class NModeBosonicFieldNumeric:
                       for j in range(N)]
         return NModeBosonicFieldNumeric(name=name, modes_list=modes_list, hbar=1)
     #----------------------------------------------------------
-    def PartialTrace(self, traced_mode_name):
+    def PartialTrace(self, traced_mode_names):
         """
-        Traces out the mode with name 'traced_mode'
+        Traces out the modes with names 'traced_mode_names'
+        
+        INPUTS
+        ----------------
+            traced_mode_names : str or iterable of str
+                names of the modes to be traced out. All of them are traced out 
+                with a single tensor contraction.
         """
-        field = copy(self)
-        assert traced_mode_name in field.mode_names, \
-            "No mode named %s in the field"%(traced_mode_name)
-        traced_index = numpy.where(numpy.array(field.mode_names) == traced_mode_name)[0][0]
-        traced_mode = field._modes_list[traced_index]
-        modes_before = field._modes_list[0:traced_index]
-        modes_after = field._modes_list[traced_index+1:]
-        modes_list = modes_before + modes_after
-        name = "Tr_{%s}\\left(%s\\right)"%(traced_mode_name, field._name)
-        x = NModeBosonicFieldNumeric(modes_list, name, field._hbar.value)
+        traced_mode_names = [str(name) for name in numpy.atleast_1d(traced_mode_names)]
+        for traced_mode_name in traced_mode_names:
+            assert traced_mode_name in self.mode_names, \
+                "No mode named %s in the field"%(traced_mode_name)
+        traced_indices = [j for j in range(self.N) if self.mode_names[j] in traced_mode_names]
+        #Only the remaining modes are copied
+        modes_list = copy([self._modes_list[j] for j in range(self.N) if j not in traced_indices])
+        traced_names = ",".join([self._modes_list[j].name for j in traced_indices])
+        name = "Tr_{%s}\\left(%s\\right)"%(",".join(traced_mode_names), self._name)
+        x = NModeBosonicFieldNumeric(modes_list, name, self._hbar.value)
         x.state.wigner_function.value = None
         x.state.covariance_matrix.value = None
         #Compute the partial trace of the density operator
-        rho = copy(field).state._density_operator
-        rho_new = MatrixNumeric.Zeros((x.hilbert_space.dimension, x.hilbert_space.dimension))
-        for j in range(traced_mode.hilbert_space.dimension):
-            ej = traced_mode.hilbert_space.CanonicalBasisVector(j)
-            M_j = MatrixNumeric.TensorProduct(\
-                  [*[MatrixNumeric.Eye(mode.hilbert_space.dimension) for mode in modes_before], \
-                   ej.numeric.T(), \
-                    *[MatrixNumeric.Eye(mode.hilbert_space.dimension) for mode in modes_after]])
-            rho_new += M_j @ rho @ M_j.T()
+        rho = self.state._density_operator
+        rho_new = MatrixNumeric(name=LazyName("Tr_{%s}\\left(%s\\right)", traced_names, rho._name))
+        rho_new.value = partialTrace(rho.value, \
+                                     [mode.hilbert_space.dimension for mode in self._modes_list], traced_indices)
         x.state._density_operator = rho_new
-        x.state.name = "Tr_{%s}\\left(%s\\right)"%(traced_mode.name, field._state.name)
-        x.state.density_operator.name = "Tr_{%s}\\left(%s\\right)"%(traced_mode.name, field._state.density_operator.name)
-        x.state._density_operator = x.state.density_operator.Hermitian()
+        x.state.name = "Tr_{%s}\\left(%s\\right)"%(traced_names, self._state.name)
+        x.state._density_operator = x.state.density_operator.Hermitian().Freeze()
         return x
     #----------------------------------------------------------
     def SelectModes(self, modes):
@@ -309,13 +430,126 @@ class NModeBosonicFieldNumeric:
             assert numpy.all([modes[j] in self.mode_names for j in range(len(modes))]), \
                 "Not all the specified modes %s are contained in the field"\
                     %(modes)
-        field = self
-        traced_modes_names = list(set(self.mode_names)-set(modes))
-        for mode_name in traced_modes_names:
-            field = field.PartialTrace(mode_name)
+        else:
+            #Transform indices in names
+            modes = [self.mode_names[j] for j in modes]
+        traced_modes_names = [name for name in self.mode_names if name not in modes]
+        if len(traced_modes_names) == 0:
+            return copy(self)
+        return self.PartialTrace(traced_modes_names)
+    #----------------------------------------------------------
+    def _ModeIndex(self, mode):
+        """
+        Returns the index of the input mode, specified by name or index
+        """
+        if "str" in str(type(mode)):
+            assert mode in self.mode_names, \
+                "No such mode with name %s in the field"%mode
+            #Transform names in indices
+            return int(numpy.where(numpy.array(self.mode_names) == mode)[0][0])
+        return int(mode)
+    #----------------------------------------------------------
+    def _Target(self, inplace):
+        """
+        Returns the field on which an operation acts: self if 'inplace' is True,
+        else a copy of self. Copies share the (read-only) density operator and 
+        mode operators with self, until they are replaced.
+        """
+        return self if inplace else copy(self)
+    #----------------------------------------------------------
+    def _ApplyLocalOperator(self, operator, mode_indices, name=None, inplace=False):
+        """
+        Applies an operator that acts on the selected modes only, with a tensor
+        contraction on the corresponding axes of the density operator.
+        
+        INPUTS
+        ----------------
+            operator : Iaji MatrixNumeric
+                operator acting on the tensor product of the selected modes, 
+                in the order given by mode_indices
+            mode_indices : iterable of int
+                indices of the selected modes
+            name : str
+                name of the transformed density operator. If None, it is constructed from the
+                names of the operator and of the density operator
+            inplace : bool
+                If True, the field is modified instead of copied
+        """
+        field = self._Target(inplace)
+        rho = field.state.density_operator
+        if name is None:
+            name = LazyName("%s\\left(%s\\right)", operator._name, rho._name)
+        rho_new = applyLocalOperator(rho.value, [m.hilbert_space.dimension for m in field.modes_list], \
+                                     operator.value, mode_indices)
+        #Hermitian part
+        rho_new += numpy.conjugate(rho_new.T)
+        rho_new /= 2
+        x = MatrixNumeric(name=name, copy=False)
+        x.value = rho_new
+        field.state._density_operator = x.Freeze()
         return field
     #----------------------------------------------------------
-    def Displace(self, mode, alpha):
+    def _ApplyLocalChannel(self, kraus_operators, mode_indices, name=None, inplace=False):
+        """
+        Applies a quantum channel, described by Kraus operators that act on the selected 
+        modes only, with a tensor contraction on the corresponding axes of the density operator.
+        
+        INPUTS
+        ----------------
+            kraus_operators : 3-D array-like
+                Kraus operators, of shape (number of Kraus operators, d_local, d_local)
+            mode_indices : iterable of int
+                indices of the selected modes
+            name : str
+                name of the transformed density operator
+            inplace : bool
+                If True, the field is modified instead of copied
+        """
+        field = self._Target(inplace)
+        rho = field.state.density_operator
+        if name is None:
+            name = rho._name
+        rho_new = applyLocalChannel(rho.value, [m.hilbert_space.dimension for m in field.modes_list], \
+                                    kraus_operators, mode_indices)
+        #Hermitian part
+        rho_new += numpy.conjugate(rho_new.T)
+        rho_new /= 2
+        x = MatrixNumeric(name=name, copy=False)
+        x.value = rho_new
+        field.state._density_operator = x.Freeze()
+        return field
+    #----------------------------------------------------------
+    def _ChannelArguments(self, modes, parameters):
+        """
+        Returns the indices of the selected modes and the values of the associated 
+        channel parameters
+        """
+        modes = numpy.atleast_1d(modes)
+        parameters = numpy.atleast_1d(parameters)
+        assert len(parameters) == len(modes), \
+            "%d modes were specified, but %d channel parameters"%(len(modes), len(parameters))
+        if "str" in str(type(modes[0])):
+            assert numpy.all([modes[j] in self.mode_names for j in range(len(modes))]), \
+                "Not all the specified modes %s are contained in the field"\
+                    %(modes)
+        mode_indices = [self._ModeIndex(m) for m in modes]
+        def value(x):
+            try:
+                return float(numpy.real(x.value))
+            except AttributeError:
+                return float(numpy.real(x))
+        return mode_indices, [value(x) for x in parameters]
+    #----------------------------------------------------------
+    def _ChannelName(self, channel_name, mode_indices, parameters):
+        name = "%s_{"%channel_name
+        for j in mode_indices:
+            name += "%s"%self.modes_list[j].name
+        name += "}\\left("
+        name += ", ".join(["%.2f"%x for x in parameters])
+        name += "\\right)\\left(%s\\right)"%self.state.density_operator.name
+        return name
+    #----------------------------------------------------------
+    def Displace(self, mode, alpha, inplace=False):
         """
         Performs single-mode displacement operations on the selected mode       
         
@@ -326,28 +560,12 @@ class NModeBosonicFieldNumeric:
             alpha: type in {Iaji ParameterNumeric, complex}
                 Displacement to be applied on the selected mode
         """
-        if "str" in str(type(mode)):
-            assert mode in self.mode_names, \
-                "No such mode with name %s in the field"%mode
-            #Transform names in indices
-            mode_index = numpy.where(numpy.array(self.mode_names) == mode)[0][0]
-        #Compute the multimode displacement operator#
-        field = copy(self)
-        mode = field.modes_list[mode_index]
-        modes_before = field.modes_list[0:mode_index]
-        modes_after = field.modes_list[mode_index+1:]
-        #Construct the displacement operator
-        D = MatrixNumeric.TensorProduct([*[MatrixNumeric.Eye(m.hilbert_space.dimension) for m in modes_before], \
-                                         mode._DisplacementOperator(alpha), \
-                                        *[MatrixNumeric.Eye(m.hilbert_space.dimension) for m in modes_after]])
-        #Apply the displacement operator
-        rho_name = field.state.density_operator.name
-        field.state._density_operator = D @ field.state.density_operator @ D.Dagger()
-        field.state.density_operator.name = "%s\\left(%s\\right)"%(D.name, rho_name)
-        field.state._density_operator = field.state.density_operator.Hermitian()
-        return field
+        mode_index = self._ModeIndex(mode)
+        #Apply the single-mode displacement operator to the selected mode
+        D = self.modes_list[mode_index]._DisplacementOperator(alpha)
+        return self._ApplyLocalOperator(D, [mode_index], inplace=inplace)
     #----------------------------------------------------------
-    def Squeeze(self, mode, zeta):
+    def Squeeze(self, mode, zeta, inplace=False):
         """
         Performs single-mode squeezing on the selected mode       
         INPUTS
@@ -385,28 +603,12 @@ class NModeBosonicFieldNumeric:
         return field
         '''
         #New
-        if "str" in str(type(mode)):
-            assert mode in self.mode_names, \
-                "No such mode with name %s in the field"%mode
-            #Transform names in indices
-            mode_index = numpy.where(numpy.array(self.mode_names) == mode)[0][0]
-        #Compute the multimode displacement operator#
-        field = copy(self)
-        mode = field.modes_list[mode_index]
-        modes_before = field.modes_list[0:mode_index]
-        modes_after = field.modes_list[mode_index+1:]
-        #Construct the displacement operator
-        S = MatrixNumeric.TensorProduct([*[MatrixNumeric.Eye(m.hilbert_space.dimension) for m in modes_before], \
-                                         mode._SqueezingOperator(zeta), \
-                                        *[MatrixNumeric.Eye(m.hilbert_space.dimension) for m in modes_after]])
-        #Apply the displacement operator
-        rho_name = field.state.density_operator.name
-        field.state._density_operator = S @ field.state.density_operator @ S.Dagger()
-        field.state.density_operator.name = "%s\\left(%s\\right)"%(S.name, rho_name)
-        field.state._density_operator = field.state.density_operator.Hermitian()
-        return field
+        mode_index = self._ModeIndex(mode)
+        #Apply the single-mode squeezing operator to the selected mode
+        S = self.modes_list[mode_index]._SqueezingOperator(zeta)
+        return self._ApplyLocalOperator(S, [mode_index], inplace=inplace)
     #----------------------------------------------------------
-    def Rotate(self, mode, theta):
+    def Rotate(self, mode, theta, inplace=False):
         """
         OLD
         Performs single-mode rotation operations on the individual modes.
@@ -444,28 +646,12 @@ class NModeBosonicFieldNumeric:
             theta: type in {Iaji ParameterNumeric, complex}
                 Rotation angle to be applied on the selected mode
         """
-        if "str" in str(type(mode)):
-            assert mode in self.mode_names, \
-                "No such mode with name %s in the field"%mode
-            #Transform names in indices
-            mode_index = numpy.where(numpy.array(self.mode_names) == mode)[0][0]
-        #Compute the multimode displacement operator#
-        field = copy(self)
-        mode = field.modes_list[mode_index]
-        modes_before = field.modes_list[0:mode_index]
-        modes_after = field.modes_list[mode_index+1:]
-        #Construct the displacement operator
-        R = MatrixNumeric.TensorProduct([*[MatrixNumeric.Eye(m.hilbert_space.dimension) for m in modes_before], \
-                                         mode._RotationOperator(theta), \
-                                        *[MatrixNumeric.Eye(m.hilbert_space.dimension) for m in modes_after]])
-        #Apply the displacement operator
-        rho_name = field.state.density_operator.name
-        field.state._density_operator = R @ field.state.density_operator @ R.Dagger()
-        field.state.density_operator.name = "%s\\left(%s\\right)"%(R.name, rho_name)
-        field.state._density_operator = field.state.density_operator.Hermitian()
-        return field        
+        mode_index = self._ModeIndex(mode)
+        #Apply the single-mode rotation operator to the selected mode
+        R = self.modes_list[mode_index]._RotationOperator(theta)
+        return self._ApplyLocalOperator(R, [mode_index], inplace=inplace)        
     #----------------------------------------------------------
-    def TwoModeSqueeze(self, modes, zeta):
+    def TwoModeSqueeze(self, modes, zeta, inplace=False):
         """
         Performs two-mode squeezing on the input modes with two-mode squeezing
         parameter zeta
@@ -480,45 +666,26 @@ class NModeBosonicFieldNumeric:
         modes = numpy.atleast_1d(modes)
         assert modes.size == 2, \
             "Two modes must be specified"
-        if "str" in str(type(modes[0])):
-            #Transform names in indices
-            mode_indices = [numpy.where(numpy.array(self.mode_names) == modes[j])[0][0] \
-                            for j in range(modes.size)]
+        mode_indices = [self._ModeIndex(m) for m in modes]
         mode_indices.sort()
-        field = copy(self)
-        modes = [field.modes_list[j] for j in mode_indices]
-        modes_before = field.modes_list[0:mode_indices[0]]
-        modes_between = field.modes_list[mode_indices[0]+1:mode_indices[1]]
-        modes_after = field.modes_list[mode_indices[1]+1:]
-        #Compute the two-mode squeezing operator
+        modes = [self.modes_list[j] for j in mode_indices]
+        #Compute the two-mode squeezing operator, acting on the two selected modes only
         #Exponent
-        exponent1 = MatrixNumeric.TensorProduct([*[MatrixNumeric.Eye(m.hilbert_space.dimension) for m in modes_before], \
-                                                modes[0].a.Dagger()**2, \
-                                                *[MatrixNumeric.Eye(m.hilbert_space.dimension) for m in modes_between], \
-                                                modes[1].a.Dagger()**2, \
-                                                *[MatrixNumeric.Eye(m.hilbert_space.dimension) for m in modes_after]])
-        exponent2 = MatrixNumeric.TensorProduct([*[MatrixNumeric.Eye(m.hilbert_space.dimension) for m in modes_before], \
-                                                modes[0].a**2, \
-                                                *[MatrixNumeric.Eye(m.hilbert_space.dimension) for m in modes_between], \
-                                                modes[1].a**2, \
-                                                *[MatrixNumeric.Eye(m.hilbert_space.dimension) for m in modes_after]])
+        exponent1 = MatrixNumeric.TensorProduct([modes[0].a.Dagger(), modes[1].a.Dagger()])
+        exponent2 = MatrixNumeric.TensorProduct([modes[0].a, modes[1].a])
         exponent1 *= zeta
         try:
             exponent2 *= zeta.Conjugate()
             name = "\\hat{\\mathcal{S}}_{%s%s}\\left(%s\\right)\\left(%s\\right)"\
-                %(modes[0].name, modes[1].name, zeta.valuename, field.state.density_operator.name)
+                %(modes[0].name, modes[1].name, zeta.name, self.state.density_operator.name)
         except:
             exponent2 *= numpy.conjugate(zeta)
             name = "\\hat{\\mathcal{S}}_{%s%s}\\left(%s\\right)\\left(%s\\right)"\
-                %(modes[0].name, modes[1].name, zeta, field.state.density_operator.name)
+                %(modes[0].name, modes[1].name, zeta, self.state.density_operator.name)
         S = (exponent1-exponent2).Exp()
-        field.state._density_operator = S @ field.state.density_operator @ S.Dagger()
-        #field.state._density_operator /= field.state._density_operator.Trace()
-        field.state.density_operator.name = name
-        field.state._density_operator = field.state.density_operator.Hermitian()
-        return field
+        return self._ApplyLocalOperator(S, mode_indices, name=name, inplace=inplace)
      #----------------------------------------------------------   
-    def BeamSplitter(self, modes, R):
+    def BeamSplitter(self, modes, R, inplace=False):
         """
         Applies a two-port beam splitter to the selected modes, with power
         reflectivity R. 
@@ -535,45 +702,27 @@ class NModeBosonicFieldNumeric:
             assert numpy.all([modes[j] in self.mode_names for j in range(len(modes))]), \
                 "Not all the specified modes %s are contained in the field"\
                     %(modes)
-            #Transform names in indices
-            mode_indices = [numpy.where(numpy.array(self.mode_names) == modes[j])[0][0] \
-                            for j in range(modes.size)]
+        mode_indices = [self._ModeIndex(m) for m in modes]
         mode_indices.sort()
-        field = copy(self)
-        modes = [field.modes_list[j] for j in mode_indices]
-        modes_before = field.modes_list[0:mode_indices[0]]
-        modes_between = field.modes_list[mode_indices[0]+1:mode_indices[1]]
-        modes_after = field.modes_list[mode_indices[1]+1:]
-        #Compute the two-mode squeezing operator
+        modes = [self.modes_list[j] for j in mode_indices]
+        #Compute the beam splitter operator, acting on the two selected modes only
         try:
             theta = (R.Sqrt()).Arcsin()
         except:
            theta = numpy.arcsin(numpy.sqrt(R))
         #Exponent
-        exponent1 = MatrixNumeric.TensorProduct([*[MatrixNumeric.Eye(m.hilbert_space.dimension) for m in modes_before], \
-                                                modes[0].a.Dagger(), \
-                                                *[MatrixNumeric.Eye(m.hilbert_space.dimension) for m in modes_between], \
-                                                modes[1].a, \
-                                                *[MatrixNumeric.Eye(m.hilbert_space.dimension) for m in modes_after]])
-        exponent2 = MatrixNumeric.TensorProduct([*[MatrixNumeric.Eye(m.hilbert_space.dimension) for m in modes_before], \
-                                                modes[0].a, \
-                                                *[MatrixNumeric.Eye(m.hilbert_space.dimension) for m in modes_between], \
-                                                modes[1].a.Dagger(), \
-                                                *[MatrixNumeric.Eye(m.hilbert_space.dimension) for m in modes_after]])
+        exponent1 = MatrixNumeric.TensorProduct([modes[0].a.Dagger(), modes[1].a])
+        exponent2 = MatrixNumeric.TensorProduct([modes[0].a, modes[1].a.Dagger()])
         try:
              name = "\\hat{\\mathcal{B}}_{%s%s}\\left(R=%s\\right)\\left(%s\\right)"\
-                 %(modes[0].name, modes[1].name, R.name, field.state.density_operator.name)
+                 %(modes[0].name, modes[1].name, R.name, self.state.density_operator.name)
         except:
              name = "\\hat{\\mathcal{B}}_{%s%s}\\left(R=%s\\right)\\left(%s\\right)"\
-                 %(modes[0].name, modes[1].name, R, field.state.density_operator.name)
+                 %(modes[0].name, modes[1].name, R, self.state.density_operator.name)
         B = ((exponent1-exponent2)*theta).Exp()
-        field.state._density_operator = B @ field.state.density_operator @ B.Dagger()
-        #field.state._density_operator /= field.state._density_operator.Trace()
-        field.state.density_operator.name = name
-        field.state._density_operator = field.state.density_operator.Hermitian()
-        return field      
+        return self._ApplyLocalOperator(B, mode_indices, name=name, inplace=inplace)
     #----------------------------------------------------------
-    def Loss(self, modes, etas):
+    def Loss(self, modes, etas, inplace=False):
         """
         Applies bosonic loss to the selected field modes
         
@@ -584,39 +733,67 @@ class NModeBosonicFieldNumeric:
             etas : type in {Iaji ParameterNumeric, float}
                 transmission efficiencies
         """
-        field = copy(self)
-        modes = numpy.atleast_1d(modes)
-        etas = numpy.atleast_1d(etas)
-        if "str" in str(type(modes[0])):
-            assert numpy.all([modes[j] in self.mode_names for j in range(len(modes))]), \
-                "Not all the specified modes %s are contained in the field"\
-                    %(modes)
-            #Transform names in indices
-            mode_indices = [numpy.where(numpy.array(self.mode_names) == modes[j])[0][0] \
-                            for j in range(modes.size)]
-        else:
-            mode_indices = modes
-        modes = [field.modes_list[j] for j in mode_indices]
-        vacuum_field = NModeBosonicFieldNumeric.Vacuum(N=len(modes), \
-                                                       truncated_dimensions=[m.hilbert_space.dimension for m in modes], \
-                                                           name="Vacuum")
-        field = field.Otimes(vacuum_field)
-        for j in range(len(mode_indices)):
-            field = field.BeamSplitter(modes=[modes[j].name, vacuum_field.mode_names[j]], R=1-etas[j])\
-                .PartialTrace(vacuum_field.mode_names[j])
-        #Make the name of the new field
-        name = "Loss_{"
-        for mode in modes:
-            name += "%s"%mode.name
-        name += "}\\left("
-        def value(eta):
-            try:
-                return eta.value
-            except AttributeError:
-                return eta
-        for eta in etas:
-            name += "%.2f"%value(eta)
-        name += "\\right)\\left(%s\\right)"%self.state.density_operator.name
+        mode_indices, etas = self._ChannelArguments(modes, etas)
+        name = self._ChannelName("Loss", mode_indices, etas)
+        #Apply the pure-loss channel through its Kraus operators, cached for each (dimension, eta)
+        field = self._Target(inplace)
+        for j, eta in zip(mode_indices, etas):
+            kraus_operators = lossKrausOperators(field.modes_list[j].hilbert_space.dimension, eta)
+            field._ApplyLocalChannel(kraus_operators, [j], inplace=True)
+        field.state.density_operator.name = name
+        return field
+    #----------------------------------------------------------
+    def Amplify(self, modes, gains, inplace=False):
+        """
+        Applies quantum-limited phase-insensitive amplification to the selected field modes.
+        Since the amplifier does not preserve the truncation of the Hilbert space,
+        the trace of the density operator decreases if the amplified state has
+        non-negligible population near the truncation.
+        
+        INPUTS
+        ----------------
+            mode : type in {str, int}
+                name or index of the selected modes
+            gains : type in {Iaji ParameterNumeric, float}
+                amplifier gains (>=1)
+        """
+        mode_indices, gains = self._ChannelArguments(modes, gains)
+        for gain in gains:
+            assert gain >= 1, \
+                "The amplifier gain must be greater than or equal to 1, but it is %f"%gain
+        name = self._ChannelName("Amp", mode_indices, gains)
+        field = self._Target(inplace)
+        for j, gain in zip(mode_indices, gains):
+            kraus_operators = amplifierKrausOperators(field.modes_list[j].hilbert_space.dimension, gain)
+            field._ApplyLocalChannel(kraus_operators, [j], inplace=True)
+        field.state.density_operator.name = name
+        return field
+    #----------------------------------------------------------
+    def ThermalLoss(self, modes, etas, mean_photon_numbers, inplace=False):
+        """
+        Applies bosonic loss to the selected field modes, where the environment is
+        in a thermal state. The channel is decomposed as a pure-loss channel with 
+        efficiency eta/G, followed by a quantum-limited amplifier with gain 
+        G = 1 + (1-eta)*mean_photon_number.
+        
+        INPUTS
+        ----------------
+            mode : type in {str, int}
+                name or index of the selected modes
+            etas : type in {Iaji ParameterNumeric, float}
+                transmission efficiencies
+            mean_photon_numbers : type in {Iaji ParameterNumeric, float}
+                mean photon numbers of the thermal environment modes
+        """
+        mode_indices, etas = self._ChannelArguments(modes, etas)
+        _, mean_photon_numbers = self._ChannelArguments(modes, mean_photon_numbers)
+        name = self._ChannelName("ThermalLoss", mode_indices, etas + mean_photon_numbers)
+        field = self._Target(inplace)
+        for j, eta, n in zip(mode_indices, etas, mean_photon_numbers):
+            gain = 1 + (1-eta)*n
+            dimension = field.modes_list[j].hilbert_space.dimension
+            field._ApplyLocalChannel(lossKrausOperators(dimension, eta/gain), [j], inplace=True)
+            field._ApplyLocalChannel(amplifierKrausOperators(dimension, gain), [j], inplace=True)
         field.state.density_operator.name = name
         return field
     #----------------------------------------------------------
@@ -626,8 +803,228 @@ class NModeBosonicFieldNumeric:
         field.state._density_operator = measurement_operator @ field.state.density_operator \
                                   @ measurement_operator.Dagger()
         field.state._density_operator /= p
+        field.state._density_operator.Freeze()
         return field, p
     #----------------------------------------------------------
+    def _OutcomeDistribution(self, modes, measurable, n_values=MEASUREMENT_GRID_SIZE, **kwargs):
+        """
+        Computes the joint outcome distribution of the same measurement performed
+        on each of the selected modes, from their reduced density operator.
+        
+        INPUTS
+        ----------------
+            modes : str, int or iterable of {str, int}
+                names or indices of the measured modes
+            measurable : str
+                name of the measurable quantity (see measurementBasis)
+            n_values : int
+                number of grid points per continuous outcome variable. The joint outcome grid
+                is the product of the grids of the measured modes, and its size must not exceed 
+                MAX_JOINT_OUTCOMES: e.g., a heterodyne detection ("a") has n_values^2 outcomes per mode.
+            theta : float or iterable of float
+                quadrature angle(s), used if measurable is "x"
+                
+        OUTPUTS
+        ----------------
+            values : numpy.ndarray of shape (K,) for one measured mode, and 
+                     (K, number of measured modes) otherwise
+            vectors : list of numpy.ndarray
+                measurement vectors of each measured mode, of shape (K_j, d_j)
+            p : 1D numpy.ndarray of shape (K,)
+                joint outcome probabilities
+        """
+        mode_indices = [self._ModeIndex(mode) for mode in numpy.atleast_1d(modes)]
+        assert len(set(mode_indices)) == len(mode_indices), \
+            "Each mode can only be measured once"
+        n_modes = len(mode_indices)
+        thetas = numpy.broadcast_to(numpy.asarray(kwargs.get("theta"), dtype=object), (n_modes,))
+        dimensions = [m.hilbert_space.dimension for m in self.modes_list]
+        #Check the size of the joint outcome grid before computing it
+        if measurable == "n":
+            n_outcomes = int(numpy.prod([dimensions[j] for j in mode_indices]))
+        else:
+            exponent = n_modes*(2 if measurable == "a" else 1)
+            n_outcomes = n_values**exponent
+        if n_outcomes > MAX_JOINT_OUTCOMES:
+            raise ValueError("The joint measurement of %s on %d modes has %d outcomes, more than MAX_JOINT_OUTCOMES = %d."\
+                             %(measurable, n_modes, n_outcomes, MAX_JOINT_OUTCOMES) \
+                             + (" Reduce n_values to at most %d."%int(MAX_JOINT_OUTCOMES**(1/exponent)) if measurable != "n" else ""))
+        #Reduced density operator of the measured modes, in the order given by 'modes'
+        rho = partialTrace(self.state.density_operator.value, dimensions, \
+                           [j for j in range(self.N) if j not in mode_indices])
+        order = numpy.argsort(numpy.argsort(mode_indices))
+        measured_dimensions = [dimensions[j] for j in sorted(mode_indices)]
+        rho = rho.reshape(measured_dimensions*2).transpose([*order, *(order+n_modes)])
+        measured_dimensions = [dimensions[j] for j in mode_indices]
+        rho = rho.reshape((numpy.prod(measured_dimensions),)*2)
+        #Measurement vectors of each mode, computed from its own marginal state
+        values, vectors = [], []
+        for j in range(n_modes):
+            rho_j = partialTrace(rho, measured_dimensions, [k for k in range(n_modes) if k != j])
+            values_j, vectors_j = measurementBasis(rho_j, measurable, self.hbar.value, n_values, thetas[j])
+            values.append(values_j)
+            vectors.append(vectors_j)
+        #Joint probabilities p(o_1, ..., o_n) = <v_{o_1}...v_{o_n}|rho|v_{o_1}...v_{o_n}>
+        #with the tensor indices labelled as (rows, columns, outcomes)
+        operands = [rho.reshape(measured_dimensions*2), list(range(2*n_modes))]
+        for j in range(n_modes):
+            operands += [numpy.conjugate(vectors[j]), [2*n_modes+j, j], vectors[j], [2*n_modes+j, n_modes+j]]
+        p = numpy.einsum(*operands, list(range(2*n_modes, 3*n_modes)), optimize=True)
+        p = numpy.abs(numpy.real(p)).flatten()
+        p /= numpy.sum(p)
+        if n_modes == 1:
+            values = values[0]
+        else:
+            values = numpy.stack([v.flatten() for v in numpy.meshgrid(*values, indexing="ij")], axis=-1)
+        return values, vectors, p
+    #----------------------------------------------------------
+    def Sampler(self, modes, measurable, n_values=MEASUREMENT_GRID_SIZE, **kwargs):
+        """
+        Computes the joint outcome distribution of a measurement of 'measurable' 
+        on the selected modes once, and returns a sampler that draws any number 
+        of outcomes with vectorized calls.
+        
+        INPUTS
+        ----------------
+            modes : str, int or iterable of {str, int}
+                names or indices of the measured modes
+            measurable : str
+                "n" (photon number), "x" (homodyne detection, requires the keyword 
+                argument 'theta') or "a" (heterodyne detection)
+            n_values : int
+                number of grid points per continuous outcome variable. The joint outcome grid 
+                must not have more than MAX_JOINT_OUTCOMES points (e.g., n_values <= 45 for a
+                heterodyne detection of two modes), otherwise a ValueError is raised.
+                
+        OUTPUTS
+        ----------------
+            Iaji DiscreteSampler
+        """
+        values, _, p = self._OutcomeDistribution(modes, measurable, n_values, **kwargs)
+        return DiscreteSampler(values, p)
+    #----------------------------------------------------------
+    def _AcceptedOutcomes(self, values, accepted):
+        """
+        Returns the boolean mask of the outcome values selected by 'accepted',
+        which is either a function of the outcome values (returning a boolean array),
+        or an iterable of accepted outcomes.
+        """
+        if callable(accepted):
+            return numpy.asarray(accepted(values), dtype=bool)
+        accepted = numpy.asarray(accepted)
+        if values.ndim == 1:
+            return numpy.any(numpy.isclose(values[:, numpy.newaxis], accepted.flatten()[numpy.newaxis, :]), axis=1)
+        accepted = accepted.reshape((-1, values.shape[1]))
+        return numpy.any(numpy.all(numpy.isclose(values[:, numpy.newaxis, :], accepted[numpy.newaxis, :, :]), \
+                                   axis=-1), axis=1)
+    #----------------------------------------------------------
+    def Sample(self, modes, measurable, ntimes=1, postselect=None, rng=None, n_values=MEASUREMENT_GRID_SIZE, **kwargs):
+        """
+        Draws 'ntimes' outcomes of a measurement of 'measurable' on the selected modes,
+        without computing the post-measurement fields.
+        
+        INPUTS
+        ----------------
+            postselect : callable or iterable
+                If not None, only the outcomes accepted by 'postselect' are returned
+                (see _AcceptedOutcomes)
+            rng : None, int or numpy.random.Generator
+                random number generator or seed. If None, the global numpy 
+                random state is used.
+                
+        OUTPUTS
+        ----------------
+            outcomes : numpy.ndarray
+            values : numpy.ndarray
+                all the outcome values
+            p : 1D numpy.ndarray
+                outcome probabilities
+        """
+        sampler = self.Sampler(modes, measurable, n_values, **kwargs)
+        outcomes, indices = sampler.Sample(ntimes, rng, return_indices=True)
+        if postselect is not None:
+            outcomes = outcomes[self._AcceptedOutcomes(sampler.values, postselect)[indices]]
+        return outcomes, sampler.values, sampler.probabilities
+    #----------------------------------------------------------
+    def HeraldingStatistics(self, modes, measurable, accepted, ntimes, rng=None, n_values=MEASUREMENT_GRID_SIZE, **kwargs):
+        """
+        Simulates 'ntimes' heralding attempts, where a measurement of 'measurable'
+        on the selected modes heralds success when its outcome is accepted.
+        
+        OUTPUTS
+        ----------------
+            n_heralds : int
+                number of successful attempts
+            rate : float
+                estimated heralding probability
+            rate_std : float
+                standard error of the estimated heralding probability
+            probability : float
+                exact heralding probability
+        """
+        sampler = self.Sampler(modes, measurable, n_values, **kwargs)
+        mask = self._AcceptedOutcomes(sampler.values, accepted)
+        _, indices = sampler.Sample(ntimes, rng, return_indices=True)
+        n_heralds = int(numpy.count_nonzero(mask[indices]))
+        rate = n_heralds/ntimes
+        return n_heralds, rate, numpy.sqrt(rate*(1-rate)/ntimes), sampler.Probability(mask)
+    #----------------------------------------------------------
+    def Herald(self, modes, measurable, accepted, n_values=MEASUREMENT_GRID_SIZE, **kwargs):
+        """
+        Computes the state of the unmeasured modes, conditioned on the outcome 
+        of a measurement of 'measurable' on the selected modes being accepted.
+        The joint outcome grid is limited to MAX_JOINT_OUTCOMES points (see Sampler).
+        A ValueError is raised if the accepted outcomes have zero probability.
+        
+        OUTPUTS
+        ----------------
+            heralded_field : Iaji NModeBosonicFieldNumeric
+                field of the unmeasured modes
+            probability : float
+                heralding probability
+        """
+        mode_indices = [self._ModeIndex(mode) for mode in numpy.atleast_1d(modes)]
+        other_indices = [j for j in range(self.N) if j not in mode_indices]
+        assert len(other_indices) > 0, \
+            "At least one mode must not be measured"
+        values, vectors, p = self._OutcomeDistribution(mode_indices, measurable, n_values, **kwargs)
+        accepted_indices = numpy.where(self._AcceptedOutcomes(values, accepted))[0]
+        if len(accepted_indices) == 0:
+            raise ValueError("None of the outcomes of the measurement is accepted")
+        #POVM element of the accepted outcomes, sum_o |v_o><v_o|, accumulated in chunks
+        shape = [len(v) for v in vectors]
+        measured_dimensions = [v.shape[1] for v in vectors]
+        M = numpy.zeros((numpy.prod(measured_dimensions),)*2, dtype=complex)
+        for chunk in numpy.array_split(accepted_indices, max(1, len(accepted_indices)//4096)):
+            outcome_indices = numpy.unravel_index(chunk, shape)
+            V = numpy.ones((len(chunk), 1), dtype=complex)
+            for j in range(len(vectors)):
+                V = numpy.einsum("ka,kb->kab", V, vectors[j][outcome_indices[j]]).reshape((len(chunk), -1))
+            M += V.T @ numpy.conjugate(V)
+        #rho_rest = Tr_measured[(M x 1) rho], with the tensor indices of rho labelled as
+        #(rows of modes 0, ..., N-1, columns of modes 0, ..., N-1)
+        dimensions = [m.hilbert_space.dimension for m in self.modes_list]
+        N = self.N
+        rho_rest = numpy.einsum(self.state.density_operator.value.reshape(dimensions*2), list(range(2*N)), \
+                                M.reshape(measured_dimensions*2), [N + j for j in mode_indices] + mode_indices, \
+                                other_indices + [N + j for j in other_indices], optimize=True)
+        D = int(numpy.prod([dimensions[j] for j in other_indices]))
+        rho_rest = rho_rest.reshape((D, D))
+        #For continuous outcomes, the measurement vectors are not normalized with the 
+        #grid measure, so the heralding probability is taken from the normalized distribution
+        probability = numpy.sum(p[accepted_indices])
+        trace = numpy.real(numpy.trace(rho_rest))
+        if not trace > 0:
+            raise ValueError("The accepted outcomes have zero probability: the heralded state is not defined")
+        heralded_field = self.SelectModes(other_indices)
+        rho_rest = (rho_rest + numpy.conjugate(rho_rest.T))/(2*trace)
+        x = MatrixNumeric(name=LazyName("\\hat{\\Pi}_{%s}\\left(%s\\right)", \
+                                        ",".join([self.mode_names[j] for j in mode_indices]), \
+                                        self.state.density_operator._name), copy=False)
+        x.value = rho_rest
+        heralded_field.state._density_operator = x.Freeze()
+        return heralded_field, probability
+    #----------------------------------------------------------
     def ProjectiveMeasurement(self, mode, measurable, ntimes=1, return_all_fields=False, **kwargs):
         """
         Peforms a projective measurement of a measurable quantity associated
@@ -656,100 +1053,31 @@ class NModeBosonicFieldNumeric:
         assert measurable in MEASURABLES,\
         "%s is not supported as a measurable quantity. \n It should be one of these: %s"\
             %(measurable, MEASURABLES)
-        if "str" in str(type(mode)):
-            #Transform names in indices
-            mode_index = numpy.where(numpy.array(self.mode_names) == mode)[0][0]
-        field = copy(self)
-        mode = field.modes_list[mode_index]
-        modes_before = field.modes_list[0:mode_index]
-        modes_after = field.modes_list[mode_index+1:]
-        def _generalized_born_rule(projector):
-            field0 = copy(self)
-            p = (field.state.density_operator @ projector).Trace() #outcome probability density
-            field0.state._density_operator = projector @ field0.state.density_operator \
-                                      @ projector
-            field0.state._density_operator /= p
-            return field0, p
-        #-------------------
-        if measurable == "n":
-            def Projector(n):
-                en = mode.hilbert_space.CanonicalBasisVector(n).numeric
-                projector = MatrixNumeric.TensorProduct([*[MatrixNumeric.Eye(m.hilbert_space.dimension) for m in modes_before], \
-                                                         en @ en.T(), \
-                                                          *[MatrixNumeric.Eye(m.hilbert_space.dimension) for m in modes_after]])
-                return projector
-            #Calculate the probabilities of outcomes
-            values = numpy.arange(mode.hilbert_space.dimension)
-            p = numpy.zeros((len(values), ))           
-            for j in numpy.arange(len(values)):
-                n = values[j]
-                projector = Projector(n) 
-                p[j] = _generalized_born_rule(projector)[1].value
-            p = numpy.abs(p)
-            p /= numpy.sum(p)
-            #Sample according to the calculated probabilities
-            outcomes = numpy.random.choice(values, size=(ntimes,), p=p)
-            if return_all_fields:
-                #Apply the generalized born rule to the all measurements
-                projector = []
-                post_measurement_field = []
-                for j in range(ntimes):
-                    projector.append(Projector(outcomes[j]))
-                    post_measurement_field.append(_generalized_born_rule(projector[j])[0])
-            else:
-                #Apply the generalized born rule to the last measurement
-                projector = Projector(outcomes[-1])
-                post_measurement_field = _generalized_born_rule(projector)[0]
-        #-------------------
-        elif measurable == "x":
-            def Projector(x, theta):
-                proj = MatrixNumeric.Zeros((N+1, 1))              
-                for n in numpy.arange(N):
-                    if n==0:
-                        proj.value[n] = 1/(numpy.sqrt(numpy.sqrt(numpy.pi)))*numpy.exp(-0.5*x**2)
-                    elif n==1:
-                        proj.value[n] = x*numpy.sqrt(2)*numpy.exp(1j*theta) * proj.value[0]
-                    else:
-                        proj.value[n] = numpy.exp(1j*theta)/numpy.sqrt(n)*(numpy.sqrt(2)*x*proj.value[n-1] - numpy.exp(1j*theta)*numpy.sqrt(n-1)*proj.value[n-2]) 
-                proj = proj @ proj.Dagger() 
-                proj = MatrixNumeric.TensorProduct([*[MatrixNumeric.Eye(m.hilbert_space.dimension) for m in modes_before], \
-                                                         proj, \
-                                                          *[MatrixNumeric.Eye(m.hilbert_space.dimension) for m in modes_after]])
-                proj /= proj.Trace()
-                return proj   
-            theta = kwargs["theta"]    
-            N = mode.hilbert_space.dimension - 1
-            #Consider a range of values that spans a few standard deviations beyond
-            #the mean value of the number operator, which defines the energy
-            #of the harmonic oscillator
-            q_theta = mode.q*numpy.cos(theta) + mode.p*numpy.sin(theta)
-            max_x = (mode.state.Mean(q_theta).value + mode.state.Std(q_theta).value*5)
-            n_values = 300
-            x_values = numpy.linspace(-max_x, max_x, n_values)
-            p = numpy.zeros((n_values,))
-            for j in range(n_values):
-                x = x_values[j]
-                projector = Projector(x, theta)
-                p[j] = _generalized_born_rule(projector)[1].value
-            p = numpy.abs(p)
-            p /= numpy.sum(p) 
-            #from matplotlib import pyplot
-            #pyplot.figure()
-            #pyplot.plot(x_values, p)
-            #Sample according to the calculated probabilities
-            outcomes = numpy.random.choice(x_values, size=(ntimes,), p=p)
-            if return_all_fields:
-                #Apply the generalized born rule to the all measurements
-                projector = []
-                post_measurement_field = []
-                for j in range(ntimes):
-                    projector.append(Projector(outcomes[j], theta))
-                    post_measurement_field.append(_generalized_born_rule(projector[j])[0])
-            else:
-                #Apply the generalized born rule to the last measurement
-                projector = Projector(outcomes[-1], theta)
-                post_measurement_field = _generalized_born_rule(projector)[0]
-            values = x_values
+        mode_index = self._ModeIndex(mode)
+        mode_name = self.mode_names[mode_index]
+        #The outcome probabilities are computed at once from the reduced state of the measured mode
+        values, vectors, p = self._OutcomeDistribution(mode_index, measurable, **kwargs)
+        vectors = vectors[0]
+        #Sample according to the calculated probabilities
+        indices = numpy.random.choice(len(values), size=(ntimes,), p=p)
+        outcomes = values[indices]
+        def _generalized_born_rule(j):
+            #The rank-one projector acts on the measured mode only
+            projector = MatrixNumeric(name="\\hat{\\Pi}_{%s}(%s)"%(mode_name, values[j]))
+            projector.value = numpy.outer(vectors[j], numpy.conjugate(vectors[j]))
+            field0 = self._ApplyLocalOperator(projector, [mode_index])
+            field0.state._density_operator = (field0.state.density_operator \
+                                              / field0.state.density_operator.Trace()).Freeze()
+            return field0
+        if return_all_fields:
+            #Apply the generalized born rule once for each distinct outcome. Measurements
+            #with the same outcome get copies of the same post-measurement field, which 
+            #share its read-only density operator
+            fields = {j: _generalized_born_rule(j) for j in numpy.unique(indices)}
+            post_measurement_field = [copy(fields[j]) for j in indices]
+        else:
+            #Apply the generalized born rule to the last measurement
+            post_measurement_field = _generalized_born_rule(indices[-1])
         return outcomes, values, p, post_measurement_field
     #----------------------------------------------------------
     def POVM(self, mode, measurement_operators=None, ntimes=1, return_all_fields=False, **kwargs):
@@ -796,6 +1124,7 @@ class NModeBosonicFieldNumeric:
             field0.state._density_operator = measurement_operator @ field0.state.density_operator \
                                       @ measurement_operator.Dagger()
             field0.state._density_operator /= p
+            field0.state._density_operator.Freeze()
             return field0, p
         #-------------------
         if len(measurement_operators) > 0 and measurement_operators[0] != None:
@@ -806,18 +1135,24 @@ class NModeBosonicFieldNumeric:
                 values = kwargs["values"]
             p = numpy.zeros((len(values), ))           
             for j in numpy.arange(len(values)):
-                p[j] = _generalized_born_rule(measurement_operators[j])[1].value
+                #Only the outcome probability is needed here, not the post-measurement field
+                p[j] = numpy.real((field.state.density_operator @ measurement_operators[j]).Trace().value)
             p = numpy.abs(p)
             p /= numpy.sum(p)
             #Sample according to the calculated probabilities
             outcomes = numpy.random.choice(values, size=(ntimes,), p=p)
             if return_all_fields:
-                #Apply the generalized born rule to the all measurements
+                #Apply the generalized born rule once for each distinct outcome. Measurements
+                #with the same outcome get copies of the same post-measurement field, which 
+                #share its read-only density operator
+                fields = {}
                 post_measurement_field = []
                 for j in range(ntimes):
                     value = outcomes[j]
                     index = numpy.where(numpy.isclose(values, value))[0][0]
-                    post_measurement_field.append(_generalized_born_rule(measurement_operators[index])[0])
+                    if index not in fields:
+                        fields[index] = _generalized_born_rule(measurement_operators[index])[0]
+                    post_measurement_field.append(copy(fields[index]))
             else:
                 #Apply the generalized born rule to the last measurement
                 value = outcomes[-1]
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This module contains a finite-size analysis layer for Gaussian CVQKD.
+Blocks of measured quadrature samples of the transmitter and of the receiver are streamed
+in chunks, and the prepare & measure covariances are estimated in a single pass, in bounded memory.
+The statistical uncertainty of the estimated covariances is described by confidence intervals,
+either analytic (Gaussian statistics) or from a Poisson bootstrap, and the key rate is evaluated
+in the worst case compatible with the confidence intervals, block by block.
+
+The samples of a block are ordered in columns as [q_A, p_A, q_B, p_B], where q_A and p_A are the
+QKD symbols generated by the transmitter and q_B and p_B are the quadratures measured by the receiver.
+The estimated covariances are named as in COVARIANCE_NAMES.
+"""
+#%%
+import numpy
+import multiprocessing, functools
+from scipy.stats import norm
+from Iaji.Utilities.statistics import RunningCovariance
+#%%
+SAMPLE_NAMES = ["q_A", "p_A", "q_B", "p_B"]
+COVARIANCE_NAMES = ["V_q_A", "V_p_A", "V_q_B", "V_p_B", "C_q", "C_p"]
+COVARIANCE_INDICES = [(0, 0), (1, 1), (2, 2), (3, 3), (0, 2), (1, 3)]
+METHODS = ["analytic", "bootstrap"]
+MIN_BOOTSTRAP_BLOCKS = 100 #minimum number of bootstrap units per block of samples
+#%%
+def covariancesFromMatrix(covariance_matrix):
+    """
+    Returns the covariances named in COVARIANCE_NAMES, from (a batch of) covariance matrices
+    of shape (..., 4, 4) of the samples [q_A, p_A, q_B, p_B], as a dictionary of numpy.ndarray of shape (...).
+    """
+    covariance_matrix = numpy.asarray(covariance_matrix)
+    return {name: covariance_matrix[..., j, k] for name, (j, k) in zip(COVARIANCE_NAMES, COVARIANCE_INDICES)}
+#%%
+def finiteSizeOffset(n, epsilon_smoothing=1e-10, epsilon_privacy_amplification=1e-10):
+    """
+    Returns the finite-size correction Delta(n) to the secret key fraction [bit/symbol] of CVQKD
+    with n symbols, against collective attacks (Leverrier, Grosshans, Grangier, PRA 81, 062343 (2010)):
+
+        Delta(n) = 7*sqrt(log2(2/epsilon_smoothing)/n) + 2/n*log2(1/epsilon_privacy_amplification)
+
+    INPUTS
+    -------------
+        n : int or array-like of int
+            number of symbols used for the key
+        epsilon_smoothing : float
+            smoothing parameter of the smooth min-entropy
+        epsilon_privacy_amplification : float
+            failure probability of privacy amplification
+    """
+    n = numpy.asarray(n, dtype=float)
+    return 7*numpy.sqrt(numpy.log2(2/epsilon_smoothing)/n) + 2/n*numpy.log2(1/epsilon_privacy_amplification)
+#%%
+def _chunks(block, chunk_size):
+    """
+    Yields the chunks of samples of a block. A block is either an array-like of shape (n_samples, 4) 
+    (e.g., a numpy.memmap), which is sliced, or an iterable of chunks of shape (n_chunk, 4).
+    """
+    if hasattr(block, "shape"):
+        for start in range(0, block.shape[0], chunk_size):
+            yield block[start:start+chunk_size]
+    else:
+        for chunk in block:
+            yield chunk
+#%%
+def blockStatistics(block, seed=None, chunk_size=2**20, n_bootstrap=0, bootstrap_block_size=2**12):
+    """
+    Estimates the covariance matrix of the samples of a block in a single pass,
+    chunk by chunk, with optional Poisson bootstrap replicates (see RunningCovariance).
+
+    INPUTS
+    -------------
+        block : string, array-like or iterable
+            The block of samples [q_A, p_A, q_B, p_B]: either the path of a .npy file, which is memory-mapped,
+            an array-like of shape (n_samples, 4), or an iterable of chunks of shape (n_chunk, 4)
+        seed : None, int or numpy.random.SeedSequence
+            seed of the bootstrap weights
+        chunk_size : int
+            number of samples loaded into memory at once
+        n_bootstrap : int
+            number of bootstrap replicates
+        bootstrap_block_size : int
+            number of consecutive samples sharing the same bootstrap weights. If the length of the block
+            is known in advance, it is reduced so that the block contains at least MIN_BOOTSTRAP_BLOCKS units.
+
+    OUTPUTS
+    -------------
+        statistics : Iaji.Utilities.statistics.RunningCovariance
+    """
+    if isinstance(block, str):
+        block = numpy.load(block, mmap_mode="r")
+    if hasattr(block, "shape"):
+        bootstrap_block_size = max(1, min(bootstrap_block_size, block.shape[0]//MIN_BOOTSTRAP_BLOCKS))
+    statistics = RunningCovariance(len(SAMPLE_NAMES), n_bootstrap=n_bootstrap, \
+                                   rng=numpy.random.default_rng(seed), bootstrap_block_size=bootstrap_block_size)
+    for chunk in _chunks(block, chunk_size):
+        statistics.Update(chunk)
+    return statistics
+#%%
+def _blockStatistics(arguments, **kwargs):
+    block, seed = arguments
+    return blockStatistics(block, seed, **kwargs)
+#%%
+class FiniteSizeAnalysis:
+    """
+    This class performs the finite-size analysis of Gaussian CVQKD, block by block.
+    For each block of samples, it estimates the prepare & measure covariances,
+    their confidence intervals and the worst-case secret key rate compatible with them:
+
+        - 'analytic': the confidence intervals of the variances V and covariances C_xy of
+          n Gaussian samples are V*(1 +/- z*sqrt(2/(n-1))) and C_xy +/- z*sqrt((V_x*V_y + C_xy^2)/(n-1)),
+          where z is the standard normal quantile of the confidence level. The worst-case key rate is the
+          minimum of the key rate over the corners of the confidence region.
+
+        - 'bootstrap': the key rate is evaluated on every bootstrap replicate of the covariances, and the
+          worst-case key rate is the (1 - confidence level)-quantile of the bootstrapped key rates.
+
+    If the epsilons are specified, the finite-size offset finiteSizeOffset(n) is subtracted from
+    the worst-case key rate.
+    """
+    # ----------------------------------------------------------
+    def __init__(self, key_rate, method="analytic", confidence_level=0.99, n_bootstrap=200, \
+                 chunk_size=2**20, bootstrap_block_size=2**12, epsilon_smoothing=None, \
+                 epsilon_privacy_amplification=None, seed=None):
+        """
+        INPUTS
+        -------------
+            key_rate : function
+                key_rate(covariances) returns the asymptotic secret key rate [bit/symbol], given a dictionary
+                of covariances with keys in COVARIANCE_NAMES and numpy.ndarray values, that are broadcast
+                against each other (see keyRateFromQKDSystem).
+            method : string
+                'analytic' or 'bootstrap'
+            confidence_level : float (in (0, 1))
+                confidence level of the confidence intervals and of the worst-case key rate
+            n_bootstrap : int
+                number of bootstrap replicates. Only used if method is 'bootstrap'
+            chunk_size : int
+                number of samples loaded into memory at once
+            bootstrap_block_size : int
+                number of consecutive samples sharing the same bootstrap weights
+            epsilon_smoothing, epsilon_privacy_amplification : float
+                security parameters of the finite-size offset. They must be either both specified or both None;
+                if None, no offset is subtracted.
+            seed : None or int
+                seed of the bootstrap weights
+        """
+        if method not in METHODS:
+            raise ValueError("Invalid finite-size analysis method %s. Valid methods are %s"%(method, METHODS))
+        if (epsilon_smoothing is None) != (epsilon_privacy_amplification is None):
+            raise ValueError("epsilon_smoothing and epsilon_privacy_amplification must be either both specified or both None")
+        self.key_rate = key_rate
+        self.method = method
+        self.confidence_level = confidence_level
+        self.n_bootstrap = n_bootstrap if method == "bootstrap" else 0
+        self.chunk_size = chunk_size
+        self.bootstrap_block_size = bootstrap_block_size
+        self.epsilon_smoothing = epsilon_smoothing
+        self.epsilon_privacy_amplification = epsilon_privacy_amplification
+        self.seed = seed
+    # ----------------------------------------------------------
+    def _BlockStatisticsFunction(self):
+        return functools.partial(_blockStatistics, chunk_size=self.chunk_size, n_bootstrap=self.n_bootstrap, \
+                                 bootstrap_block_size=self.bootstrap_block_size)
+    # ----------------------------------------------------------
+    def _Seeds(self):
+        seed_sequence = numpy.random.SeedSequence(self.seed)
+        while True:
+            yield seed_sequence.spawn(1)[0]
+    # ----------------------------------------------------------
+    def ConfidenceIntervals(self, statistics):
+        """
+        Returns the confidence intervals of the estimated covariances of a block,
+        as a dictionary of (lower bound, upper bound), with keys in COVARIANCE_NAMES.
+
+        INPUTS
+        -------------
+            statistics : Iaji.Utilities.statistics.RunningCovariance
+                The statistics of the block (see blockStatistics)
+        """
+        alpha = 1 - self.confidence_level
+        if self.method == "bootstrap" and statistics.n < MIN_BOOTSTRAP_BLOCKS*statistics.bootstrap_block_size:
+            raise ValueError("The block contains %d bootstrap units of %d samples, but at least %d are needed for the bootstrap."\
+                             %(statistics.n//statistics.bootstrap_block_size, statistics.bootstrap_block_size, MIN_BOOTSTRAP_BLOCKS)\
+                             +" Reduce bootstrap_block_size or use the analytic method.")
+        if self.method == "analytic":
+            z = norm.ppf(1 - alpha/2)
+            V = statistics.covariance
+            covariances = covariancesFromMatrix(V)
+            intervals = {}
+            for name, (j, k) in zip(COVARIANCE_NAMES, COVARIANCE_INDICES):
+                sigma = numpy.sqrt((V[j, j]*V[k, k] + V[j, k]**2)/(statistics.n - 1))
+                intervals[name] = (covariances[name] - z*sigma, covariances[name] + z*sigma)
+        else:
+            covariances = covariancesFromMatrix(statistics.bootstrap_covariance)
+            intervals = {name: tuple(numpy.nanquantile(covariances[name], [alpha/2, 1 - alpha/2])) \
+                         for name in COVARIANCE_NAMES}
+        return intervals
+    # ----------------------------------------------------------
+    def AnalyzeStatistics(self, statistics):
+        """
+        Performs the finite-size analysis of a block, given its statistics.
+
+        INPUTS
+        -------------
+            statistics : Iaji.Utilities.statistics.RunningCovariance
+                The statistics of the block (see blockStatistics)
+
+        OUTPUTS
+        -------------
+            result : dict
+                - 'n_samples': the number of samples of the block
+                - 'mean': the mean values of [q_A, p_A, q_B, p_B]
+                - 'covariances': the estimated covariances
+                - 'confidence_intervals': the confidence intervals of the covariances
+                - 'key_rate': the asymptotic key rate of the estimated covariances
+                - 'worst_case_key_rate': the worst-case key rate
+        """
+        covariances = covariancesFromMatrix(statistics.covariance)
+        intervals = self.ConfidenceIntervals(statistics)
+        if self.method == "analytic":
+            #Evaluate the key rate on all the corners of the confidence region at once
+            n_covariances = len(COVARIANCE_NAMES)
+            corners = (numpy.arange(2**n_covariances)[:, numpy.newaxis] >> numpy.arange(n_covariances)) & 1
+            key_rates = self.key_rate({name: numpy.where(corners[:, j], intervals[name][1], intervals[name][0]) \
+                                      for j, name in enumerate(COVARIANCE_NAMES)})
+            worst_case_key_rate = numpy.nanmin(key_rates)
+        else:
+            key_rates = self.key_rate(covariancesFromMatrix(statistics.bootstrap_covariance))
+            worst_case_key_rate = numpy.nanquantile(key_rates, 1 - self.confidence_level)
+        if self.epsilon_smoothing is not None:
+            worst_case_key_rate -= finiteSizeOffset(statistics.n, self.epsilon_smoothing, self.epsilon_privacy_amplification)
+        return {"n_samples": int(statistics.n), "mean": statistics.mean, "covariances": covariances, \
+                "confidence_intervals": intervals, "key_rate": self.key_rate(covariances), \
+                "worst_case_key_rate": worst_case_key_rate}
+    # ----------------------------------------------------------
+    def AnalyzeBlock(self, block, seed=None):
+        """
+        Performs the finite-size analysis of a block of samples (see blockStatistics and AnalyzeStatistics).
+        If seed is None, the seed of the analysis is used.
+        """
+        if seed is None:
+            seed = self.seed
+        return self.AnalyzeStatistics(self._BlockStatisticsFunction()((block, seed)))
+    # ----------------------------------------------------------
+    def Analyze(self, blocks, processes=None):
+        """
+        Performs the finite-size analysis of a sequence of blocks of samples.
+        Each block is streamed in chunks of chunk_size samples, so that the memory usage
+        does not depend on the number of samples.
+
+        INPUTS
+        -------------
+            blocks : iterable
+                The blocks of samples (see blockStatistics)
+            processes : None or int
+                If not None, the statistics of the blocks are computed in parallel by a pool of
+                worker processes, and the blocks must be picklable (e.g., .npy file paths or numpy.memmap).
+                The key rates are always computed in the calling process.
+
+        OUTPUTS
+        -------------
+            results : list of dict
+                The results of the blocks, in the same order (see AnalyzeStatistics)
+        """
+        arguments = zip(blocks, self._Seeds())
+        if processes is None:
+            return [self.AnalyzeStatistics(statistics) for statistics in map(self._BlockStatisticsFunction(), arguments)]
+        with multiprocessing.Pool(processes) as pool:
+            return [self.AnalyzeStatistics(statistics) for statistics in pool.imap(self._BlockStatisticsFunction(), arguments)]
+#%%
+def keyRateFromQKDSystem(system, parameter_names, covariance_names, configuration='real transmission', \
+                         minimal=False, beta=None, cache_directory=None):
+    """
+    Returns a key rate function suitable for FiniteSizeAnalysis, from a QKD system that provides
+    estimateParametersBatch and compileKeyRate (e.g., GaussianStatesCVQKD.QKDSystem).
+    The QKD parameters are estimated from the measured covariances, and the key rate is evaluated
+    with the compiled key rate of the system; the other QKD parameters take the current values of the system.
+
+    INPUTS
+    -------------
+        system : QKDSystem
+            The QKD system
+        parameter_names : array-like of string
+            The names of the estimated QKD parameters (e.g., ['eta', 'n_c'])
+        covariance_names : array-like of string or dict
+            The names of the prepare & measure covariances of the system used for parameter estimation (e.g., ['C_q', 'V_q_B']).
+            If a dictionary, it maps the covariance names of the system to the names in COVARIANCE_NAMES.
+        configuration, minimal, cache_directory :
+            See QKDSystem.estimateParameters
+        beta : float
+            error correction efficiency. If None, the value of the system is used.
+    """
+    if not isinstance(covariance_names, dict):
+        covariance_names = {name: name for name in covariance_names}
+    compiled_key_rate = system.compileKeyRate(cache_directory=cache_directory)
+
+    def key_rate(covariances):
+        measured = {name: covariances[covariance_names[name]] for name in covariance_names}
+        estimates = system.estimateParametersBatch(list(parameter_names), list(covariance_names.keys()), measured, \
+                                                   configuration=configuration, minimal=minimal, cache_directory=cache_directory)
+        return compiled_key_rate(beta, **estimates)[0]
+    return key_rate
@@ -9,8 +9,10 @@ q and p.
 #Imports
 import numpy as np
 import sympy
+import inspect
 sympy.init_printing()
-from Iaji.Physics.Theory.QuanutmInformation import QuantumInformationUtilities as QIUtils
+from Iaji.Physics.Theory.QuantumMechanics.QuanutmInformation import QuantumInformationUtilities as QIUtils
+from Iaji.Utilities import diskcache
 from quik.qip.nmodes import vacuum
 from quik.qip.nmodes_symbolic import Vacuum as vacuum_symbolic
 from quik.qip.nmodes_symbolic import CovarianceMatrix as CovarianceMatrix_symbolic
@@ -180,6 +182,7 @@ class QKDSystem:
                  error_correction_efficiency=1):
         self.parameters = parameters #QKD parameters
         self.covariances_PM = covariances_PM #prepare and measure covariances
+        self._estimators = {} #numeric parameter estimators, see estimateParametersBatch
         self.channel = None
         
         self.covariance_matrix_PM = Parameter(name='\Sigma_{PM}', value=None, nonnegative=False) #entanglement-based covariance matrix
@@ -431,10 +434,89 @@ class QKDSystem:
         setattr(self.I_AB, attribute, I_AB)
         setattr(self.holevo_information, attribute, holevo_information)
         return R 
+
+    def compileKeyRate(self, cache_directory=None, use_numexpr=False):
+        """
+        This function compiles the secret key rate into a vectorized function of the QKD parameters.
+        The entanglement-based covariance matrix is derived symbolically only once, and its entries are 
+        compiled with sympy.lambdify; the mutual information and the Holevo information are then evaluated
+        with batched numpy operations, as in computeKeyRate(form='numeric').
+        The compiled covariance matrix is cached on disk, keyed by the protocol, the channel and the 
+        QKD parameters, so that later sessions skip the symbolic derivation.
+        
+        INPUTS
+        ----------
+        cache_directory : string
+            The directory of the on-disk cache. If None, diskcache.DEFAULT_CACHE_DIRECTORY is used.
+        use_numexpr : boolean
+            If 'True', the entries of the covariance matrix are compiled with numexpr, which must be installed.
+        
+        OUTPUTS:
+        -------
+        key_rate : function
+            key_rate(beta=None, **parameters) returns the secret key rate, the Shannon's mutual information
+            and the Holevo information. The keyword arguments are the names of the QKD parameters
+            (e.g., eta=numpy.linspace(0, 1, 100)) and are broadcast against each other; 
+            the missing ones take the current values of the system.
+        """
+        parameter_names = list(vars(self.parameters).keys())
+        parameter_names.sort()
+        modules = "numexpr" if use_numexpr else "numpy"
+        key = diskcache.cache_key("GaussianStatesCVQKD.QKDSystem.covariance_matrix_EB", \
+                                  inspect.getsource(QKDSystem.computeCovarianceMatrixEB), \
+                                  self.channel, parameter_names, modules)
+        CM_numeric = diskcache.load(key, cache_directory)
+        if CM_numeric is None:
+            if self.covariance_matrix_EB.expression_symbolic is None:
+                self.computeCovarianceMatrixEB(form='symbolic')
+            symbols = [getattr(self.parameters, name).symbol for name in parameter_names]
+            CM_numeric = QIUtils.lambdifyMatrix(symbols, self.covariance_matrix_EB.expression_symbolic, modules)
+            diskcache.save(key, CM_numeric, cache_directory)
+        
+        def key_rate(beta=None, **parameters):
+            if beta is None:
+                beta = self.beta.value
+            for name in parameters:
+                if name not in parameter_names:
+                    raise InvalidOptionError("Invalid QKD parameter %s. Valid QKD parameters are %s"%(name, parameter_names))
+            input_values = [np.asarray(parameters[name] if name in parameters else getattr(self.parameters, name).value, dtype=float) \
+                            for name in parameter_names]
+            CM = CM_numeric(*input_values)
+            R_B, n_q, n_p = [np.asarray(parameters.get(name, getattr(self.parameters, name).value), dtype=float) \
+                             for name in ["R_B", "n_q", "n_p"]]
+            #Compute the Shannon's mutual information of the modulated quadratures
+            with np.errstate(divide="ignore", invalid="ignore"):
+                I_AB = np.where(n_p != 0, QIUtils.mutualInformation(variance_1=CM[..., 1, 1], variance_2=CM[..., 3, 3], covariance=CM[..., 1, 3]), 0)
+                I_AB = I_AB + np.where(n_q != 0, QIUtils.mutualInformation(variance_1=CM[..., 0, 0], variance_2=CM[..., 2, 2], covariance=CM[..., 0, 2]), 0)
+            #Compute the entanglement-based covariance matrix after asymmetric homodyne detection of the receiver's mode.
+            #The modes are ordered as A', vacuum, B, and the last two modes are interfered on the receiver's beam splitter
+            R_B = np.broadcast_to(R_B, CM.shape[:-2])
+            CM_B = np.broadcast_to(np.eye(6), CM.shape[:-2] + (6, 6)).copy()
+            CM_B[..., 0:2, 0:2], CM_B[..., 4:6, 4:6] = CM[..., 0:2, 0:2], CM[..., 2:4, 2:4]
+            CM_B[..., 0:2, 4:6], CM_B[..., 4:6, 0:2] = CM[..., 0:2, 2:4], CM[..., 2:4, 0:2]
+            S_bs = np.broadcast_to(np.eye(6), CM.shape[:-2] + (6, 6)).copy()
+            for j in range(2):
+                S_bs[..., 2+j, 2+j] = S_bs[..., 4+j, 4+j] = np.sqrt(R_B)
+                S_bs[..., 2+j, 4+j], S_bs[..., 4+j, 2+j] = np.sqrt(1-R_B), -np.sqrt(1-R_B)
+            CM_B = S_bs @ CM_B @ np.swapaxes(S_bs, -1, -2)
+            #Measure q on the second mode and p on the third mode. For R_B in {0, 1}, the third mode 
+            #is discarded and only the second mode is measured, along p and q respectively: 
+            #for R_B = 1 the second mode is in the vacuum state, and mode A' is left unchanged
+            CM_B = np.where((R_B == 0)[..., np.newaxis, np.newaxis], QIUtils.conditionalCovarianceMatrix(CM_B, [3, 4]), \
+                            np.where((R_B == 1)[..., np.newaxis, np.newaxis], CM_B[..., 0:2, 0:2], \
+                                     QIUtils.conditionalCovarianceMatrix(CM_B, [2, 5])))
+            #Compute the von Neumann entropy of the quantum states described by the covariance matrix with and without homodyne detection at the receiver
+            S = QIUtils.VonNeumannEntropy(CM)
+            S_B = QIUtils.VonNeumannEntropy(CM_B)
+            holevo_information = S - S_B
+            R = beta*I_AB - holevo_information
+            return R, I_AB, holevo_information
+        self.secret_key_rate.expression_numeric = key_rate
+        return key_rate
     
         
     def estimateParameters(self, parameter_names=None, covariance_names = None, \
-                           form='symbolic', configuration='real transmission', minimal=True):
+                           form='symbolic', configuration='real transmission', minimal=True, cache_directory=None):
         """
         This function performs parameter estimation of the parameters specified by
         
@@ -458,6 +540,11 @@ class QKDSystem:
             If True, then parameter estimation is performed by considering the simplified
             expressions for the prepare & measure covariances, where the trusted losses are
             grouped into T_Tx, T_A, T_p and T_q.
+        
+        cache_directory : string
+            The directory of the on-disk cache of solved systems of equations. The solutions are
+            keyed by the content of the system of equations, and by the names of the estimated parameters, 
+            of the known parameters and of the covariances. If None, diskcache.DEFAULT_CACHE_DIRECTORY is used.
 
         Returns
         -------
@@ -474,8 +561,7 @@ class QKDSystem:
         covariance_names.sort()
         parameters = [getattr(self.parameters, name) for name in parameter_names]
         #Load the known parameteres
-        known_parameter_names = [name for name in list(vars(self.parameters).keys()) if name not in parameter_names+['eta', 'w_q', 'w_p']]
-        known_parameter_names.sort()
+        known_parameter_names = self._KnownParameterNames(parameter_names)
         known_parameters = [getattr(self.parameters, name) for name in known_parameter_names]
         analytical_expression_missing = sum([p.expression_symbolic is None for p in parameters]) > 0
         #Check for possible errors in the input
@@ -497,25 +583,95 @@ class QKDSystem:
                     system.append(sympy.Eq(covariance.expression_symbolic, covariance.symbol))
             system = tuple(system)
             parameter_symbols = [p.symbol for p in parameters]
-            #Solve the system of equations
-            try:
-                solutions = sympy.solve(system, tuple(parameter_symbols), dict=True)[0]
-            except:
-                raise ParameterEstimationError('No solution was found')
+            #Look for the solution in the on-disk cache
+            key = diskcache.cache_key("GaussianStatesCVQKD.QKDSystem.estimateParameters", [sympy.srepr(equation) for equation in system], \
+                                      parameter_names, known_parameter_names, covariance_names, configuration, minimal)
+            estimators = diskcache.load(key, cache_directory)
+            if estimators is None:
+                #Solve the system of equations
+                try:
+                    solutions = sympy.solve(system, tuple(parameter_symbols), dict=True)[0]
+                except:
+                    raise ParameterEstimationError('No solution was found')
+                estimators = {}
+                for solution_symbol in list(solutions.keys()):
+                    estimators[solution_symbol.name] = (solutions[solution_symbol], \
+                        sympy.lambdify(known_parameter_names+covariance_names, fromNamesToVariables(str(solutions[solution_symbol]))))
+                diskcache.save(key, estimators, cache_directory)
             #Set the symbolic expressions into the QKD system
-            for solution_symbol in list(solutions.keys()):
-                parameter = [p for p in parameters if p.name==solution_symbol.name][0]
-                parameter.expression_symbolic = solutions[solution_symbol]
-                parameter.expression_numeric = sympy.lambdify(known_parameter_names+covariance_names, fromNamesToVariables(str(solutions[solution_symbol])))  
+            for name in list(estimators.keys()):
+                parameter = [p for p in parameters if p.name==name][0]
+                parameter.expression_symbolic, parameter.expression_numeric = estimators[name]
         else: 
             if analytical_expression_missing:
-                self.estimateParameters(parameter_names=parameter_names, covariance_names=covariance_names, form='symbolic', configuration=configuration)
+                self.estimateParameters(parameter_names=parameter_names, covariance_names=covariance_names, form='symbolic', \
+                                        configuration=configuration, minimal=minimal, cache_directory=cache_directory)
             #Load the known parameters as symbols or values
             known_parameters = [p.value for p in known_parameters]
             #Load the prepare & measure covariances as symbols or values
             covariances = [c.value for c in covariances]
             for parameter in parameters:
                 parameter.value = parameter.expression_numeric(*(known_parameters+covariances))
+    
+    def _KnownParameterNames(self, parameter_names):
+        """
+        Returns the names of the QKD parameters that are not estimated, in alphabetical order.
+        They are the first arguments of the numeric parameter estimators.
+        """
+        return sorted([name for name in list(vars(self.parameters).keys()) if name not in parameter_names])
+    
+    def estimateParametersBatch(self, parameter_names, covariance_names, covariances, \
+                                configuration='real transmission', minimal=False, cache_directory=None):
+        """
+        This function performs numeric parameter estimation on many data blocks at once, 
+        e.g., on blocks of streamed data. The estimators are derived symbolically (see estimateParameters)
+        the first time that a set of estimated parameters, covariances, configuration and minimal is requested,
+        and are then kept in memory and evaluated on all the blocks with vectorized operations.
+        The values of the QKD parameters are left unchanged.
+        
+        Parameters
+        ----------
+        parameter_names : array-like of string
+            The names of the parameters to be estimated, in variables format (e.g., ['eta'])
+        covariance_names : array-like of string
+            The names of the quadrature covariances from which the parameters are to be estimated, in variable format (e.g., ['V_q_Tx'])
+        covariances : dict or 2D array-like of float
+            The measured prepare & measure covariances, one value per data block. Either a dictionary with 
+            the covariance names as keys and 1D arrays as values, or an array of shape (n_blocks, len(covariance_names)),
+            whose columns follow the alphabetical order of covariance_names.
+        configuration : string
+            See estimateParameters
+        minimal : boolean
+            See estimateParameters
+        cache_directory : string
+            See estimateParameters
+
+        Returns
+        -------
+        estimates : dict
+            The estimated parameters, with the parameter names as keys and numpy.ndarray of shape (n_blocks,) as values.
+        """
+        parameter_names = sorted(parameter_names)
+        covariance_names = sorted(covariance_names)
+        key = (tuple(parameter_names), tuple(covariance_names), configuration, minimal)
+        if key not in self._estimators:
+            self.estimateParameters(parameter_names=list(parameter_names), covariance_names=list(covariance_names), form='symbolic', \
+                                    configuration=configuration, minimal=minimal, cache_directory=cache_directory)
+            self._estimators[key] = [getattr(self.parameters, name).expression_numeric for name in parameter_names]
+        estimators = self._estimators[key]
+        #Load the known parameters values
+        known_parameter_names = self._KnownParameterNames(parameter_names)
+        known_parameters = [getattr(self.parameters, name).value for name in known_parameter_names]
+        #Load the measured covariances, one array per covariance
+        if isinstance(covariances, dict):
+            covariances = [np.asarray(covariances[name], dtype=float) for name in covariance_names]
+        else:
+            covariances = list(np.moveaxis(np.atleast_2d(np.asarray(covariances, dtype=float)), -1, 0))
+        shape = np.broadcast(*covariances).shape
+        estimates = {}
+        for name, estimator in zip(parameter_names, estimators):
+            estimates[name] = np.broadcast_to(estimator(*(known_parameters+covariances)), shape)
+        return estimates
                         
 #%%    
 def fromNamesToVariables(string_symbols):
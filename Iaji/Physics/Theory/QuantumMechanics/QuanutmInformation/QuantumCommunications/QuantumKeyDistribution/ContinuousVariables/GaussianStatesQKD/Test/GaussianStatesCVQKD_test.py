@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This script tests the GaussianStatesCVQKD module: the compiled key rate is compared
+with computeKeyRate(form='numeric') at a few parameter points.
+"""
+# In[imports]
+from Iaji.Physics.Theory.QuantumMechanics.QuanutmInformation.QuantumCommunications.QuantumKeyDistribution.ContinuousVariables.GaussianStatesQKD.GaussianStatesCVQKD \
+    import QKDSystem, QKDParameters
+import numpy, tempfile
+# In[Compiled key rate]
+cache_directory = tempfile.mkdtemp()
+for R_B in [0.5, 0, 1]:
+    system = QKDSystem(parameters=QKDParameters(T_A=1, eta=0.6, R_B=R_B, V_s=0.5, n_q=1.5, n_p=1, n_c=0.05))
+    system.channel = "thermal-lossy (symmetric)"
+    system.beta.value = 0.95
+    R = system.computeKeyRate(form='numeric')
+    R_compiled, I_AB, holevo_information = system.compileKeyRate(cache_directory=cache_directory)()
+    print("R_B = %.1f - key rate: %.6f, compiled key rate: %.6f, abs. difference: %.2e"%(R_B, R, R_compiled, numpy.abs(R - R_compiled)))
+#The compiled key rate is vectorized over the QKD parameters
+eta = numpy.linspace(0.1, 1, 10)
+print("compiled key rate VS eta: %s"%system.compileKeyRate(cache_directory=cache_directory)(eta=eta)[0])
+# In[Finite-size analysis]
+from Iaji.Physics.Theory.QuantumMechanics.QuanutmInformation.QuantumCommunications.QuantumKeyDistribution.ContinuousVariables.GaussianStatesQKD.FiniteSize \
+    import FiniteSizeAnalysis, keyRateFromQKDSystem
+system = QKDSystem(parameters=QKDParameters(T_A=1, eta=0.6, R_B=0.5, V_s=0.5, n_q=1.5, n_p=1, n_c=0.05))
+system.channel = "thermal-lossy (symmetric)"
+system.beta.value = 0.95
+R = system.computeKeyRate(form='numeric')
+#Sample the symbols [q_A, p_A] and the receiver's quadratures [q_B, p_B] from the prepare & measure covariance matrix
+CM_PM = system.computeCovarianceMatrixPM(form='numeric')
+indices = [0, 1, 2, 5]
+samples = numpy.random.default_rng(0).multivariate_normal(numpy.zeros(4), numpy.asarray(CM_PM, dtype=float)[numpy.ix_(indices, indices)], size=10**6)
+#Estimate the channel efficiency and the channel noise from the measured covariances, and compute the key rate
+key_rate = keyRateFromQKDSystem(system, parameter_names=['eta', 'n_c'], covariance_names=['C_q', 'V_q_B'], cache_directory=cache_directory)
+for method in ["analytic", "bootstrap"]:
+    result = FiniteSizeAnalysis(key_rate, method=method, seed=1).AnalyzeBlock(samples)
+    print("%s - key rate: %.6f (exact: %.6f), worst-case key rate: %.6f"%(method, result["key_rate"], R, result["worst_case_key_rate"]))
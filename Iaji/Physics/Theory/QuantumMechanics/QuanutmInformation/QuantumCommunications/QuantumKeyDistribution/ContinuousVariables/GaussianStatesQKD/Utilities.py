@@ -9,6 +9,7 @@ This module contains utilities for Gaussian CVQKD
 #%%
 import numpy
 from quik.qip.nmodes import covariancematrix, vacuum
+from Iaji.Physics.Theory.QuantumMechanics.QuanutmInformation import QuantumInformationUtilities as QIUtils
 #%%
 def secret_key_fraction_lossy_channel_bound(channel_total_efficiency, n_repeaters):
     """
@@ -165,35 +166,21 @@ def symplecticEigenvalues(V, Omega=None):
     of the distinct eigenvalues of the matrix
                                 |i Omega V|
     where Omega is the symplectic matrix.
+    The calculation is delegated to QuantumInformationUtilities.symplecticEigenvalues,
+    which also accepts stacks of covariance matrices.
     
     INPUTS
     -----------------
-    V: 2D array-like of float
+    V: array-like of float, of shape (..., 2N, 2N)
         the covariance matrix of the Gaussian quantum state of which the symplectic values are to be calculated.
         The covariance matrix is assumed to be squared, with even dimension.
     
     OUTPUTS
     -----------------
-    symplectic_eigenvalues: array-like of float
+    symplectic_eigenvalues: numpy.ndarray of float, of shape (..., N)
         symplectic eigenvalues of the covariance matrix
     """
-    N = int(V.shape[0]/2) #number of modes of the bosonic field.
-    if Omega is None:
-        Omega = symplecticOmega(N)    
-    V = numpy.matrix(V)   
-    #Construct the symplectic matrix corresponding the input covariance matrix  
-    N = int(V.shape[0]/2) #number of modes of the bosonic field.
-    C_symplectic = 1j*Omega @ V
-    #Compute the symplectic eigenvalues of the input covariance matrix
-    symplectic_eigenvalues = numpy.real(numpy.linalg.eigvals(C_symplectic))
-    symplectic_eigenvalues = symplectic_eigenvalues[numpy.where(symplectic_eigenvalues>0)]
-    for j in range(N):
-        s = symplectic_eigenvalues[j]
-        if numpy.isclose(s, 1):
-            symplectic_eigenvalues[j] = 1
-    if numpy.any(symplectic_eigenvalues < 1):   
-        print("unphysical covariance matrix")
-    return numpy.array(symplectic_eigenvalues)
+    return QIUtils.symplecticEigenvalues(V, Omega)
 #%%
 def VonNeumannEntropy(V, Omega=None, print_warnings=False):
     """
@@ -202,22 +189,17 @@ def VonNeumannEntropy(V, Omega=None, print_warnings=False):
     
     INPUTS
     ----------
-    V : 2D array-like of float
-       input covariance matrix, assumed to be squared, with even dimension.
+    V : array-like of float, of shape (..., 2N, 2N)
+       input covariance matrix, assumed to be squared, with even dimension, or a
+       stack of covariance matrices.
     print_warnings: boolean
         If 'True', the function will print eventual warnings regarding the calculations. 
     OUTPUTS
     -------
-    S: float
+    S: float, or numpy.ndarray of float of shape (...)
         von Neumann entropy of the Gaussian state with input covariance matrix.
     """
-    ni = symplecticEigenvalues(V, Omega) #symplectic eigenvalues of the covariance matrixvacuum]:
-    g = ((ni+1)/2)*numpy.log2((ni+1)/2) - ((ni-1)/2)*numpy.log2((ni-1)/2) #composite function of the symplectic eigenvalues
-    g = [g_0 for g_0 in g if str(g_0) != "nan"] #if the symplectic eigenvalues are equal to 1, the numerical evaluation contains a term 0*numpy.inf
-    S = numpy.sum(g) #von Neumann entropy
-    if print_warnings and S<0:
-        print("Warning in vonNeumannEntropy(): the calculated entropy is negative.")
-    return S
+    return QIUtils.VonNeumannEntropy(V, print_warnings=print_warnings, Omega=Omega)
 #%%
 def secret_key_fraction_Gaussian_CVQKD(variances_A, correlations_A, \
                                        channel_efficiencies=[1, 1], channel_thermal_numbers=[0, 0],\
@@ -330,6 +312,208 @@ def secret_key_fraction_Gaussian_CVQKD(variances_A, correlations_A, \
             Holevo_information += switching_factor*(S_V - S_V_given_B)
     kappa = beta*I_AB - Holevo_information
     return kappa, I_AB, Holevo_information, V
+#%%
+def EB_parameters_ideal_transmitter_sweep(variances_A, correlations_A):
+    """
+    Vectorized version of the calculation performed in covariance_matrix_EB_ideal_transmitter.
+    Every element of the inputs may be an array: all the arrays are broadcast against each other.
+    
+    INPUTS
+    -------------
+        variances_A : array-like of float (shape in {(1, 2), (2, 1)}
+            The variances V_x_{A}. Each of them may be an array.
+        correlations_A : array-like of float (shape in {(1, 2), (2, 1)}
+            The correlations c_{x_{SA}}. Each of them may be an array.
+    OUTPUTS
+    -------------
+        The squeezing parameter r_1_EB and the thermal variance nu_2_EB of the 
+        entanglement-based state
+        
+        The reflectivity of the beam splitter used by Alice for her measurement
+        
+        Updated V_q_A, calculated from the other input parameters
+        
+        Updated V_p_A, calculated from the other input parameters
+    """
+    V_q_A, V_p_A, c_q_SA, c_p_SA = numpy.broadcast_arrays(*[numpy.asarray(x, dtype=float) for x in \
+                                                            (variances_A[0], variances_A[1], correlations_A[0], correlations_A[1])])
+    #The second system of equations is used where only the q quadrature is correlated
+    use_q = (c_q_SA != 0) & (c_p_SA == 0)
+    if numpy.any(~use_q & (V_p_A == 0)):
+        raise ValueError("In this case you have to provide V_p_A")
+    if numpy.any(use_q & (V_q_A == 0)) or numpy.any((c_q_SA != 0) & (c_p_SA != 0) & (V_q_A == 0)):
+        raise ValueError("In this case you have to provide V_q_A and V_p_A")
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        #First system of equations
+        X = V_p_A*c_q_SA**2 - c_p_SA**2*c_q_SA**2 + 1
+        ratio_p = X/(V_p_A*(V_p_A - c_p_SA**2))
+        r_1_EB = numpy.log(ratio_p)/4
+        nu_2_EB = V_p_A*numpy.sqrt(ratio_p)
+        R_m = c_q_SA**2*(V_p_A - c_p_SA**2)/(V_p_A*c_q_SA**2 - c_p_SA**2*c_q_SA**2 + c_p_SA**2*numpy.sqrt(ratio_p))
+        V_q_A_new = numpy.where(c_q_SA == 0, X/(V_p_A - c_p_SA**2), V_q_A)
+        #Second system of equations
+        Y = V_q_A*c_p_SA**2 - c_p_SA**2*c_q_SA**2 + 1
+        ratio_q = (V_q_A - c_q_SA**2)/Y
+        r_1_EB_q = numpy.log(V_q_A**(1/4)*ratio_q**(1/4))
+        nu_2_EB_q = numpy.sqrt(V_q_A)/numpy.sqrt(ratio_q)
+        R_m_q = numpy.sqrt(V_q_A)*c_q_SA**2*numpy.sqrt(ratio_q)*Y/(-V_q_A**2 + V_q_A*c_q_SA**2 + Y*(numpy.sqrt(V_q_A)*c_q_SA**2*numpy.sqrt(ratio_q) + V_q_A**2 - V_q_A*c_q_SA**2))
+        V_p_A_new = numpy.where(V_p_A == 0, Y/(V_q_A - c_q_SA**2), V_p_A)
+    r_1_EB = numpy.where(use_q, r_1_EB_q, r_1_EB)
+    nu_2_EB = numpy.where(use_q, nu_2_EB_q, nu_2_EB)
+    #R_m is a reflectivity: remove round-off errors (e.g., R_m = 1 when c_p_SA = 0)
+    R_m = numpy.clip(numpy.where(use_q, R_m_q, R_m), 0, 1)
+    V_q_A = numpy.where(use_q, V_q_A, V_q_A_new)
+    V_p_A = numpy.where(use_q, V_p_A_new, V_p_A)
+    return r_1_EB, nu_2_EB, R_m, V_q_A, V_p_A
+#%%
+def _covariance_blocks_EB_after_channel(variances_A, correlations_A, channel_efficiencies, channel_thermal_numbers):
+    """
+    Returns the independent elements (a_q, a_p, b_q, b_p, c_q, c_p) of the 
+    entanglement-based covariance matrix after the channel,
+                    [[a_q, 0,   c_q, 0  ],
+                     [0,   a_p, 0,   c_p],
+                     [c_q, 0,   b_q, 0  ],
+                     [0,   c_p, 0,   b_p]]
+    broadcast against each other, together with R_m, V_q_A and V_p_A.
+    """
+    r_1_EB, nu_2_EB, R_m, V_q_A, V_p_A = EB_parameters_ideal_transmitter_sweep(variances_A, correlations_A)
+    eta_q, eta_p, n_q, n_p = [numpy.asarray(x, dtype=float) for x in \
+                              (channel_efficiencies[0], channel_efficiencies[1], channel_thermal_numbers[0], channel_thermal_numbers[1])]
+    a_q = a_p = nu_2_EB
+    #Apply channel loss and additive Gaussian noise
+    b_q = eta_q*nu_2_EB*numpy.exp(2*r_1_EB) + (1-eta_q)*(2*n_q+1)
+    b_p = eta_p*nu_2_EB*numpy.exp(-2*r_1_EB) + (1-eta_p)*(2*n_p+1)
+    c_q = numpy.sqrt(eta_q)*numpy.sqrt(nu_2_EB**2-1)*numpy.exp(r_1_EB)
+    c_p = -numpy.sqrt(eta_p)*numpy.sqrt(nu_2_EB**2-1)*numpy.exp(-r_1_EB)
+    blocks = numpy.broadcast_arrays(a_q, a_p, b_q, b_p, c_q, c_p, R_m, V_q_A, V_p_A)
+    return blocks[:6], blocks[6], blocks[7], blocks[8]
+#%%
+def covariance_matrix_EB_ideal_transmitter_after_channel_sweep(variances_A, correlations_A, \
+                                                                channel_efficiencies=[1, 1], channel_thermal_numbers=[0, 0]):
+    """
+    Vectorized version of covariance_matrix_EB_ideal_transmitter_after_channel.
+    Every element of the inputs may be an array: all the arrays are broadcast against each other.
+    
+    INPUTS
+    -----------
+        variances : array-like of float (shape in {(1, 2), (2, 1)}
+            The variances V_x_{A} described before.
+        correlations : array-like of float (shape in {(1, 2), (2, 1)}
+            The correlations c_{x_{SA}} described before
+        channel_efficiencies : array-like of float (shape in {(1, 2), (2, 1)}
+            Transmission efficiencies of the channel, for respectively the q and p quadrature
+        channel_thermal_numbers : array-like of float (shape in {(1, 2), (2, 1)}
+            Thermal numbers of the channel, for respectively the q and p quadrature
+    
+    OUTPUTS
+    -----------
+        The covariance matrices of modes A' and B in the entanglement-based protocol,
+        as a numpy.ndarray of shape (..., 4, 4)
+        
+        The reflectivity of the beam splitter used by Alice for her measurement
+        
+        Updated V_q_A, calculated from the other input parameters
+        
+        Updated V_p_A, calculated from the other input parameters   
+    """
+    blocks, R_m, V_q_A, V_p_A = _covariance_blocks_EB_after_channel(variances_A, correlations_A, \
+                                                                    channel_efficiencies, channel_thermal_numbers)
+    a_q, a_p, b_q, b_p, c_q, c_p = blocks
+    V = numpy.zeros(a_q.shape + (4, 4))
+    V[..., 0, 0], V[..., 1, 1], V[..., 2, 2], V[..., 3, 3] = a_q, a_p, b_q, b_p
+    V[..., 0, 2] = V[..., 2, 0] = c_q
+    V[..., 1, 3] = V[..., 3, 1] = c_p
+    return V, R_m, V_q_A, V_p_A
+#%%
+def secret_key_fraction_Gaussian_CVQKD_sweep(variances_A, correlations_A, \
+                                             channel_efficiencies=[1, 1], channel_thermal_numbers=[0, 0],\
+                                             beta=1, switching_probability=numpy.nan):
+    """
+    Computes the secret key fraction of Gaussian CVQKD against collective attacks in the asymptotic limit,
+    with ideal transmitter, on a whole grid of parameters at once. 
+    It is the vectorized counterpart of secret_key_fraction_Gaussian_CVQKD: every element of the inputs
+    may be an array, and all the arrays are broadcast against each other (e.g., use numpy.meshgrid 
+    or arrays with singleton dimensions to sweep over a grid).
+    
+    Since the covariance matrices of the protocol do not correlate the q and p quadratures, the beam splitters
+    and homodyne detections at the transmitter and receiver are evaluated in closed form, quadrature by quadrature,
+    and the symplectic eigenvalues of the two-mode covariance matrix are obtained from its symplectic invariants.
+    
+    INPUTS
+    -------------
+        variances : array-like of float (shape in {(1, 2), (2, 1)}
+            The variances V_x_{A} described before.
+        correlations : array-like of float (shape in {(1, 2), (2, 1)}
+            The correlations c_{x_{SA}} described before
+        channel_efficiencies : array-like of float (shape in {(1, 2), (2, 1)}
+            Transmission efficiencies of the channel, for respectively the q and p quadrature
+        channel_thermal_numbers : array-like of float (shape in {(1, 2), (2, 1)}
+            Thermal numbers of the channel, for respectively the q and p quadrature  
+        beta : float or array-like of float (in [0, 1])
+            Assumed error correction efficiency
+        switching_probability : float or array-like of float (in [0, 1])
+            probability that the q quadrature is modulated and measured. Only valid in 
+            two-dimensional protocols; numpy.nan selects the non-switching protocol.
+    
+    OUTPUTS
+    -------------
+        kappa : numpy.ndarray of float
+            secret key fraction
+        I_AB : numpy.ndarray of float
+            Shannon's mutual information between Alice and Bob
+        Holevo_information : numpy.ndarray of float
+            Holevo bound on the information accessible to the eavesdropper
+    """
+    blocks, R_m, _, _ = _covariance_blocks_EB_after_channel(variances_A, correlations_A, \
+                                                            channel_efficiencies, channel_thermal_numbers)
+    a_q, a_p, b_q, b_p, c_q, c_p = blocks
+    #Von Neumann entropy of the covariance matrix of modes A' and B
+    Delta = a_q*a_p + b_q*b_p + 2*c_q*c_p
+    determinant = (a_q*b_q - c_q**2)*(a_p*b_p - c_p**2)
+    discriminant = numpy.sqrt(numpy.clip(Delta**2 - 4*determinant, 0, None))
+    nu_plus, nu_minus = [numpy.sqrt(numpy.clip((Delta + s*discriminant)/2, 0, None)) for s in (1, -1)]
+    S_V = numpy.nan_to_num(QIUtils.entropyFunction(nu_plus)) + numpy.nan_to_num(QIUtils.entropyFunction(nu_minus))
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        I_AB, Holevo_information = _information_sweep(R_m, blocks, S_V)
+        switching_probability = numpy.asarray(switching_probability, dtype=float)
+        switching = ~numpy.isnan(switching_probability) \
+            & (numpy.asarray(correlations_A[0]) != 0) & (numpy.asarray(correlations_A[1]) != 0)
+        if numpy.any(switching):
+            I_AB_q, Holevo_information_q = _information_sweep(1, blocks, S_V)
+            I_AB_p, Holevo_information_p = _information_sweep(0, blocks, S_V)
+            I_AB = numpy.where(switching, switching_probability*I_AB_q + (1-switching_probability)*I_AB_p, I_AB)
+            Holevo_information = numpy.where(switching, switching_probability*Holevo_information_q \
+                                             + (1-switching_probability)*Holevo_information_p, Holevo_information)
+    kappa = beta*I_AB - Holevo_information
+    return kappa, I_AB, Holevo_information
+#%%
+def _information_sweep(R, blocks, S_V):
+    """
+    Returns the mutual information and the Holevo information of the entanglement-based
+    protocol, when Alice and Bob split their modes on beam splitters of reflectivity R, 
+    and measure respectively p and q at the output port fed by the vacuum and q and p at 
+    the other output port.
+    
+    INPUTS
+    -----------
+        R : float or numpy.ndarray of float (in [0, 1])
+            reflectivity of the beam splitters
+        blocks : tuple of numpy.ndarray of float
+            the elements (a_q, a_p, b_q, b_p, c_q, c_p) of the covariance matrix
+        S_V : numpy.ndarray of float
+            von Neumann entropy of the covariance matrix
+    """
+    a_q, a_p, b_q, b_p, c_q, c_p = blocks
+    #Variances measured by Bob, before and after Alice's measurement
+    V_q_B, V_p_B = R*b_q + (1-R), (1-R)*b_p + R
+    V_q_B_given_A = V_q_B - (R*c_q)**2/(R*a_q + (1-R))
+    V_p_B_given_A = V_p_B - ((1-R)*c_p)**2/((1-R)*a_p + R)
+    I_AB = 0.5*numpy.log2(V_q_B/V_q_B_given_A) + 0.5*numpy.log2(V_p_B/V_p_B_given_A)
+    #Covariance matrix of mode A' after Bob's measurement, which is diagonal
+    V_q_A_given_B = a_q - R*c_q**2/(R*b_q + (1-R))
+    V_p_A_given_B = a_p - (1-R)*c_p**2/((1-R)*b_p + R)
+    S_V_given_B = QIUtils.entropyFunction(numpy.sqrt(V_q_A_given_B*V_p_A_given_B))
+    return I_AB, S_V - numpy.nan_to_num(S_V_given_B)
 
 #%%
 def loss(V_0, eta):
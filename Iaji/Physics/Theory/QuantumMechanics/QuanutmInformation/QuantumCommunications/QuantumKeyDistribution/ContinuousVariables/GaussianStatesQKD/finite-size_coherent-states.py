@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This script performs the finite-size analysis of a simulated coherent-state CVQKD protocol
+with homodyne detection of the q quadrature and reverse reconciliation, over a thermal-lossy channel.
+The quadrature samples are generated in blocks, streamed from disk and analyzed with analytic and
+bootstrap confidence intervals.
+"""
+#%%
+import numpy, os, shutil, tempfile, time
+from scipy.special import xlogy
+from Iaji.Physics.Theory.QuantumMechanics.QuanutmInformation.QuantumCommunications.QuantumKeyDistribution.ContinuousVariables.GaussianStatesQKD.FiniteSize \
+    import FiniteSizeAnalysis, SAMPLE_NAMES
+#%%
+#Simulation parameters
+V_A = 4 #modulation variance
+T = 0.5 #channel efficiency
+xi = 0.01 #excess noise, referred to the channel input
+beta = 0.95 #error correction efficiency
+n_blocks = 4
+n_samples_block = 10**6
+n_samples_stream = 10**8
+#%%
+def G(nu):
+    return (xlogy((nu+1)/2, (nu+1)/2) - xlogy((nu-1)/2, (nu-1)/2))/numpy.log(2)
+
+def key_rate(covariances):
+    """
+    Asymptotic key rate of the coherent-state protocol with homodyne detection and reverse reconciliation,
+    from the variance of the transmitter's symbols, the variance of the receiver's quadrature and their covariance.
+    """
+    V_A, V_B, C = [numpy.asarray(covariances[name]) for name in ["V_q_A", "V_q_B", "C_q"]]
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        I_AB = numpy.log2(V_B/(V_B - C**2/V_A))/2
+        #Entanglement-based covariance matrix
+        a, b, c = V_A + 1, V_B, C/V_A*numpy.sqrt((V_A + 1)**2 - 1)
+        Delta, D = a**2 + b**2 - 2*c**2, a*b - c**2
+        nu_1, nu_2 = [numpy.sqrt((Delta + s*numpy.sqrt(Delta**2 - 4*D**2))/2) for s in (1, -1)]
+        nu_3 = numpy.sqrt(a*(a - c**2/b))
+        holevo_information = G(nu_1) + G(nu_2) - G(nu_3)
+    return beta*I_AB - holevo_information
+
+def generateSamples(n_samples, rng, chunk_size=2**20):
+    """
+    Generates the samples [q_A, p_A, q_B, p_B] in chunks
+    """
+    for start in range(0, n_samples, chunk_size):
+        x_A = rng.normal(scale=numpy.sqrt(V_A), size=(min(chunk_size, n_samples-start), 2))
+        x_B = numpy.sqrt(T)*x_A + rng.normal(scale=numpy.sqrt(1 + T*xi), size=x_A.shape)
+        yield numpy.hstack((x_A, x_B))
+#%%
+print("expected key rate: %.5f bit/symbol"%key_rate({"V_q_A": V_A, "V_q_B": T*V_A + 1 + T*xi, "C_q": numpy.sqrt(T)*V_A}))
+#Write the blocks of samples to disk
+rng = numpy.random.default_rng(0)
+directory = tempfile.mkdtemp()
+block_paths = []
+for j in range(n_blocks):
+    block_paths.append(os.path.join(directory, "block_%d.npy"%j))
+    numpy.save(block_paths[-1], numpy.vstack(list(generateSamples(n_samples_block, rng))))
+#%%
+for method in ["analytic", "bootstrap"]:
+    analysis = FiniteSizeAnalysis(key_rate, method=method, confidence_level=0.99, n_bootstrap=200, \
+                                  epsilon_smoothing=1e-10, epsilon_privacy_amplification=1e-10, seed=1)
+    start_time = time.time()
+    results = analysis.Analyze(block_paths, processes=2)
+    print("\n%s confidence intervals (%.2f s)"%(method, time.time() - start_time))
+    for j, result in enumerate(results):
+        low, high = result["confidence_intervals"]["C_q"]
+        print("block %d: C_q in [%.4f, %.4f], key rate: %.5f, worst-case key rate: %.5f bit/symbol"\
+              %(j, low, high, result["key_rate"], result["worst_case_key_rate"]))
+shutil.rmtree(directory)
+#%%
+#Stream a long run without storing it
+analysis = FiniteSizeAnalysis(key_rate, method="bootstrap", n_bootstrap=100, epsilon_smoothing=1e-10, \
+                              epsilon_privacy_amplification=1e-10, seed=1)
+start_time = time.time()
+result = analysis.AnalyzeBlock(generateSamples(n_samples_stream, rng))
+print("\n%d samples [%s] (%.1f s): key rate: %.5f, worst-case key rate: %.5f bit/symbol"\
+      %(result["n_samples"], ", ".join(SAMPLE_NAMES), time.time() - start_time, result["key_rate"], result["worst_case_key_rate"]))
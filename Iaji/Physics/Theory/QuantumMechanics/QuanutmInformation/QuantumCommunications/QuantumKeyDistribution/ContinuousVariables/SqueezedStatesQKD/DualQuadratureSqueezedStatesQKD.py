@@ -7,8 +7,10 @@ a QKD system based on the Gaussian modulation of the squeezed and antisqueezed q
 #Imports
 import numpy as np
 import sympy
+import inspect
 sympy.init_printing()
-from Iaji.Physics.Theory.QuanutmInformation import QuantumInformationUtilities as QIUtils
+from Iaji.Physics.Theory.QuantumMechanics.QuanutmInformation import QuantumInformationUtilities as QIUtils
+from Iaji.Utilities import diskcache
 from quik.qip.nmodes import vacuum
 from quik.qip.nmodes_symbolic import Vacuum as vacuum_symbolic
 from quik.qip.nmodes_symbolic import CovarianceMatrix as CovarianceMatrix_symbolic
@@ -215,6 +217,7 @@ class QKDSystem:
                  error_correction_efficiency=1):
         self.parameters = parameters #QKD parameters
         self.covariances_PM = covariances_PM #prepare and measure covariances
+        self._estimators = {} #numeric parameter estimators, see estimateParametersBatch
         
         self.covariance_matrix_PM = Parameter(name='\Sigma_{PM}', value=None, nonnegative=False) #prepare & measure covariance matrix
         self.computeCovarianceMatrixPM()
@@ -223,7 +226,7 @@ class QKDSystem:
         self.computeCovarianceMatrixPMClassical()
         
         self.covariance_matrix_EB = Parameter(name='\Sigma_{EB}', value=None, nonnegative=False) #entanglement-based covariance matrix
-        self.computeCovarianceMatrixEB()
+        #The entanglement-based covariance matrix is derived when first needed (see keyRate and compileKeyRate)
         
         self.beta = Parameter(name='\\beta') #error correction efficiency [adimensional, in [0, 1]]
         self.secret_key_rate = Parameter(name='R', real=True, nonnegative=False) #secret key rate [bit/symbol]
@@ -714,6 +717,8 @@ class QKDSystem:
             I_AB = QIUtils.mutualInformation(variance_1=V_p_Rx_p, variance_2=2*n_p, covariance=C_p_mod_Rx_p) #[bit]
             I_AB += QIUtils.mutualInformation(variance_1=V_q_Rx_q, variance_2=2*n_q, covariance=C_q_mod_Rx_q)
             #Compute the entanglement-based covariance matrix of the system
+            if self.covariance_matrix_EB.expression_symbolic is None:
+                self.computeCovarianceMatrixEB(form='symbolic')
             CM_EB = self.covariance_matrix_EB.expression_symbolic
             CM_E = CM_EB[2:6,2:6]
             #Under the assumption that the entangling cloner is the optimal strategy for the eavesdropper, it is sufficient to consider
@@ -733,11 +738,81 @@ class QKDSystem:
             R = sympy.simplify(R)
             self.secret_key_rate.expression_symbolic = R 
         return R 
+
+    def compileKeyRate(self, cache_directory=None, use_numexpr=False):
+        """
+        This function compiles the secret key rate into a vectorized function of the QKD parameters.
+        The entanglement-based covariance matrix and the prepare & measure covariances are derived 
+        symbolically only once, and compiled with sympy.lambdify; the mutual information and the Holevo 
+        information are then evaluated with batched numpy operations, following keyRate.
+        The compiled expressions are cached on disk, keyed by the protocol and the QKD parameters,
+        so that later sessions skip the symbolic derivation of the entanglement-based covariance matrix.
+        
+        INPUTS
+        ----------
+        cache_directory : string
+            The directory of the on-disk cache. If None, diskcache.DEFAULT_CACHE_DIRECTORY is used.
+        use_numexpr : boolean
+            If 'True', the expressions are compiled with numexpr, which must be installed.
+        
+        OUTPUTS:
+        -------
+        key_rate : function
+            key_rate(beta=None, **parameters) returns the secret key rate, the Shannon's mutual information
+            and the Holevo information. The keyword arguments are the names of the QKD parameters
+            (e.g., eta=numpy.linspace(0, 1, 100)) and are broadcast against each other; 
+            the missing ones take the current values of the system.
+        """
+        parameter_names = list(vars(self.parameters).keys())
+        parameter_names.sort()
+        covariance_names = ['V_p_Rx_p', 'C_p_mod_Rx_p', 'V_q_Rx_q', 'C_q_mod_Rx_q']
+        modules = "numexpr" if use_numexpr else "numpy"
+        key = diskcache.cache_key("DualQuadratureSqueezedStatesQKD.QKDSystem.key_rate", \
+                                  inspect.getsource(QKDSystem.computeCovarianceMatrixEB), \
+                                  inspect.getsource(QKDSystem.computeCovarianceMatrixPMClassical), \
+                                  parameter_names, modules)
+        compiled = diskcache.load(key, cache_directory)
+        if compiled is None:
+            if self.covariance_matrix_EB.expression_symbolic is None:
+                self.computeCovarianceMatrixEB(form='symbolic')
+            symbols = [getattr(self.parameters, name).symbol for name in parameter_names]
+            CM_numeric = QIUtils.lambdifyMatrix(symbols, self.covariance_matrix_EB.expression_symbolic, modules)
+            covariances_numeric = QIUtils.lambdifyMatrix(symbols, sympy.Matrix([[getattr(self.covariances_PM, name).expression_symbolic \
+                                                                         for name in covariance_names]]), modules)
+            compiled = (CM_numeric, covariances_numeric)
+            diskcache.save(key, compiled, cache_directory)
+        CM_numeric, covariances_numeric = compiled
+        
+        def key_rate(beta=None, **parameters):
+            if beta is None:
+                beta = self.beta.value
+            for name in parameters:
+                if name not in parameter_names:
+                    raise InvalidOptionError("Invalid QKD parameter %s. Valid QKD parameters are %s"%(name, parameter_names))
+            input_values = [np.asarray(parameters[name] if name in parameters else getattr(self.parameters, name).value, dtype=float) \
+                            for name in parameter_names]
+            n_q, n_p = [input_values[parameter_names.index(name)] for name in ["n_q", "n_p"]]
+            V_p_Rx_p, C_p_mod_Rx_p, V_q_Rx_q, C_q_mod_Rx_q = np.moveaxis(covariances_numeric(*input_values)[..., 0, :], -1, 0)
+            #Compute the Shannon's mutual information of the modulated quadratures measured at the receiver's homodyne detectors
+            #and the modulation signals (QKD symbols) prepared at the transmitter 
+            I_AB = QIUtils.mutualInformation(variance_1=V_p_Rx_p, variance_2=2*n_p, covariance=C_p_mod_Rx_p) #[bit]
+            I_AB = I_AB + QIUtils.mutualInformation(variance_1=V_q_Rx_q, variance_2=2*n_q, covariance=C_q_mod_Rx_q)
+            #Compute the entanglement-based covariance matrix of the eavesdropper's modes, without and with
+            #homodyne detection of the receiver's mode along the 'p' quadrature
+            CM_EB = CM_numeric(*input_values)
+            CM_E = CM_EB[..., 2:6, 2:6]
+            CM_E_HD_B = QIUtils.conditionalCovarianceMatrix(CM_EB, [1])
+            #Compute the Holevo information
+            Chi_EB = QIUtils.VonNeumannEntropy(CM_E) - QIUtils.VonNeumannEntropy(CM_E_HD_B)
+            R = beta*I_AB - Chi_EB
+            return R, I_AB, Chi_EB
+        self.secret_key_rate.expression_numeric = key_rate
+        return key_rate
     
 
         
     def estimateParameters(self, parameter_names=None, covariance_names = None, \
-                           form='symbolic', configuration='real transmission', minimal=True):
+                           form='symbolic', configuration='real transmission', minimal=True, cache_directory=None):
         """
         This function performs parameter estimation of the parameters specified by
         
@@ -761,6 +836,11 @@ class QKDSystem:
             If True, then parameter estimation is performed by considering the simplified
             expressions for the prepare & measure covariances, where the trusted losses are
             grouped into T_Tx, T_A, T_p and T_q.
+        
+        cache_directory : string
+            The directory of the on-disk cache of solved systems of equations. The solutions are
+            keyed by the content of the system of equations, and by the names of the estimated parameters, 
+            of the known parameters and of the covariances. If None, diskcache.DEFAULT_CACHE_DIRECTORY is used.
 
         Returns
         -------
@@ -777,8 +857,7 @@ class QKDSystem:
         covariance_names.sort()
         parameters = [getattr(self.parameters, name) for name in parameter_names]
         #Load the known parameteres
-        known_parameter_names = [name for name in list(vars(self.parameters).keys()) if name not in parameter_names+['eta', 'w_q', 'w_p']]
-        known_parameter_names.sort()
+        known_parameter_names = self._KnownParameterNames(parameter_names)
         known_parameters = [getattr(self.parameters, name) for name in known_parameter_names]
         analytical_expression_missing = sum([p.expression_symbolic is None for p in parameters]) > 0
         #Check for possible errors in the input
@@ -800,25 +879,96 @@ class QKDSystem:
                     system.append(sympy.Eq(covariance.expression_symbolic, covariance.symbol))
             system = tuple(system)
             parameter_symbols = [p.symbol for p in parameters]
-            #Solve the system of equations
-            try:
-                solutions = sympy.solve(system, tuple(parameter_symbols), dict=True)[0]
-            except:
-                raise ParameterEstimationError('No solution was found')
+            #Look for the solution in the on-disk cache
+            key = diskcache.cache_key("DualQuadratureSqueezedStatesQKD.QKDSystem.estimateParameters", [sympy.srepr(equation) for equation in system], \
+                                      parameter_names, known_parameter_names, covariance_names, configuration, minimal)
+            estimators = diskcache.load(key, cache_directory)
+            if estimators is None:
+                #Solve the system of equations
+                try:
+                    solutions = sympy.solve(system, tuple(parameter_symbols), dict=True)[0]
+                except:
+                    raise ParameterEstimationError('No solution was found')
+                estimators = {}
+                for solution_symbol in list(solutions.keys()):
+                    estimators[solution_symbol.name] = (solutions[solution_symbol], \
+                        sympy.lambdify(known_parameter_names+covariance_names, fromNamesToVariables(str(solutions[solution_symbol]))))
+                diskcache.save(key, estimators, cache_directory)
             #Set the symbolic expressions into the QKD system
-            for solution_symbol in list(solutions.keys()):
-                parameter = [p for p in parameters if p.name==solution_symbol.name][0]
-                parameter.expression_symbolic = solutions[solution_symbol]
-                parameter.expression_numeric = sympy.lambdify(known_parameter_names+covariance_names, fromNamesToVariables(str(solutions[solution_symbol])))  
+            for name in list(estimators.keys()):
+                parameter = [p for p in parameters if p.name==name][0]
+                parameter.expression_symbolic, parameter.expression_numeric = estimators[name]
         else: 
             if analytical_expression_missing:
-                self.estimateParameters(parameter_names=parameter_names, covariance_names=covariance_names, form='symbolic', configuration=configuration)
+                self.estimateParameters(parameter_names=parameter_names, covariance_names=covariance_names, form='symbolic', \
+                                        configuration=configuration, minimal=minimal, cache_directory=cache_directory)
             #Load the known parameters as symbols or values
             known_parameters = [p.value for p in known_parameters]
             #Load the prepare & measure covariances as symbols or values
             covariances = [c.value for c in covariances]
             for parameter in parameters:
                 parameter.value = parameter.expression_numeric(*(known_parameters+covariances))
+    
+    def _KnownParameterNames(self, parameter_names):
+        """
+        Returns the names of the QKD parameters that are not estimated, in alphabetical order.
+        The channel parameters eta, w_q and w_p are never among them.
+        They are the first arguments of the numeric parameter estimators.
+        """
+        return sorted([name for name in list(vars(self.parameters).keys()) if name not in parameter_names+['eta', 'w_q', 'w_p']])
+    
+    def estimateParametersBatch(self, parameter_names, covariance_names, covariances, \
+                                configuration='real transmission', minimal=True, cache_directory=None):
+        """
+        This function performs numeric parameter estimation on many data blocks at once, 
+        e.g., on blocks of streamed data. The estimators are derived symbolically (see estimateParameters)
+        the first time that a set of estimated parameters, covariances, configuration and minimal is requested,
+        and are then kept in memory and evaluated on all the blocks with vectorized operations.
+        The values of the QKD parameters are left unchanged.
+        
+        Parameters
+        ----------
+        parameter_names : array-like of string
+            The names of the parameters to be estimated, in variables format (e.g., ['eta'])
+        covariance_names : array-like of string
+            The names of the quadrature covariances from which the parameters are to be estimated, in variable format (e.g., ['V_q_Tx'])
+        covariances : dict or 2D array-like of float
+            The measured prepare & measure covariances, one value per data block. Either a dictionary with 
+            the covariance names as keys and 1D arrays as values, or an array of shape (n_blocks, len(covariance_names)),
+            whose columns follow the alphabetical order of covariance_names.
+        configuration : string
+            See estimateParameters
+        minimal : boolean
+            See estimateParameters
+        cache_directory : string
+            See estimateParameters
+
+        Returns
+        -------
+        estimates : dict
+            The estimated parameters, with the parameter names as keys and numpy.ndarray of shape (n_blocks,) as values.
+        """
+        parameter_names = sorted(parameter_names)
+        covariance_names = sorted(covariance_names)
+        key = (tuple(parameter_names), tuple(covariance_names), configuration, minimal)
+        if key not in self._estimators:
+            self.estimateParameters(parameter_names=list(parameter_names), covariance_names=list(covariance_names), form='symbolic', \
+                                    configuration=configuration, minimal=minimal, cache_directory=cache_directory)
+            self._estimators[key] = [getattr(self.parameters, name).expression_numeric for name in parameter_names]
+        estimators = self._estimators[key]
+        #Load the known parameters values
+        known_parameter_names = self._KnownParameterNames(parameter_names)
+        known_parameters = [getattr(self.parameters, name).value for name in known_parameter_names]
+        #Load the measured covariances, one array per covariance
+        if isinstance(covariances, dict):
+            covariances = [np.asarray(covariances[name], dtype=float) for name in covariance_names]
+        else:
+            covariances = list(np.moveaxis(np.atleast_2d(np.asarray(covariances, dtype=float)), -1, 0))
+        shape = np.broadcast(*covariances).shape
+        estimates = {}
+        for name, estimator in zip(parameter_names, estimators):
+            estimates[name] = np.broadcast_to(estimator(*(known_parameters+covariances)), shape)
+        return estimates
                         
 #%%    
 def fromNamesToVariables(string_symbols):
@@ -837,4 +987,8 @@ def fromNamesToVariables(string_symbols):
 class ParameterEstimationError(Exception):
     def __init__(self, error_message):
         print(error_message)
+        
+class InvalidOptionError(Exception):
+    def __init__(self, error_message='The selected option is invalid'):
+        print(error_message)
         
\ No newline at end of file
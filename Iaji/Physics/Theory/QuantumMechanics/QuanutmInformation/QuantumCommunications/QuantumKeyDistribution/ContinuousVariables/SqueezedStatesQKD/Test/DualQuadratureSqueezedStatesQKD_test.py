@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This script tests the DualQuadratureSqueezedStatesQKD module: the compiled key rate is compared
+with the symbolic key rate from keyRate(form='symbolic'), evaluated at one parameter point.
+"""
+# In[imports]
+from Iaji.Physics.Theory.QuantumMechanics.QuanutmInformation.QuantumCommunications.QuantumKeyDistribution.ContinuousVariables.SqueezedStatesQKD.DualQuadratureSqueezedStatesQKD \
+    import QKDSystem, QKDParameters
+import numpy, tempfile
+# In[Compiled key rate]
+parameters = QKDParameters(T_Tx=0.9, eta=0.6, tau_Rx=0.95, R_Rx=0.5, tau_q=0.9, t_q=0.01, tau_p=0.9, t_p=0.01, \
+                           V_s=0.5, V_a=3, n_q=1.5, n_p=1, w_q=0.05, w_p=0.05, sigma_phi_Tx=0, sigma_phi_Rx=0)
+system = QKDSystem(parameters=parameters)
+system.beta.value = 0.95
+R_symbolic = system.keyRate(form='symbolic')
+values = [(p.symbol, p.value) for p in system.parameters.toList() if p.value is not None] + [(system.beta.symbol, system.beta.value)]
+R = float(R_symbolic.subs(values))
+R_compiled = float(system.compileKeyRate(cache_directory=tempfile.mkdtemp())()[0])
+print("key rate: %.6f, compiled key rate: %.6f, abs. difference: %.2e"%(R, R_compiled, numpy.abs(R - R_compiled)))
@@ -15,6 +15,7 @@ from uncertainties import umath
 import sympy
 sympy.init_printing()
 from scipy.linalg import sqrtm
+from scipy.special import xlogy
 from quik.qip.nmodes_symbolic import CovarianceMatrix
 from quik.qip.nmodes import covariancematrix
 from quik.qip.nmodes import vacuum
@@ -45,65 +46,96 @@ def symplecticOmega(n_modes, form='symbolic'):
         Omega[2*j:2*j+1+1, 2*j:2*j+1+1] = omega
     return Omega
 #%%
-def symplecticEigenvalues(covariance_matrix):
+def symplecticEigenvalues(covariance_matrix, Omega=None):
     """
     This function computes the symplectic eigenvalues of the specified covariance matrix.
-    Given the covariance matrix of a Gaussian quantum state, V, the simplectic eigenvalues of V are the set
-    of the distinct modulii of the eigenvalues of the matrix
+    Given the covariance matrix of a Gaussian quantum state, V, the simplectic eigenvalues of V are the
+    modulii of the eigenvalues of the matrix
                                 i Omega V
-    where Omega is the symplectic matrix.
+    where Omega is the symplectic matrix. They are computed as the positive eigenvalues of the
+    real symmetric matrix
+                                -(L^T Omega L)^2
+    where V = L L^T, whose eigenvalues are the squared symplectic eigenvalues, each appearing twice.
+    Stacks of covariance matrices are processed in a single batched call.
     
     INPUTS
     -----------------
-    covariance_matrix: 2D array-like of float
-        the covariance matrix of the Gaussian quantum state of which the symplectic values are to be calculated.
+    covariance_matrix: array-like of float, of shape (..., 2N, 2N)
+        the covariance matrix of the Gaussian quantum state of which the symplectic values are to be calculated,
+        or a stack of covariance matrices of the same shape.
         The covariance matrix is assumed to be squared, with even dimension.
+    Omega: 2D array-like of float, of shape (2N, 2N)
+        the symplectic matrix. If None, the one returned by symplecticOmega is used.
     
     OUTPUTS
     -----------------
-    symplectic_eigenvalues: array-like of float
-        symplectic eigenvalues of the covariance matrix
-    """
-    N = int(covariance_matrix.shape[0]/2) #number of modes of the bosonic field.
-    Omega = symplecticOmega(N)    
-    covariance_matrix = np.asarray(covariance_matrix, dtype=float)   
-    #Construct the symplectic matrix corresponding the input covariance matrix  
-    N = int(covariance_matrix.shape[0]/2) #number of modes of the bosonic field.
+    symplectic_eigenvalues: numpy.ndarray of float, of shape (..., N)
+        symplectic eigenvalues of the covariance matrix, sorted in ascending order
+    """
+    covariance_matrix = np.asarray(covariance_matrix, dtype=float)
+    N = int(covariance_matrix.shape[-1]/2) #number of modes of the bosonic field.
     #Construct the basic symplectic matrix
-    Omega = np.asarray(symplecticOmega(N, form="numeric"), dtype=float)
-    C_symplectic = 1j*Omega @ covariance_matrix
+    if Omega is None:
+        Omega = symplecticOmega(N, form="numeric")
+    Omega = np.asarray(Omega, dtype=float)
+    #Factorize the covariance matrix as V = L L^T, so that i Omega V is similar to i L^T Omega L
+    try:
+        L = np.linalg.cholesky(covariance_matrix)
+    except np.linalg.LinAlgError:
+        #Not positive definite: use the symmetric square root, clipping the negative eigenvalues
+        w, U = np.linalg.eigh(covariance_matrix)
+        L = (U*np.sqrt(np.clip(w, 0, None))[..., np.newaxis, :]) @ np.swapaxes(U, -1, -2)
+    A = np.swapaxes(L, -1, -2) @ Omega @ L #real antisymmetric, with eigenvalues +/- i*nu
     #Compute the symplectic eigenvalues of the input covariance matrix
-    symplectic_eigenvalues = np.abs(np.linalg.eig(C_symplectic)[0])
-    symplectic_eigenvalues = symplectic_eigenvalues[::3]
-    for j in range(N):
-        s = symplectic_eigenvalues[j]
-        if np.isclose(s, 1):
-            symplectic_eigenvalues[j] = 1
+    nu_squared = np.linalg.eigvalsh(np.swapaxes(A, -1, -2) @ A)
+    symplectic_eigenvalues = np.sqrt(np.clip(nu_squared[..., 1::2], 0, None))
+    symplectic_eigenvalues[np.isclose(symplectic_eigenvalues, 1)] = 1
     if np.any(symplectic_eigenvalues < 1):   
         print("unphysical covariance matrix")
-    return np.array(symplectic_eigenvalues)
+    return symplectic_eigenvalues
+#%%
+def entropyFunction(symplectic_eigenvalues):
+    """
+    This function computes the entropy function of the symplectic eigenvalues nu of a
+    Gaussian state,
+                g(nu) = ((nu+1)/2)*log2((nu+1)/2) - ((nu-1)/2)*log2((nu-1)/2)
+    elementwise, with g(1) = 0. Unphysical eigenvalues (nu < 1) give numpy.nan.
+    
+    INPUTS
+    ----------
+    symplectic_eigenvalues : array-like of float
+    
+    OUTPUTS
+    -------
+    g : numpy.ndarray of float, of the same shape as the input
+    """
+    nu = np.asarray(symplectic_eigenvalues, dtype=float)
+    with np.errstate(invalid="ignore"):
+        return (xlogy((nu+1)/2, (nu+1)/2) - xlogy((nu-1)/2, (nu-1)/2))/np.log(2)
 #%%
-def VonNeumannEntropy(covariance_matrix, print_warnings=False):
+def VonNeumannEntropy(covariance_matrix, print_warnings=False, Omega=None):
     """
     This function computes the von Neumann entropy of the Gaussian quantum state
     with 'covariance_matrix' as the associated covariance matrix.
     
     INPUTS
     ----------
-    covariance_matrix : 2D array-like of float
-       input covariance matrix, assumed to be squared, with even dimension.
+    covariance_matrix : array-like of float, of shape (..., 2N, 2N)
+       input covariance matrix, assumed to be squared, with even dimension, or a
+       stack of covariance matrices of the same shape.
     print_warnings: boolean
         If 'True', the function will print eventual warnings regarding the calculations. 
+    Omega: 2D array-like of float, of shape (2N, 2N)
+        the symplectic matrix. If None, the one returned by symplecticOmega is used.
     OUTPUTS
     -------
-    S: float
+    S: float, or numpy.ndarray of float of shape (...)
         von Neumann entropy of the Gaussian state with input covariance matrix.
     """
-    ni = symplecticEigenvalues(covariance_matrix) #symplectic eigenvalues of the covariance matrixvacuum]:   
-    g = ((ni+1)/2)*np.log2((ni+1)/2) - ((ni-1)/2)*np.log2((ni-1)/2) #composite function of the symplectic eigenvalues
-    g = [g_0 for g_0 in g if str(g_0) != "nan"]
-    S = np.sum(g) #von Neumann entropy
-    if print_warnings and S<0:
+    ni = symplecticEigenvalues(covariance_matrix, Omega) #symplectic eigenvalues of the covariance matrix
+    #the entropy function of unphysical symplectic eigenvalues is not defined, and does not contribute
+    S = np.nansum(entropyFunction(ni), axis=-1) #von Neumann entropy
+    if print_warnings and np.any(S<0):
         print("Warning in vonNeumannEntropy(): the calculated entropy is negative.")
     return S
 #%%
@@ -133,6 +165,66 @@ def mutualInformation(variance_1, variance_2, covariance):
     """
     return -1/2*np.log2(1-covariance**2/(variance_1*variance_2))
 #%%
+def conditionalCovarianceMatrix(covariance_matrix, measured_indices):
+    """
+    This function computes the covariance matrix of a Gaussian quantum state after
+    homodyne detection of the specified quadratures. The measured modes are removed, 
+    and the remaining quadratures are conditioned on the measurement outcomes:
+                    V_{K|M} = V_{KK} - V_{KM} V_{MM}^{-1} V_{MK}
+    where K (M) denotes the kept (measured) quadratures.
+    
+    INPUTS
+    ----------
+    covariance_matrix : array-like of float, of shape (..., 2N, 2N)
+       input covariance matrix, or stack of covariance matrices.
+    measured_indices : array-like of int
+        indices of the measured quadratures, in the ordering of the covariance matrix.
+        All the modes containing at least one measured quadrature are removed.
+    OUTPUTS
+    -------
+    conditional_covariance_matrix: numpy.ndarray of float, of shape (..., 2K, 2K)
+        covariance matrix of the unmeasured modes, conditioned on the measurement outcomes.
+    """
+    covariance_matrix = np.asarray(covariance_matrix, dtype=float)
+    measured_indices = list(measured_indices)
+    measured_modes = set([index//2 for index in measured_indices])
+    kept_indices = [j for j in range(covariance_matrix.shape[-1]) if j//2 not in measured_modes]
+    V_KK = covariance_matrix[..., kept_indices, :][..., kept_indices]
+    V_KM = covariance_matrix[..., kept_indices, :][..., measured_indices]
+    V_MM = covariance_matrix[..., measured_indices, :][..., measured_indices]
+    return V_KK - V_KM @ np.linalg.solve(V_MM, np.swapaxes(V_KM, -1, -2))
+#%%
+def lambdifyMatrix(symbols, matrix, modules="numpy"):
+    """
+    This function compiles a symbolic matrix into a vectorized function of the input symbols.
+    
+    INPUTS
+    ----------
+    symbols : array-like of sympy.Symbol
+        The arguments of the compiled function
+    matrix : 2D array-like of sympy expressions
+        The symbolic matrix
+    modules : string
+        The module used by sympy.lambdify ('numpy' or 'numexpr')
+        
+    OUTPUTS:
+    -------
+    A function of the input symbols, returning a numpy.ndarray of shape (..., n, m), 
+    where (...) is the broadcast shape of the arguments.
+    """
+    shape = np.shape(matrix)
+    entries = [sympy.sympify(matrix[j, k]) for j in range(shape[0]) for k in range(shape[1])]
+    if modules == "numexpr":
+        functions = [sympy.lambdify(symbols, entry, modules) for entry in entries]
+        function = lambda *args: [f(*args) for f in functions]
+    else:
+        function = sympy.lambdify(symbols, entries, modules, cse=True)
+    n_entries = len(entries)
+    def matrix_function(*args):
+        values = np.broadcast_arrays(*[np.asarray(value, dtype=float) for value in function(*args)], *args)[:n_entries]
+        return np.stack(values, axis=-1).reshape(values[0].shape + shape)
+    return matrix_function
+#%%
 #Validity check functions
 def isPositiveDefinite(matrix):
     """
@@ -47,6 +47,11 @@ system_BS.state.PlotWignerFunction(q, p, plot_name="BS")
 #%%
 system_loss = system.Squeeze("A_{0}", 0.6).Loss(["A_{0}"], [0.5]).SelectModes("A_{0}")
 system_loss.state.PlotWignerFunction(q, p, plot_name="loss")
+#%%
+system_thermal_loss = system.Squeeze("A_{0}", 0.6).ThermalLoss(["A_{0}"], [0.5], [0.5]).SelectModes("A_{0}")
+system_thermal_loss.state.PlotWignerFunction(q, p, plot_name="thermal loss")
+system_amplified = system.Displace("A_{0}", 0.5).Amplify(["A_{0}"], [1.5]).SelectModes("A_{0}")
+system_amplified.state.PlotWignerFunction(q, p, plot_name="amplifier")
 # In[Two-mde squeezed vacuum state] 
 #Two-mode squeezed vacuum from single-mode squeezing and beam splitting
 zeta = numpy.log(10**(5/10))/2
@@ -86,4 +91,13 @@ ON_operator = MatrixNumeric.TensorProduct([*[MatrixNumeric.Eye(m.hilbert_space.d
 #Simulate the ON outcome according to the generalized Born rule
 post_measurement_field = system_TMSV._GeneralizedBornRule(ON_operator)[0]
 post_measurement_field.SelectModes("A_{0}").state.PlotNumberDistribution(plot_name="ON detection - measured mode")
-post_measurement_field.SelectModes("A_{1}").state.PlotNumberDistribution(plot_name="ON detection - other mode")
\ No newline at end of file
+post_measurement_field.SelectModes("A_{1}").state.PlotNumberDistribution(plot_name="ON detection - other mode")
+# In[Batched sampling and heralding from two-mode squeezed vacuum]
+#The joint outcome distribution is computed once, and all the outcomes are drawn at once
+outcomes, values, p = system_TMSV.Sample(modes=system_TMSV.mode_names, measurable="n", ntimes=int(1e6))
+print("Fraction of samples with equal boson numbers: %f"%numpy.mean(outcomes[:, 0] == outcomes[:, 1]))
+#Herald a single boson in mode A_{1} by detecting a single boson in mode A_{0}
+n_heralds, rate, rate_std, probability = system_TMSV.HeraldingStatistics("A_{0}", "n", accepted=[1], ntimes=int(1e6))
+print("Heralding rate: %f +/- %f (exact: %f)"%(rate, rate_std, probability))
+system_heralded, _ = system_TMSV.Herald("A_{0}", "n", accepted=[1])
+system_heralded.state.PlotNumberDistribution(plot_name="heralded single boson")
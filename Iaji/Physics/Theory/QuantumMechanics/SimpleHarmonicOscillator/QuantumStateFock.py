@@ -20,8 +20,11 @@ from Iaji.Physics.Theory.QuantumMechanics.QuantumState import QuantumStateSymbol
                                                               WignerFunctionSymbolic, \
                                                               QuantumStateNumeric, \
                                                               QuantumState
+from Iaji.Physics.Theory.QuantumMechanics.SimpleHarmonicOscillator.Utilities import wignerFunctionOnGrid, \
+                                                                                 wignerFunctionFFT, WIGNER_MAX_MEMORY, WIGNER_METHODS
 import sympy, numpy, scipy
 from sympy import assoc_laguerre
+from scipy.special import gammaln
 from copy import deepcopy as copy
 # In[GUI imports]
 import matplotlib
@@ -244,6 +247,7 @@ class QuantumStateFockNumeric(QuantumStateNumeric):
          """
          e0 = self.hilbert_space.CanonicalBasisVector(0).numeric
          self._density_operator = e0 @ e0.T()
+         self._density_operator.Freeze()
          self.density_operator.name = "\\left|%d\\right\\rangle\\left\\langle%d\\right|_{%s}"\
              %(int(0), int(0), self.name)
          self._wigner_function = ParameterNumeric(name="W_{%s}"%self.name)
@@ -260,6 +264,7 @@ class QuantumStateFockNumeric(QuantumStateNumeric):
           assert n == int(n)
           en = self.hilbert_space.CanonicalBasisVector(int(n)).numeric
           self._density_operator = en @ en.T()
+          self._density_operator.Freeze()
           self.density_operator.name = "\\left|%d\\right\\rangle\\left\\langle%d\\right|_{%s}"\
               %(int(n), int(n), self.name)
           self._wigner_function = ParameterNumeric(name="W_{%s}"%self.name)
@@ -303,13 +308,13 @@ class QuantumStateFockNumeric(QuantumStateNumeric):
         """
         if order >= self.hilbert_space.dimension-1:
             return copy(self)
-        #Construct truncation operator
+        #Construct truncation operator, which is diagonal in the number basis, with elements
+        #order!/((order-n)!*order^n) for n <= order
         N = self.hilbert_space.dimension
-        T = MatrixNumeric.Zeros((N, N))
-        for n in range(order+1):
-            proj = self.hilbert_space.CanonicalBasisVector(n).numeric
-            proj = proj @ proj.Dagger()
-            T += proj*numpy.math.factorial(order)/(numpy.math.factorial(order-n)*order**n)
+        n = numpy.arange(order+1)
+        T = MatrixNumeric(name="T_{%d}"%order)
+        T.value = numpy.diag(numpy.concatenate((numpy.exp(gammaln(order+1) - gammaln(order-n+1) \
+                                                          - n*numpy.log(max(order, 1))), numpy.zeros(N-order-1))))
         #Apply the truncation operator to the current quantum state
         rho = copy(self).density_operator
         rho = T @ rho @ T.Dagger()
@@ -354,33 +359,25 @@ class QuantumStateFockNumeric(QuantumStateNumeric):
         state.resized.emit()
         return state
     # ----------------------------------------------------------
-    def WignerFunction(self, q, p):
+    def WignerFunction(self, q, p, max_memory=WIGNER_MAX_MEMORY, method="laguerre"):
         """
         Calculates the Wigner function in the number states basis from the
-        density matrix
+        density matrix. The quadrature grid is processed in chunks, so that
+        the memory does not exceed 'max_memory' [bytes].
+        
+        'method' is one of WIGNER_METHODS:
+            - 'laguerre': expansion in associated Laguerre polynomials
+            - 'fft': Fourier transform of the position representation of the density 
+              operator. It requires regularly spaced q and p, and it is faster for 
+              large Hilbert space dimensions.
         """
+        if method not in WIGNER_METHODS:
+            raise ValueError("Invalid Wigner function method %s. Valid methods are %s"%(method, WIGNER_METHODS))
         P, Q = numpy.meshgrid(numpy.atleast_1d(p), numpy.atleast_1d(q))
-        W = numpy.zeros((len(p), len(q)), dtype=complex)
-        N = self.hilbert_space.dimension - 1 #dimension of the (truncated) Hilbert space of rho
-        W_nm = numpy.zeros((len(p), len(q), N+1, N+1), dtype=complex) #expansion coefficients of the Wigner function
-        X = 2*(Q**2 + P**2)
-        #Compute the lower triangle of the matrix W_nm
-        for n in numpy.arange(N+1):
-            for m in numpy.arange(n+1):
-                k=m
-                alpha = float(n-m)
-                W_nm[:, :, n, m] = 1/numpy.pi * numpy.exp(-0.5*X) * (-1)**m \
-                                   *(Q-1j*P)**(n-m) * numpy.sqrt( 2**(n-m)*scipy.special.gamma(m+1)/scipy.special.gamma(n+1) )\
-                                   * scipy.special.assoc_laguerre(x=X, n=k, k=alpha)     
-        #Compute the upper triangle without the diagonal
-        for m in numpy.arange(N+1):
-            for n in numpy.arange(m):
-                W_nm[:, :, n, m] = numpy.conj(W_nm[:, :, m, n])
-        
-        #Compute the Wigner function
-        for n in numpy.arange(N+1):
-            for m in numpy.arange(N+1):
-                W += W_nm[:, :, n, m] * self.density_operator.value[n, m]
+        if method == "fft":
+            W = wignerFunctionFFT(self.density_operator.value, q, p, max_memory=max_memory)
+        else:
+            W = wignerFunctionOnGrid(self.density_operator.value, Q, P, max_memory=max_memory)
         #Get rid of nan values
         shape = W.shape
         W = W.flatten()
@@ -393,12 +390,12 @@ class QuantumStateFockNumeric(QuantumStateNumeric):
         self.wigner_function.value = W
         return Q, P, W
     #----------------------------------------------------------
-    def PlotWignerFunction(self, q, p, alpha=0.5, colormap=cmwig1, plot_name = None, plot_contour_on_3D=True):
+    def PlotWignerFunction(self, q, p, alpha=0.5, colormap=cmwig1, plot_name = None, plot_contour_on_3D=True, method="laguerre"):
          assert self.hilbert_space is not None, \
              "This quantum state is not associated with any Hilbert space"
          assert not self.isTensorProduct(),\
             "Cannot plot the Wigner function of a composite system is not supported"
-         Q, P, W = self.WignerFunction(q, p)
+         Q, P, W = self.WignerFunction(q, p, method=method)
          W *= numpy.pi
          W_max = numpy.max(numpy.abs(W))
          #Define the x and y axes lines as a 2D function
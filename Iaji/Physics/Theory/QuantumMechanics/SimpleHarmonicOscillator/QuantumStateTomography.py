@@ -30,18 +30,59 @@ def homodyneFockPOVM(n_max, x, theta):
     x: scalar
     theta: scalar
     """
-    #For each element of x, a POVM matrix is computed
+    wavefunction = homodyneFockWavefunctions(n_max, x, theta)
+    return numpy.tensordot(wavefunction, numpy.conj(wavefunction), axes=0)
+#%%
+def homodyneFockWavefunctions(n_max, x, theta):
+    """
+    This function computes the generalized quadrature wavefunctions <n|X_theta>
+    in the Fock basis, for n = 0, ..., n_max, using the Hermite recurrence.
+    The recurrence is evaluated for all the elements of x and theta at once.
+    
+    n_max: positive integer
+    x: array-like of float
+    theta: array-like of float, broadcastable against x
+    
+    OUTPUTS
+    -----------
+    array of complex with shape (n_max+1, *numpy.broadcast(x, theta).shape)
+    """
     if n_max < 2:
         raise InvalidDimensionError('The Hilbert space dimension must be at least 2')
-    POVM = numpy.zeros((n_max+1, ), dtype=complex)
-    for n in numpy.arange(n_max):
-        if n==0:
-            POVM[n] = 1/(numpy.sqrt(numpy.sqrt(numpy.pi)))*numpy.exp(-0.5*x**2)
-        elif n==1:
-            POVM[n] = x*numpy.sqrt(2)*numpy.exp(-1j*theta) * POVM[0]
-        else:
-            POVM[n] = numpy.exp(-1j*theta)/numpy.sqrt(n)*(numpy.sqrt(2)*x*POVM[n-1] - numpy.exp(-1j*theta)*numpy.sqrt(n-1)*POVM[n-2])
-    return numpy.tensordot(POVM, numpy.conj(POVM), axes=0)
+    x, theta = numpy.broadcast_arrays(numpy.asarray(x, dtype=float), numpy.asarray(theta, dtype=float))
+    phase = numpy.exp(-1j*theta)
+    wavefunctions = numpy.zeros((n_max+1, *x.shape), dtype=complex)
+    wavefunctions[0] = 1/(numpy.sqrt(numpy.sqrt(numpy.pi)))*numpy.exp(-0.5*x**2)
+    wavefunctions[1] = x*numpy.sqrt(2)*phase * wavefunctions[0]
+    for n in numpy.arange(2, n_max+1):
+        wavefunctions[n] = phase/numpy.sqrt(n)*(numpy.sqrt(2)*x*wavefunctions[n-1] - phase*numpy.sqrt(n-1)*wavefunctions[n-2])
+    return wavefunctions
+#%%
+def homodyneFockPOVMTensor(n_max, x_bin_edges, phases, n_x=1):
+    """
+    This function computes the homodyne detection POVM in the Fock basis,
+    averaged over each quadrature bin, for all bins and phases at once.
+    The POVM of a bin is sampled at 'n_x' points, evenly spaced from the left 
+    edge to the right edge of the bin, and multiplied by the bin width.
+    
+    n_max: positive integer
+    x_bin_edges: 1-D array-like of float, with n_bins+1 elements
+    phases: 1-D array-like of float, with n_phases elements
+    n_x: positive integer
+    
+    OUTPUTS
+    -----------
+    array of complex with shape (n_max+1, n_max+1, n_bins, n_phases)
+    """
+    x_bin_edges = numpy.asarray(x_bin_edges, dtype=float)
+    bin_widths = numpy.diff(x_bin_edges)
+    #Sampling points of each bin, with shape (n_bins, n_x)
+    x = x_bin_edges[:-1, numpy.newaxis] + bin_widths[:, numpy.newaxis]*numpy.linspace(0, 1, n_x)[numpy.newaxis, :]
+    #Wavefunctions with shape (n_max+1, n_bins, n_x, n_phases)
+    wavefunctions = homodyneFockWavefunctions(n_max, x[:, :, numpy.newaxis], \
+                                              numpy.asarray(phases, dtype=float)[numpy.newaxis, numpy.newaxis, :])
+    return numpy.einsum('njkp,mjkp->nmjp', wavefunctions, numpy.conj(wavefunctions), optimize=True) \
+        * bin_widths[numpy.newaxis, numpy.newaxis, :, numpy.newaxis]
 
 #%%
 def homodyneFockPOVM_2(n_max, x, theta):
@@ -119,7 +160,8 @@ class QuadratureTomographer:
         self.dt_filtered = self.dt*float(int(self.n_samples/len(self.quadratures[self.phases[0]]))) #time separation between adjacent filtered quadrature samples [s]
         self.vacuum /= (numpy.var(self.vacuum)*2)**0.5 
         
-    def reconstruct(self, n_bins=None, n_max=None, quadratures_range_increase=2, convergence_rule=None, convergence_parameter=None, method='maximum likelihood'):
+    def reconstruct(self, n_bins=None, n_max=None, quadratures_range_increase=2, convergence_rule=None, convergence_parameter=None, method='maximum likelihood', \
+                    dilution=None, acceleration=1, check_every=10, verbose=False):
         """
         This function performs tomographic state reconstruction.
         
@@ -140,6 +182,19 @@ class QuadratureTomographer:
                 Convergence threshold
             method : string
                 State reconstruction method
+            dilution : float (>0)
+                If not None, the diluted iteration operator (I + dilution*R)/(1 + dilution) is used,
+                with R normalized to the identity at convergence. Small values guarantee
+                that the likelihood increases at each iteration; large values recover
+                the standard R*rho*R iteration.
+            acceleration : float (>=1)
+                The iteration operator is raised to this power at each step. Values 
+                larger than 1 take longer steps along the same direction.
+            check_every : integer (>0)
+                The estimated density operator is checked to be a valid density matrix 
+                once every 'check_every' iterations, and after the last one
+            verbose : bool
+                If True, the convergence metrics are printed at each iteration
         OUTPUS
         -----------
         None
@@ -184,56 +239,77 @@ class QuadratureTomographer:
             #- Precompute the number of quadrature observations per each bin
         #-------------------------------------------------------------------
         n_x = 1
-        self.projection_operators = numpy.zeros((self.n_max+1, self.n_max+1, self.n_bins, self.n_phases), dtype=complex)
+        self.projection_operators = homodyneFockPOVMTensor(n_max=n_max, x_bin_edges=x_bin_edges, \
+                                                           phases=self.phases, n_x=n_x)
         self.n_observations = numpy.zeros((self.n_bins, self.n_phases))
         for p in range(self.n_phases):
-            phase = self.phases[p]
-            x = self.quadratures[phase]
-            for j in range(self.n_bins): #for each bin
-                projection_operator = numpy.zeros((self.n_max+1, self.n_max+1), dtype=complex)
-                #Compute the average projection operator and the number of quadrature observations               
-                x_bin = x[numpy.where(numpy.logical_and(x>x_bin_edges[j], x<x_bin_edges[j+1]))]
-                x_bin_continuous = numpy.linspace(x_bin_edges[j], x_bin_edges[j+1], n_x)
-                self.n_observations[j, p] = len(x_bin)
-                #Compute the average projection operator
-                #print('Computing wavefunctions')
-                for k in range(n_x):
-                    projection_operator += homodyneFockPOVM(n_max=n_max, x=x_bin_continuous[k], theta=phase)
-                self.projection_operators[:, :, j, p] = projection_operator *(x_bin_edges[j+1]-x_bin_edges[j])
+            #Compute the number of quadrature observations per bin
+            self.n_observations[:, p] = numpy.histogram(self.quadratures[self.phases[p]], bins=x_bin_edges)[0]
         #-----------------------------------------------
         #Run the maximum likelihood algorithm
         #-----------------------------------------------
+        #The projection operators are flattened to a (dimension^2, n_bins*n_phases) matrix,
+        #so that all the measurement probabilities and the iteration operator are
+        #computed as matrix-vector products
+        dimension = self.projection_operators.shape[0]
+        self._projection_operators_matrix = self.projection_operators.reshape((dimension**2, -1))
+        self.measurement_probabilities = numpy.zeros((self.n_bins, self.n_phases))
         has_converged = [False]
+        n_iterations = 0
         while not has_converged[0]:
             self.rho_last = self.rho 
-            self.R = numpy.zeros((self.n_max+1, self.n_max+1), dtype=complex)
-            self.measurement_probabilities = numpy.zeros((self.n_bins, self.n_phases))
-            log_likelihood = 0
-            for p in range(self.n_phases):
-                for j in range(self.n_bins): #for each bin
-                    self.measurement_probabilities[j, p] = numpy.trace(self.projection_operators[:, :, j, p] @ self.rho)
-            self.measurement_probabilities /= self.n_phases
-            self.R = numpy.tensordot(self.n_observations/self.measurement_probabilities, self.projection_operators, axes=([0, 1], [2, 3]))              
-            self.R /= numpy.trace(self.R)
-            log_likelihood = numpy.sum(self.n_observations*numpy.log(self.measurement_probabilities), (0, 1))
-            self.R = (self.R+numpy.transpose(numpy.conj(self.R)))/2
-           # self.R /= numpy.trace(self.R)
-            self.rho = self.R @ (self.rho @ self.R)
-            #self.rho = (self.rho+numpy.transpose(numpy.conj(self.rho)))/2
-            self.rho /= numpy.trace(self.rho)
-            #Check that it is a density matrix
-            is_density_matrix = qfutils.isDensityMatrix(self.rho)
-            if not is_density_matrix[0]:
-                raise NotADensityMatrixError(str(is_density_matrix[1]))
+            log_likelihood = self._maximumLikelihoodIteration(dilution=dilution, acceleration=acceleration)
+            n_iterations += 1
             self.log_likelihood.append(log_likelihood)
             has_converged = self.hasConverged(convergence_rule=convergence_rule, convergence_parameter=convergence_parameter)
+            #Check that it is a density matrix
+            if n_iterations % check_every == 0 or has_converged[0]:
+                is_density_matrix = qfutils.isDensityMatrix(self.rho)
+                if not is_density_matrix[0]:
+                    raise NotADensityMatrixError(str(is_density_matrix[1]))
             for rule in ["fidelity of state", "fidelity of iteration operator", "trace distance(iteration operator, identity)",\
                          "likelihood"]:
                 self.convergence_metris[rule].append(has_converged[1][rule])
-            print(self.convergence_rule+': '+str(has_converged))
+            if verbose:
+                print(self.convergence_rule+': '+str(has_converged))
             
         #----------------------------------------------
 
+    def _maximumLikelihoodIteration(self, dilution=None, acceleration=1):
+        """
+        This function performs one iteration of the maximum likelihood algorithm,
+        rho -> R*rho*R, and updates self.rho, self.R and self.measurement_probabilities.
+        
+        INPUTS
+        ------------
+            dilution : float (>0)
+                See QuadratureTomographer.reconstruct
+            acceleration : float (>=1)
+                See QuadratureTomographer.reconstruct
+        OUTPUTS
+        -----------
+        The log-likelihood of the density operator before the iteration
+        """
+        dimension = self.rho.shape[0]
+        #p[j, p] = Tr(Pi[j, p] @ rho) = sum_{n, m} Pi[n, m, j, p]*rho[m, n]
+        self.measurement_probabilities[:] = numpy.real(self.rho.T.reshape((-1,)) @ self._projection_operators_matrix)\
+                                             .reshape(self.measurement_probabilities.shape)
+        self.measurement_probabilities /= self.n_phases
+        self.R = (self._projection_operators_matrix @ (self.n_observations/self.measurement_probabilities).reshape((-1,)))\
+                .reshape((dimension, dimension))
+        self.R /= numpy.trace(self.R)
+        log_likelihood = numpy.sum(self.n_observations*numpy.log(self.measurement_probabilities), (0, 1))
+        self.R = (self.R+numpy.transpose(numpy.conj(self.R)))/2
+        R = self.R
+        if dilution is not None:
+            R = (numpy.eye(dimension) + dilution*dimension*R)/(1 + dilution)
+        if acceleration != 1:
+            w, V = numpy.linalg.eigh(R)
+            R = (V*numpy.power(numpy.clip(w, 0, None), acceleration)) @ numpy.conj(V.T)
+        self.rho = R @ (self.rho @ R)
+        self.rho /= numpy.trace(self.rho)
+        return log_likelihood
+
     def hasConverged(self, convergence_rule=None, convergence_parameter=None):
         """
         This function verifies the convergence of the quantum state tomography method
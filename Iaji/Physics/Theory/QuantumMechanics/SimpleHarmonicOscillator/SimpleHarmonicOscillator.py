@@ -3,7 +3,7 @@ This module defines a simple harmonic oscillator.
 """
 # In[]
 import Iaji
-from Iaji.Mathematics.Parameter import ParameterSymbolic, ParameterNumeric
+from Iaji.Mathematics.Parameter import ParameterSymbolic, ParameterNumeric, LazyName
 from Iaji.Mathematics.Pure.Algebra.LinearAlgebra.Matrix import MatrixSymbolic, MatrixNumeric
 from Iaji.Mathematics.Pure.Algebra.LinearAlgebra.DensityMatrix import DensityMatrixSymbolic, \
      DensityMatrixNumeric
@@ -13,9 +13,13 @@ from Iaji.Mathematics.Pure.Algebra.LinearAlgebra.HilbertSpace import HilbertSpac
 from Iaji.Physics.Theory.QuantumMechanics.QuantumState import QuantumStateSymbolic, QuantumStateNumeric
 from Iaji.Physics.Theory.QuantumMechanics.SimpleHarmonicOscillator.QuantumStateFock import QuantumStateFockSymbolic, \
     QuantumStateFockNumeric
+from Iaji.Utilities.statistics import DiscreteSampler
 import sympy, numpy
+import scipy.sparse
 from sympy import assoc_laguerre
 from copy import deepcopy as copy
+from functools import lru_cache
+from scipy.special import gammaln
 # In[]
 ACCEPTED_HBAR_VALUES = [1] #TODO: adapt the calculation of the Wigner function from the 
                            #density operator in the Fock basis to admit values of hbar 
@@ -28,6 +32,285 @@ inequality reads Var(q)Var(p) >= 1/4
 Fro hbar=2, the vacuum quadrature variance is equal to 1 and the Heisenberg
 inequality reads Var(q)Var(p) >= 1
 """
+#Number of grid points used to discretize each continuous measurement outcome
+MEASUREMENT_GRID_SIZE = 300
+#Maximum number of displacement, squeezing and rotation operators kept in memory,
+#for each type of operator
+OPERATOR_CACHE_SIZE = 512
+# In[]
+@lru_cache(maxsize=None)
+def _ladderEigenDecomposition(dimension, order):
+    """
+    Computes the eigendecomposition of the real symmetric matrix a^k + (a^\dagger)^k,
+    where a is the annihilation operator in the truncated Fock basis and k = 'order'.
+    The result only depends on the Hilbert space dimension and it is cached.
+
+    OUTPUTS
+    -----------
+        (w, V) : eigenvalues and orthogonal matrix of eigenvectors (read-only)
+    """
+    a = numpy.diag(numpy.sqrt(numpy.arange(1, dimension)), k=1)
+    a = numpy.linalg.matrix_power(a, order)
+    w, V = numpy.linalg.eigh(a + a.T)
+    w.setflags(write=False)
+    V.setflags(write=False)
+    return w, V
+#----------------------------------------------------------
+def _phaseConjugation(dimension, order, phase, argument):
+    """
+    Returns exp(argument*(a^k + (a^\dagger)^k)) conjugated by the diagonal unitary
+    diag(exp(1j*phase*n)), in the truncated Fock basis, with k = 'order'.
+    """
+    w, V = _ladderEigenDecomposition(dimension, order)
+    V = numpy.exp(1j*phase*numpy.arange(dimension))[:, numpy.newaxis] * V
+    value = (V * numpy.exp(argument*w)) @ numpy.conjugate(V.T)
+    value.setflags(write=False)
+    return value
+#----------------------------------------------------------
+@lru_cache(maxsize=OPERATOR_CACHE_SIZE)
+def oscillatorOperators(dimension, hbar=1, sparse=False):
+    """
+    Computes the annihilation, number, Hamiltonian and canonical operators of a
+    harmonic oscillator in the truncated Fock basis of dimension 'dimension'.
+    The results are cached for each (dimension, hbar, sparse), so that they are
+    shared by all the oscillators with the same truncation.
+
+    OUTPUTS
+    -----------
+        (a, n, H, q, p) : read-only 2D numpy.ndarray of complex, or scipy.sparse 
+        csr arrays if 'sparse' is True (the Hamiltonian operator is always dense)
+    """
+    a = scipy.sparse.csr_array(scipy.sparse.diags(numpy.sqrt(numpy.arange(1, dimension)), offsets=1, \
+                           shape=(dimension, dimension)), dtype=complex)
+    a_dagger = a.T.conjugate().tocsr()
+    n = (a_dagger @ a).tocsr()
+    H = (n.toarray() + 1/2)*hbar
+    q = ((a + a_dagger)*numpy.sqrt(hbar)/numpy.sqrt(2)).tocsr()
+    p = ((a - a_dagger)*numpy.sqrt(hbar)/(numpy.sqrt(2)*1j)).tocsr()
+    operators = [a, n, q, p] if sparse else [a.toarray(), n.toarray(), q.toarray(), p.toarray()]
+    operators.insert(2, H)
+    for operator in operators:
+        if scipy.sparse.issparse(operator):
+            for attribute in ["data", "indices", "indptr"]:
+                getattr(operator, attribute).setflags(write=False)
+        else:
+            operator.setflags(write=False)
+    return tuple(operators)
+#----------------------------------------------------------
+@lru_cache(maxsize=OPERATOR_CACHE_SIZE)
+def displacementMatrix(dimension, alpha):
+    """
+    Computes the displacement operator exp(alpha*a^\dagger - alpha^* a) in the
+    truncated Fock basis of dimension 'dimension'.
+    The generator is diagonalized through the identity
+        alpha*a^\dagger - alpha^* a = -1j*|alpha|*U (a + a^\dagger) U^\dagger,
+    with U = diag(exp(1j*(arg(alpha) + pi/2)*n)), so that no matrix exponential
+    needs to be computed for new values of alpha.
+
+    OUTPUTS
+    -----------
+        2D numpy.ndarray of complex (read-only)
+    """
+    return _phaseConjugation(dimension, 1, numpy.angle(alpha) + numpy.pi/2, -1j*numpy.abs(alpha))
+#----------------------------------------------------------
+@lru_cache(maxsize=OPERATOR_CACHE_SIZE)
+def squeezingMatrix(dimension, zeta):
+    """
+    Computes the squeezing operator exp(-(zeta*(a^\dagger)^2 - zeta^* a^2)/2) in the
+    truncated Fock basis of dimension 'dimension'.
+    The generator is diagonalized through the identity
+        -(zeta*(a^\dagger)^2 - zeta^* a^2)/2 = 1j*|zeta|/2*U (a^2 + (a^\dagger)^2) U^\dagger,
+    with U = diag(exp(1j*(arg(zeta)/2 + pi/4)*n)).
+
+    OUTPUTS
+    -----------
+        2D numpy.ndarray of complex (read-only)
+    """
+    return _phaseConjugation(dimension, 2, numpy.angle(zeta)/2 + numpy.pi/4, 0.5j*numpy.abs(zeta))
+#----------------------------------------------------------
+@lru_cache(maxsize=OPERATOR_CACHE_SIZE)
+def rotationMatrix(dimension, theta):
+    """
+    Computes the rotation operator exp(1j*theta*n) in the truncated Fock basis
+    of dimension 'dimension'. It is diagonal.
+
+    OUTPUTS
+    -----------
+        2D numpy.ndarray of complex (read-only)
+    """
+    value = numpy.diag(numpy.exp(1j*theta*numpy.arange(dimension)))
+    value.setflags(write=False)
+    return value
+#----------------------------------------------------------
+@lru_cache(maxsize=OPERATOR_CACHE_SIZE)
+def lossKrausOperators(dimension, eta):
+    """
+    Computes the Kraus operators of the pure-loss channel with transmission efficiency eta,
+    in the truncated Fock basis of dimension 'dimension'
+    
+        A_k = sum_n sqrt(binomial(n, k)) eta^((n-k)/2) (1-eta)^(k/2) |n-k><n|,  k = 0, ..., dimension-1
+    
+    OUTPUTS
+    -----------
+        numpy.ndarray of shape (dimension, dimension, dimension), where the first
+        index labels the Kraus operator (read-only)
+    """
+    n = numpy.arange(dimension)
+    log_factorial = gammaln(n+1)
+    kraus_operators = numpy.zeros((dimension, dimension, dimension))
+    for k in range(dimension):
+        m = n[k:]
+        log_binomial = log_factorial[m] - log_factorial[k] - log_factorial[m-k]
+        kraus_operators[k, m-k, m] = numpy.exp(0.5*log_binomial) * numpy.sqrt(eta)**(m-k) * numpy.sqrt(1-eta)**k
+    kraus_operators.setflags(write=False)
+    return kraus_operators
+#----------------------------------------------------------
+@lru_cache(maxsize=OPERATOR_CACHE_SIZE)
+def amplifierKrausOperators(dimension, gain):
+    """
+    Computes the Kraus operators of the quantum-limited phase-insensitive amplifier 
+    with gain 'gain' (>=1), in the truncated Fock basis of dimension 'dimension'
+    
+        B_k = sum_n sqrt(binomial(n+k, k)) (1/sqrt(gain))^(n+1) (1-1/gain)^(k/2) |n+k><n|,  k = 0, ..., dimension-1
+    
+    OUTPUTS
+    -----------
+        numpy.ndarray of shape (dimension, dimension, dimension), where the first
+        index labels the Kraus operator (read-only)
+    """
+    n = numpy.arange(dimension)
+    log_factorial = gammaln(n+1)
+    kraus_operators = numpy.zeros((dimension, dimension, dimension))
+    for k in range(dimension):
+        m = n[:dimension-k]
+        log_binomial = log_factorial[m+k] - log_factorial[k] - log_factorial[m]
+        kraus_operators[k, m+k, m] = numpy.exp(0.5*log_binomial) * (1/numpy.sqrt(gain))**(m+1) * numpy.sqrt(1-1/gain)**k
+    kraus_operators.setflags(write=False)
+    return kraus_operators
+#----------------------------------------------------------
+def coherentStateVectors(dimension, alpha):
+    """
+    Computes the coherent state vectors |alpha> in the truncated Fock basis,
+    for all the values of alpha at once.
+
+    INPUTS
+    -----------
+        dimension : int
+            Hilbert space dimension
+        alpha : 1D array-like of complex
+            coherent state amplitudes
+
+    OUTPUTS
+    -----------
+        numpy.ndarray of shape (len(alpha), dimension), whose rows are the state vectors
+    """
+    alpha = numpy.atleast_1d(numpy.asarray(alpha, dtype=complex))
+    vectors = numpy.zeros((len(alpha), dimension), dtype=complex)
+    vectors[:, 0] = numpy.exp(-0.5*numpy.abs(alpha)**2)
+    for n in range(1, dimension):
+        vectors[:, n] = vectors[:, n-1]*alpha/numpy.sqrt(n)
+    return vectors
+#----------------------------------------------------------
+def quadratureWaveFunctions(dimension, x, theta):
+    """
+    Computes the generalized quadrature eigenstates <n|x_theta>, i.e., the
+    Hermite functions multiplied by exp(1j*n*theta), in the truncated Fock basis,
+    for all the quadrature values x at once.
+
+    INPUTS
+    -----------
+        dimension : int
+            Hilbert space dimension
+        x : 1D array-like of float
+            quadrature values
+        theta : float
+            quadrature angle [rad]
+
+    OUTPUTS
+    -----------
+        numpy.ndarray of shape (len(x), dimension), whose rows are the state vectors
+    """
+    x = numpy.atleast_1d(numpy.asarray(x, dtype=float))
+    vectors = numpy.zeros((len(x), dimension), dtype=complex)
+    vectors[:, 0] = 1/(numpy.sqrt(numpy.sqrt(numpy.pi)))*numpy.exp(-0.5*x**2)
+    if dimension > 1:
+        vectors[:, 1] = x*numpy.sqrt(2)*numpy.exp(1j*theta)*vectors[:, 0]
+    for n in range(2, dimension):
+        vectors[:, n] = numpy.exp(1j*theta)/numpy.sqrt(n)*(numpy.sqrt(2)*x*vectors[:, n-1] \
+                        - numpy.exp(1j*theta)*numpy.sqrt(n-1)*vectors[:, n-2])
+    return vectors
+#----------------------------------------------------------
+def measurementBasis(rho, measurable, hbar=1, n_values=MEASUREMENT_GRID_SIZE, theta=None):
+    """
+    Computes the outcome values and the (rank-one) measurement vectors of a 
+    measurement on a harmonic oscillator in the state 'rho'.
+    Continuous outcomes are discretized on a grid that spans a few standard
+    deviations beyond the mean value of the measured observable.
+
+    INPUTS
+    -----------
+        rho : 2D numpy.ndarray
+            density operator in the truncated Fock basis
+        measurable : str in MEASURABLES
+            "n" (number), "x" (homodyne detection of the quadrature at angle theta), or
+            "a" (projection onto coherent states, i.e., heterodyne detection)
+        hbar : float
+            reduced Planck constant
+        n_values : int
+            number of grid points per continuous outcome variable
+        theta : float
+            quadrature angle [rad], used if measurable is "x"
+
+    OUTPUTS
+    -----------
+        values : 1D numpy.ndarray of shape (K,)
+            outcome values
+        vectors : numpy.ndarray of shape (K, dimension), whose rows are the measurement vectors
+    """
+    assert measurable in MEASURABLES,\
+        "%s is not supported as a measurable quantity. \n It should be one of these: %s"\
+            %(measurable, MEASURABLES)
+    dimension = rho.shape[0]
+    a = numpy.diag(numpy.sqrt(numpy.arange(1, dimension)), k=1)
+    if measurable == "n":
+        return numpy.arange(dimension), numpy.eye(dimension)
+    elif measurable == "x":
+        assert theta is not None, \
+            "The quadrature angle theta must be specified for a homodyne measurement"
+        q_theta = numpy.sqrt(hbar/2)*(a*numpy.exp(-1j*theta) + a.T*numpy.exp(1j*theta))
+        mean_x = numpy.real(numpy.trace(rho @ q_theta))
+        std_x = numpy.sqrt(numpy.maximum(numpy.real(numpy.trace(rho @ q_theta @ q_theta)) - mean_x**2, 0))
+        max_x = numpy.abs(mean_x) + 5*std_x
+        values = numpy.linspace(-max_x, max_x, n_values)
+        return values, quadratureWaveFunctions(dimension, values, theta)
+    else:
+        #The spread accounts for the excess number of photons with respect to a 
+        #coherent state, and for the vacuum contribution to the width of the 
+        #coherent state projections
+        mean_alpha = numpy.abs(numpy.trace(rho @ a))
+        excess_n = numpy.real(numpy.trace(rho @ a.T @ a)) - mean_alpha**2
+        max_alpha = mean_alpha + 5*numpy.sqrt(numpy.maximum(excess_n, 0) + 1)
+        q_values, p_values = [2*numpy.sqrt(hbar/2)*numpy.linspace(-max_alpha, max_alpha, n_values) \
+                              for j in range(2)]
+        values = numpy.sqrt(hbar/2) * \
+            (q_values[:, numpy.newaxis] + 1j*p_values[numpy.newaxis, :]).flatten()
+        return values, coherentStateVectors(dimension, values)
+#----------------------------------------------------------
+def outcomeProbabilities(rho, vectors):
+    """
+    Computes the normalized outcome probabilities <v_j|rho|v_j> of a measurement
+    with rank-one measurement vectors v_j, for all the outcomes at once.
+
+    INPUTS
+    -----------
+        rho : 2D numpy.ndarray
+            density operator
+        vectors : numpy.ndarray of shape (K, dimension)
+            measurement vectors
+    """
+    p = numpy.real(numpy.einsum("jn,nm,jm->j", numpy.conjugate(vectors), rho, vectors, optimize=True))
+    p = numpy.abs(p)
+    return p/numpy.sum(p)
 # In[]
 class SimpleHarmonicOscillator: #TODO
     """
@@ -45,10 +328,10 @@ class SimpleHarmonicOscillator: #TODO
     of the system evolves according to unitary transformations while the 
     Hamiltonian operator remains unchanged.
     """
-    def __init__(self, truncated_dimension, name="A", hbar=1):
+    def __init__(self, truncated_dimension, name="A", hbar=1, sparse=False):
         self.name = name
         self._symbolic = SimpleHarmonicOscillatorSymbolic(truncated_dimension=truncated_dimension, name=name, hbar=hbar)
-        self._numeric = SimpleHarmonicOscillatorNumeric(truncated_dimension=truncated_dimension, name=name, hbar=hbar)
+        self._numeric = SimpleHarmonicOscillatorNumeric(truncated_dimension=truncated_dimension, name=name, hbar=hbar, sparse=sparse)
     #----------------------------------------------------------
     @property 
     def name(self):
@@ -401,35 +684,31 @@ class SimpleHarmonicOscillatorSymbolic:
 class SimpleHarmonicOscillatorNumeric: 
     """
     This class describes a Numeric simple harmonic oscillator.
+    If 'sparse' is True, the ladder operators and the operators derived from them
+    are stored as scipy.sparse matrices.
     """
     #----------------------------------------------------------
-    def __init__(self, truncated_dimension, name="A", hbar=1):
+    def __init__(self, truncated_dimension, name="A", hbar=1, sparse=False):
         assert hbar in ACCEPTED_HBAR_VALUES
         self._name = name
+        self._sparse = sparse
         self.symbol = sympy.symbols(names=self.name)
         self._hilbert_space = HilbertSpace(dimension=truncated_dimension, name="H_{%s}"%self.name)
         self._hbar = ParameterNumeric(name="\\hbar")
         self.hbar.value = hbar
         self._state = QuantumStateFockNumeric(truncated_dimension=truncated_dimension, name=name) 
-        #Define the most relevant operators
+        #Define the most relevant operators. Their values are read-only and shared
+        #by all the oscillators with the same dimension and hbar
+        a, n, H, q, p = oscillatorOperators(truncated_dimension, hbar, sparse)
         #Annihilation operator
-        self._a = MatrixNumeric(name="\\hat{a}_{%s}"%self.name)
-        self.a.value = sympy.zeros(self.hilbert_space.dimension, \
-                                      self.hilbert_space.dimension)
-        for j in range(self.hilbert_space.dimension-1):
-            self.a.value[j, j+1] = numpy.sqrt(j+1)
+        self._a = MatrixNumeric(name="\\hat{a}_{%s}"%self.name, value=a)
         #Number operator
-        self._n = self.a.Dagger()@self.a
-        self.n.name = "\\hat{n}_{%s}"%self.name
+        self._n = MatrixNumeric(name="\\hat{n}_{%s}"%self.name, value=n)
         #Hamiltonian operator
-        self._H = (self.n + 1/2)*self.hbar
-        self.H.name = "\\hat{\\mathcal{H}}_{%s}"%self.name
+        self._H = MatrixNumeric(name="\\hat{\\mathcal{H}}_{%s}"%self.name, value=H)
         #Canonical variables
-        self._q = (self.a + self.a.Dagger())*self.hbar**(1/2)/numpy.sqrt(2)
-        self.q.name = "\\hat{q}_{%s}"%self.name
-        
-        self._p = (self.a - self.a.Dagger())*self.hbar**(1/2)/(numpy.sqrt(2)*1j)
-        self.p.name = "\\hat{p}_{%s}"%self.name
+        self._q = MatrixNumeric(name="\\hat{q}_{%s}"%self.name, value=q)
+        self._p = MatrixNumeric(name="\\hat{p}_{%s}"%self.name, value=p)
     #----------------------------------------------------------
     @property 
     def name(self):
@@ -470,6 +749,10 @@ class SimpleHarmonicOscillatorNumeric:
         return self._state
     #----------------------------------------------------------
     @property
+    def sparse(self):
+        return self._sparse
+    #----------------------------------------------------------
+    @property
     def a(self):
         return self._a
     #----------------------------------------------------------
@@ -488,16 +771,6 @@ class SimpleHarmonicOscillatorNumeric:
     @property
     def p(self):
         return self._p
-    # ---------------------------------------------------------- 
-    def _AnnihilationOperator(self):
-        """
-        Calculates the annihilation operator of the system 
-        in the Fock basis
-        """
-        self.a.value = sympy.zeros(self.hilbert_space.dimension, \
-                                      self.hilbert_space.dimension)
-        for j in range(self.hilbert_space.dimension-1):
-            self.a.value[j, j+1] = numpy.sqrt(j+1)
     #----------------------------------------------------------
     def _GeneralizeQuadratureProjector(self, x, theta):
         """
@@ -575,11 +848,11 @@ class SimpleHarmonicOscillatorNumeric:
         """
         try:
             #assume alpha is of type ParameterNumeric
-            D = (self.a.Dagger()*alpha-self.a*alpha.Conjugate()).Exp()
-            D.name = "\\hat{\\mathcal{D}}_{%s}\\left(%s\\right)"%(self.name, alpha.name)
-        except:
-            D = (self.a.Dagger()*alpha-self.a*numpy.conjugate(alpha)).Exp()
-            D.name = "\\hat{\\mathcal{D}}_{%s}\\left(%s\\right)"%(self.name, str(alpha))
+            value, name = alpha.value, alpha.name
+        except AttributeError:
+            value, name = alpha, str(alpha)
+        D = MatrixNumeric(name="\\hat{\\mathcal{D}}_{%s}\\left(%s\\right)"%(self.name, name))
+        D.value = displacementMatrix(self.hilbert_space.dimension, complex(value))
         return D
     #----------------------------------------------------------  
     def _SqueezingOperator(self, zeta):
@@ -588,78 +861,94 @@ class SimpleHarmonicOscillatorNumeric:
         """
         try:
             #assume zeta is of type ParameterNumeric
-            S = (-(self.a.Dagger()**2*zeta-self.a**2*zeta.Conjugate())*0.5).Exp()
-            S.name = "\\hat{\\mathcal{S}}_{%s}\\left(%s\\right)"%(self.name, zeta.name)
-        except:
-            S = (-(self.a.Dagger()**2*zeta-self.a**2*numpy.conjugate(zeta))*0.5).Exp()
-            S.name = "\\hat{\\mathcal{S}}_{%s}\\left(%s\\right)"%(self.name, str(zeta))
+            value, name = zeta.value, zeta.name
+        except AttributeError:
+            value, name = zeta, str(zeta)
+        S = MatrixNumeric(name="\\hat{\\mathcal{S}}_{%s}\\left(%s\\right)"%(self.name, name))
+        S.value = squeezingMatrix(self.hilbert_space.dimension, complex(value))
         return S
     #---------------------------------------------------------- 
     def _RotationOperator(self, theta):
         """
         Returns the rotation operator with parameter theta
         """
-        R = (self.n*1j*theta).Exp()
-        R.name = "\\hat{\\mathcal{R}}_{%s}\\left(%.3f\\right)"%(self.name, theta)
+        R = MatrixNumeric(name="\\hat{\\mathcal{R}}_{%s}\\left(%.3f\\right)"%(self.name, theta), \
+                          sparse=self.sparse)
+        R.value = rotationMatrix(self.hilbert_space.dimension, float(theta))
         return R
     #---------------------------------------------------------- 
         
-    def Vacuum(self):
+    def _Target(self, inplace):
+        """
+        Returns the system on which an operation acts: self if 'inplace' is True,
+        else a copy of self. Copies share the (read-only) density operator and 
+        operators with self, until they are replaced.
+        """
+        return self if inplace else copy(self)
+    #----------------------------------------------------------
+    def Vacuum(self, inplace=False):
         """
         Sets the system to the vacuum state
         """
-        x = copy(self)
+        x = self._Target(inplace)
         x.state.Vacuum()
         return x
     #----------------------------------------------------------
-    def NumberState(self, n):
+    def NumberState(self, n, inplace=False):
         """
         Sets the system to the n-th number state
         """
         assert n < self.hilbert_space.dimension, \
             "n=%d must be lower than the Hilbert space dimension %d"\
                 %(n, self.hilbert_space.dimension)
-        x = copy(self)
+        x = self._Target(inplace)
         x.state.NumberState(n)
         return x
     #----------------------------------------------------------
-    def Displace(self, alpha):
+    def Displace(self, alpha, inplace=False):
         """
-        Displaces the system, by applying the unitary displacement operator
+        Displaces the system, by applying the unitary displacement operator.
+        If 'inplace' is True, the system is modified instead of copied.
         """
-        x = copy(self)
+        rho_name = self.state.density_operator._name
+        x = self._Target(inplace)
         D = x._DisplacementOperator(alpha)
         x.state._density_operator = D @ x.state.density_operator @ D.Dagger()
-        x.state._density_operator = x.state.density_operator.Hermitian()
-        x.state.density_operator.name = "%s\\left(%s\\right)"%(D.name, self.state.density_operator.name)
+        x.state._density_operator = x.state.density_operator.Hermitian().Freeze()
+        x.state.density_operator.name = LazyName("%s\\left(%s\\right)", D._name, rho_name)
         return x
     #----------------------------------------------------------
-    def Squeeze(self, zeta):
+    def Squeeze(self, zeta, inplace=False):
         """
-        Squeezes the system, by applying the unitary squeezing operator
+        Squeezes the system, by applying the unitary squeezing operator.
+        If 'inplace' is True, the system is modified instead of copied.
         """
-        x = copy(self)
+        rho_name = self.state.density_operator._name
+        x = self._Target(inplace)
         S = x._SqueezingOperator(zeta)
         x.state._density_operator = S @ x.state.density_operator @ S.Dagger()
-        x.state._density_operator = x.state.density_operator.Hermitian()
-        x.state.density_operator.name = "%s\\left(%s\\right)"%(S.name, self.state.density_operator.name)
+        x.state._density_operator = x.state.density_operator.Hermitian().Freeze()
+        x.state.density_operator.name = LazyName("%s\\left(%s\\right)", S._name, rho_name)
         return x
     #----------------------------------------------------------
-    def Rotate(self, theta):
+    def Rotate(self, theta, inplace=False):
         """
-        Rotates the system, by applying the unitary rotation operator
+        Rotates the system, by applying the unitary rotation operator.
+        If 'inplace' is True, the system is modified instead of copied.
         """
-        x = copy(self)
+        rho_name = self.state.density_operator._name
+        x = self._Target(inplace)
         R = x._RotationOperator(theta)
         x.state._density_operator = R @ x.state.density_operator @ R.Dagger()
-        x.state._density_operator = x.state.density_operator.Hermitian()
-        x.state.density_operator.name = "%s\\left(%s\\right)"%(R.name, self.state.density_operator.name)
+        x.state._density_operator = x.state.density_operator.Hermitian().Freeze()
+        x.state.density_operator.name = LazyName("%s\\left(%s\\right)", R._name, rho_name)
         return x
     #----------------------------------------------------------
-    def Unitary(self, H):
+    def Unitary(self, H, inplace=False):
         """
         Evolves the system according to the arbitrary interaction Hamiltonian defined by
         the operator H. The system is assumed to be stationary.
+        If 'inplace' is True, the system is modified instead of copied.
         """
         assert type(H) is Iaji.Mathematics.Pure.Algebra.LinearAlgebra.Matrix.MatrixNumeric, \
             "H must be a Numeric matrix, instead it is %s"%(type(H))
@@ -667,37 +956,38 @@ class SimpleHarmonicOscillatorNumeric:
             "The interaction Hamiltonian operator must be Hermitian"
         assert H.shape == self.H.shape, \
             "The interaction Hamiltonian has incompatible shape %s"%H.shape.__str__()
-        x = copy(self)
+        rho_name = self.state.density_operator._name
+        x = self._Target(inplace)
         U = (H*x.hbar*(-1j)).Exp()
-        x.state._density_operator = U @ self.state._density_operator @ U.Dagger()
-        x.state._density_operator = x.state.density_operator.Hermitian()
-        x.state.density_operator.name = "%s\\left(%s\\right)"%(U.name, self.state.density_operator.name)
+        x.state._density_operator = U @ x.state._density_operator @ U.Dagger()
+        x.state._density_operator = x.state.density_operator.Hermitian().Freeze()
+        x.state.density_operator.name = LazyName("%s\\left(%s\\right)", U._name, rho_name)
         return x
     #---------------------------------------------------------
-    def Annihilate(self):
+    def Annihilate(self, inplace=False):
         """
         Applies the annihilation operator to the quantum state, and renormalizes
         it.
         """
         #e0 = self.hilbert_space.canonical_basis[0]
         #vacuum =  e0 @ e0.T()
-        x = copy(self)
-        x.state._density_operator = x.a @ self.state._density_operator @ x.a.Dagger()
+        x = self._Target(inplace)
+        x.state._density_operator = x.a @ x.state._density_operator @ x.a.Dagger()
         x.state._density_operator /= x.state._density_operator.Trace()
-        x.state._density_operator = x.state.density_operator.Hermitian()
+        x.state._density_operator = x.state.density_operator.Hermitian().Freeze()
         return x
     #---------------------------------------------------------   
-    def Create(self):
+    def Create(self, inplace=False):
          """
          Applies the creation operator to the quantum state, and renormalizes
          it.
          """
          #e0 = self.hilbert_space.canonical_basis[0]
          #vacuum =  e0 @ e0.T()
-         x = copy(self)
-         x.state._density_operator = x.a.Dagger() @ self.state._density_operator @ x.a
+         x = self._Target(inplace)
+         x.state._density_operator = x.a.Dagger() @ x.state._density_operator @ x.a
          x.state._density_operator /= x.state._density_operator.Trace()
-         x.state._density_operator = x.state.density_operator.Hermitian()
+         x.state._density_operator = x.state.density_operator.Hermitian().Freeze()
          return x
     #--------------------------------------------------------- 
     def ProjectiveMeasurement(self, measurable, ntimes=1, return_all_systems=False, **kwargs):
@@ -706,136 +996,101 @@ class SimpleHarmonicOscillatorNumeric:
         to a linear operator following the generalized Born rule.
         It repeats the measurement 'ntimes' times (assuming 'ntimes' identical
                                                    copies of the system exist)
+
+        All the projectors are of rank one, |v><v|, so the outcome probabilities
+        <v|rho|v> are computed at once for all the candidate outcomes, and the 
+        post-measurement states are only built for the sampled outcomes.
         """
         assert measurable in MEASURABLES,\
         "%s is not supported as a measurable quantity. \n It should be one of these: %s"\
             %(measurable, MEASURABLES)
-        system = copy(self)
         def _generalized_born_rule(projector):
             system0 = copy(self)
-            p = (system0.state.density_operator @ projector).Trace() #outcome probability density
+            rho = system0.state.density_operator
+            p = rho.TraceProduct(projector) #outcome probability density
             system0._state = QuantumStateFockNumeric(truncated_dimension=system0.hilbert_space.dimension, \
                                             name=system0.state.name)
-            system0.state._density_operator = projector @ system0.state._density_operator \
-                                      @ projector
+            system0.state._density_operator = projector @ rho @ projector
             system0.state._density_operator /= p
+            system0.state._density_operator.Freeze()
             return system0, p
-        #-------------------
-        if measurable == "n":
-            def Projector(n):
-                en = system.hilbert_space.CanonicalBasisVector(n).numeric
-                return en @ en.T()
-            #Calculate the probabilities of outcomes
-            values = numpy.arange(system.hilbert_space.dimension)
-            p = numpy.zeros((len(values), ))           
-            for j in numpy.arange(len(values)):
-                n = values[j]
-                projector = Projector(n) 
-                p[j] = _generalized_born_rule(projector)[1].value
-            p = numpy.abs(p)
-            p /= numpy.sum(p)
-            #Sample according to the calculated probabilities
-            outcomes = numpy.random.choice(values, size=(ntimes,), p=p)
-            if return_all_systems:
-                #Apply the generalized born rule to the all measurements
-                projector = []
-                post_measurement_system = []
-                for j in range(ntimes):
-                    projector.append(Projector(outcomes[j]))
-                    post_measurement_system.append(_generalized_born_rule(projector[j])[0])
-            else:
-                #Apply the generalized born rule to the last measurement
-                projector = Projector(outcomes[-1])
-                post_measurement_system = _generalized_born_rule(projector)[0]
-        #-------------------
-        elif measurable == "a":
-            def Projector(alpha):
-                return \
-                    system.Displace(alpha_values[i]).state.density_operator
-            #Consider a range of values that spans a few standard deviations beyond
-            #the mean value of the number operator, which defines the energy
-            #of the harmonic oscillator
-            max_alpha = system.state.Mean(system.a).value \
-                + system.state.Std(system.a).value*5
-            #Calculate the probabilities of outcomes
-            n_values = 300
-            q_values, p_values = [2*numpy.sqrt(system.hbar.value/2)\
-                                  *numpy.linspace(-max_alpha, max_alpha, n_values)\
-                                      for j in range(2)]
-            alpha_values = numpy.zeros((n_values*n_values,)) 
-            p = numpy.zeros((n_values*n_values,))
-            for j in numpy.arange(p.shape[0]):
-                for k in numpy.arange(p.shape[1]):
-                    i = j*p.shape[1] + k
-                    alpha_values[i] = numpy.sqrt(system.hbar.value/2) * \
-                        (q_values[j] + 1j*p_values[k])
-                    projector = Projector(alpha_values[j])
-                    p[i] = _generalized_born_rule(projector)[1].value
-            p = numpy.abs(p)
-            p /= numpy.sum(p)
-            #Sample according to the calculated probabilities
-            outcomes = numpy.random.choice(alpha_values, size=(ntimes,), p=p)
-            if return_all_systems:
-                #Apply the generalized born rule to the all measurements
-                projector = []
-                post_measurement_system = []
-                for j in range(ntimes):
-                    projector.append(Projector(outcomes[j]))
-                    post_measurement_system.append(_generalized_born_rule(projector[j])[0])
-            else:
-                #Apply the generalized born rule to the last measurement
-                projector = Projector(outcomes[-1])
-                post_measurement_system = _generalized_born_rule(projector)[0]
-            values = alpha_values
-        #-------------------
-        elif measurable == "x":
-            def Projector(x, theta):
-                proj = MatrixNumeric(name=name)
-                proj.value = numpy.matrix(numpy.zeros((system.hilbert_space.dimension, 1)))    
-                for n in numpy.arange(N):
-                    if n==0:
-                        proj.value[n] = 1/(numpy.sqrt(numpy.sqrt(numpy.pi)))*numpy.exp(-0.5*x**2)
-                    elif n==1:
-                        proj.value[n] = x*numpy.sqrt(2)*numpy.exp(1j*theta) * proj.value[0]
-                    else:
-                        proj.value[n] = numpy.exp(1j*theta)/numpy.sqrt(n)*(numpy.sqrt(2)*x*proj.value[n-1] - numpy.exp(1j*theta)*numpy.sqrt(n-1)*proj.value[n-2]) 
-                return proj @ proj.Dagger()    
-            theta = kwargs["theta"]    
-            N = system.hilbert_space.dimension - 1
-            #Consider a range of values that spans a few standard deviations beyond
-            #the mean value of the number operator, which defines the energy
-            #of the harmonic oscillator
-            q_theta = system.q*numpy.cos(theta) + system.p*numpy.sin(theta)
-            max_x = (system.state.Mean(q_theta).value + system.state.Std(q_theta).value*5)
-            n_values = 300
-            x_values = numpy.linspace(-max_x, max_x, n_values)
-            p = numpy.zeros((n_values,))
-            for j in range(n_values):
-                x = x_values[j]
-                name = "\\hat{\\Pi}_{%.1f}(%0.3f)"%(theta, x)
-                projector = Projector(x, theta)
-                p[j] = _generalized_born_rule(projector)[1].value
-            p = numpy.abs(p)
-            p /= numpy.sum(p) 
-            from matplotlib import pyplot
-            pyplot.figure()
-            pyplot.plot(x_values, p)
-            #Sample according to the calculated probabilities
-            outcomes = numpy.random.choice(x_values, size=(ntimes,), p=p)
-            if return_all_systems:
-                #Apply the generalized born rule to the all measurements
-                projector = []
-                post_measurement_system = []
-                for j in range(ntimes):
-                    projector.append(Projector(outcomes[j], theta))
-                    post_measurement_system.append(_generalized_born_rule(projector[j])[0])
-            else:
-                #Apply the generalized born rule to the last measurement
-                projector = Projector(outcomes[-1], theta)
-                post_measurement_system = _generalized_born_rule(projector)[0]
-            values = x_values
+        names = {"n": "\\hat{\\Pi}_{n_{%s}}"%self.name, "a": "\\hat{\\Pi}_{\\alpha_{%s}}"%self.name, \
+                 "x": "\\hat{\\Pi}_{%.1f}"%kwargs.get("theta", 0)}
+        name = names[measurable]
+        #Calculate the probabilities of all outcomes, p_j = <v_j|rho|v_j>
+        values, vectors, p = self._OutcomeDistribution(measurable, **kwargs)
+        #Sample according to the calculated probabilities
+        indices = numpy.random.choice(len(values), size=(ntimes,), p=p)
+        outcomes = values[indices]
+        def Projector(j):
+            projector = MatrixNumeric(name="%s(%s)"%(name, values[j]))
+            projector.value = numpy.outer(vectors[j], numpy.conjugate(vectors[j]))
+            return projector
+        if return_all_systems:
+            #Apply the generalized born rule once for each distinct outcome. Measurements
+            #with the same outcome get copies of the same post-measurement system, which 
+            #share its read-only density operator
+            systems = {j: _generalized_born_rule(Projector(j))[0] for j in numpy.unique(indices)}
+            post_measurement_system = [copy(systems[j]) for j in indices]
+        else:
+            #Apply the generalized born rule to the last measurement
+            projector = Projector(indices[-1])
+            post_measurement_system = _generalized_born_rule(projector)[0]
         return outcomes, values, p, post_measurement_system
     #--------------------------------------------------------- 
+    def _OutcomeDistribution(self, measurable, n_values=MEASUREMENT_GRID_SIZE, **kwargs):
+        """
+        Returns the outcome values, the measurement vectors and the outcome
+        probabilities of a measurement of 'measurable' (see measurementBasis)
+        """
+        rho = self.state.density_operator.value
+        if scipy.sparse.issparse(rho):
+            rho = rho.toarray()
+        values, vectors = measurementBasis(rho, measurable, self.hbar.value, n_values, kwargs.get("theta"))
+        return values, vectors, outcomeProbabilities(rho, vectors)
+    #--------------------------------------------------------- 
+    def Sampler(self, measurable, n_values=MEASUREMENT_GRID_SIZE, **kwargs):
+        """
+        Computes the outcome distribution of a measurement of 'measurable' once,
+        and returns a sampler that draws any number of outcomes with vectorized calls.
+        
+        INPUTS
+        ---------------
+            measurable : str in MEASURABLES
+                "n" (photon number), "x" (homodyne detection, requires the keyword 
+                argument 'theta') or "a" (heterodyne detection)
+            n_values : int
+                number of grid points per continuous outcome variable
+                
+        OUTPUTS
+        ---------------
+            Iaji DiscreteSampler
+        """
+        values, _, p = self._OutcomeDistribution(measurable, n_values, **kwargs)
+        return DiscreteSampler(values, p)
+    #--------------------------------------------------------- 
+    def Sample(self, measurable, ntimes=1, rng=None, n_values=MEASUREMENT_GRID_SIZE, **kwargs):
+        """
+        Draws 'ntimes' outcomes of a measurement of 'measurable', without 
+        computing the post-measurement states.
+        
+        INPUTS
+        ---------------
+            rng : None, int or numpy.random.Generator
+                random number generator or seed. If None, the global numpy 
+                random state is used.
+                
+        OUTPUTS
+        ---------------
+            outcomes : 1D numpy.ndarray
+            values : 1D numpy.ndarray
+                all the outcome values
+            p : 1D numpy.ndarray
+                outcome probabilities
+        """
+        sampler = self.Sampler(measurable, n_values, **kwargs)
+        return sampler.Sample(ntimes, rng), sampler.values, sampler.probabilities
+    #--------------------------------------------------------- 
     def Expand(self, n):
         """
         Returns a replica of the system with Hilbert space dimension increased
@@ -99,3 +99,9 @@ axis_pdf.set_ylabel("probability density", font=axis_font)
 x_range = numpy.array([numpy.min(samples), numpy.max(samples)])
 PDF_values, PDF = PDF_histogram(samples, x_range=x_range, n_bins=int(len(samples)*0.01))
 axis_pdf.scatter(PDF_values, PDF, color="tab:blue", alpha=0.5)
+# In[sparse operators]
+from Iaji.Physics.Theory.QuantumMechanics.SimpleHarmonicOscillator.SimpleHarmonicOscillator import SimpleHarmonicOscillatorNumeric
+system_sparse = SimpleHarmonicOscillatorNumeric(truncated_dimension=200, sparse=True).Vacuum()
+print("Sparse annihilation operator: %s"%system_sparse.a.sparse)
+print("Mean value of %s: %s"%(system_sparse.n.name, system_sparse.state.Mean(system_sparse.n).value))
+print("Variance of %s: %s"%(system_sparse.q.name, system_sparse.state.Var(system_sparse.q).value))
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This script compares the accuracy and the runtime of the methods used to compute
+the Wigner function of a quantum state in the number states basis
+('laguerre' and 'fft'), for increasing Hilbert space dimensions.
+"""
+# In[]
+from Iaji.Physics.Theory.QuantumMechanics.SimpleHarmonicOscillator.SimpleHarmonicOscillator import SimpleHarmonicOscillatorNumeric
+from Iaji.Physics.Theory.QuantumMechanics.SimpleHarmonicOscillator.Utilities import WIGNER_METHODS
+import numpy, time
+# In[]
+dimensions = [10, 20, 40, 80]
+n_points = 300
+q, p = [numpy.linspace(-6, 6, n_points) for j in range(2)]
+print("grid: %d x %d"%(n_points, n_points))
+print("%10s"%"dimension" + "".join(["%15s"%("%s [s]"%method) for method in WIGNER_METHODS]) + "%25s"%"max. abs. difference")
+for dimension in dimensions:
+    system = SimpleHarmonicOscillatorNumeric(truncated_dimension=dimension)
+    state = system.Vacuum().Displace(1+0.5j).Squeeze(0.4).state
+    runtimes, W = {}, {}
+    for method in WIGNER_METHODS:
+        start_time = time.time()
+        W[method] = state.WignerFunction(q, p, method=method)[2]
+        runtimes[method] = time.time() - start_time
+    difference = numpy.max(numpy.abs(W["fft"] - W["laguerre"]))
+    print("%10d"%dimension + "".join(["%15.3f"%runtimes[method] for method in WIGNER_METHODS]) + "%25.2e"%difference)
@@ -9,6 +9,9 @@ This module defines objects and functions useful to handle bosonic quantum field
 #%%
 import numpy 
 import scipy as sp
+import scipy.sparse
+import scipy.signal
+from scipy.special import gammaln
 import inspect
 import matplotlib
 from matplotlib import pyplot as plt
@@ -178,7 +181,181 @@ def quantumStateFidelity(rho_1, rho_2):
         X = sp.linalg.sqrtm(rho_1) @ sp.linalg.sqrtm(rho_2)
         return (2*traceDistance(X, 0))**2
 #%%
-def WignerFunctionFromDensityMatrix(rho, q, p):
+#Memory budget [bytes] of the Wigner function evaluation from a density matrix.
+#The quadrature grid is processed in chunks that fit this budget.
+WIGNER_MAX_MEMORY = 2**28
+#Approximate memory [bytes] needed per grid point by the evaluation
+WIGNER_BYTES_PER_POINT = 160
+#Methods for the evaluation of the Wigner function from a density matrix:
+#   - 'laguerre': expansion in associated Laguerre polynomials, on arbitrary points
+#   - 'fft': Fourier transform of the position representation of the density operator, on a regular grid
+WIGNER_METHODS = ["laguerre", "fft"]
+#%%
+def wignerFunctionOnGrid(rho, Q, P, max_memory=WIGNER_MAX_MEMORY):
+    """
+    This function computes the Wigner function associated to a density operator,
+    in the basis of number states, on arbitrary quadrature points.
+    
+    The Wigner function is W(q, p) = sum_{n, m} rho[n, m] W_nm(q, p), with
+    
+        W_nm = 1/pi exp(-x/2) (-1)^m (sqrt(2)(q-ip))^(n-m) sqrt(m!/n!) L_m^(n-m)(x),  n >= m
+        W_mn = W_nm^*
+    
+    where x = 2(q^2 + p^2) and L_m^(k) is the associated Laguerre polynomial.
+    For each diagonal n-m of rho, the Laguerre polynomials are evaluated with
+    their three-term recurrence in m and contracted with rho on the fly, so that
+    no (grid, N, N) tensor is allocated. The grid is processed in chunks, so that
+    the memory does not exceed 'max_memory'.
+    
+    INPUTS
+    ---------------
+        rho : 2-D array-like of complex
+            The density operator in the number states basis
+        Q, P : array-like of float
+            The q and p quadrature values, on which the Wigner function is computed.
+            They are broadcast against each other
+        max_memory : float (>0)
+            Memory budget [bytes]
+    OUTPUTS
+    --------------
+        W : array-like of complex
+            the Wigner function evaluated on Q and P (not normalized)
+    """
+    if sp.sparse.issparse(rho):
+        rho = rho.toarray()
+    rho = numpy.asarray(rho)
+    N = rho.shape[0] #dimension of the (truncated) Hilbert space of rho
+    Q, P = numpy.broadcast_arrays(numpy.asarray(Q, dtype=float), numpy.asarray(P, dtype=float))
+    shape = Q.shape
+    q, p = Q.flatten(), P.flatten()
+    W = numpy.zeros((q.size,), dtype=complex)
+    chunk_size = max(1, int(max_memory // WIGNER_BYTES_PER_POINT))
+    log_factorial = gammaln(numpy.arange(N)+1)
+    for start in range(0, q.size, chunk_size):
+        stop = min(start+chunk_size, q.size)
+        x = 2*(q[start:stop]**2 + p[start:stop]**2)
+        z = numpy.sqrt(2)*(q[start:stop] - 1j*p[start:stop])
+        z_power = numpy.ones((stop-start,), dtype=complex)
+        W_chunk = numpy.zeros((stop-start,), dtype=complex)
+        for d in range(N):
+            #Expansion coefficients of the d-th lower and upper diagonals of rho
+            m = numpy.arange(N-d)
+            c = (-1)**m * numpy.exp(0.5*(log_factorial[m] - log_factorial[m+d]))
+            lower, upper = rho[m+d, m]*c, rho[m, m+d]*c
+            #sum_m lower[m] L_m^(d)(x), and similarly for the upper diagonal
+            L_last = numpy.ones_like(x)
+            sum_lower, sum_upper = lower[0]*L_last, upper[0]*L_last
+            if N-d > 1:
+                L = 1 + d - x
+                sum_lower, sum_upper = sum_lower + lower[1]*L, sum_upper + upper[1]*L
+                for k in range(1, N-d-1):
+                    L, L_last = ((2*k+1+d-x)*L - (k+d)*L_last)/(k+1), L
+                    sum_lower += lower[k+1]*L
+                    sum_upper += upper[k+1]*L
+            if d == 0:
+                W_chunk += sum_lower
+            else:
+                W_chunk += z_power*sum_lower + numpy.conj(z_power)*sum_upper
+            z_power *= z
+        W[start:stop] = 1/numpy.pi * numpy.exp(-0.5*x) * W_chunk
+    return W.reshape(shape)
+#%%
+def positionWaveFunctions(dimension, x):
+    """
+    This function computes the position representation <x|n> of the number states
+    n = 0, ..., dimension-1, with the Hermite functions recurrence
+    
+        psi_0 = pi^(-1/4) exp(-x^2/2)
+        psi_{n+1} = sqrt(2/(n+1)) x psi_n - sqrt(n/(n+1)) psi_{n-1}
+    
+    INPUTS
+    ---------------
+        dimension : int
+            number of number states
+        x : 1-D array-like of float
+            position values
+    OUTPUTS
+    --------------
+        psi : 2-D array-like of float, of shape (len(x), dimension)
+    """
+    x = numpy.atleast_1d(numpy.asarray(x, dtype=float))
+    psi = numpy.zeros((len(x), dimension))
+    psi[:, 0] = numpy.pi**(-1/4) * numpy.exp(-x**2/2)
+    if dimension > 1:
+        psi[:, 1] = numpy.sqrt(2)*x*psi[:, 0]
+    for n in range(1, dimension-1):
+        psi[:, n+1] = numpy.sqrt(2/(n+1))*x*psi[:, n] - numpy.sqrt(n/(n+1))*psi[:, n-1]
+    return psi
+#%%
+def wignerFunctionFFT(rho, q, p, max_memory=WIGNER_MAX_MEMORY):
+    """
+    This function computes the Wigner function associated to a density operator,
+    in the basis of number states, on a regular grid of quadrature values, as
+    
+        W(q, p) = 1/pi int dy <q+y|rho|q-y> exp(-2ipy)
+    
+    The position representation of rho is obtained from the Hermite functions
+    sampled on a regular grid that contains the q values, with a cost that is linear
+    in the dimension of rho for each (q, y) pair. The integral over y is computed
+    with a chirp-z transform (FFT-based), which evaluates the Wigner function exactly
+    on the input p values. The q values are processed in chunks, so that the memory 
+    does not exceed 'max_memory'.
+    The result is equal to the one of wignerFunctionOnGrid(rho, Q, P),
+    up to the discretization error of the integral, which is exponentially small
+    when the grid resolves the largest momentum of the state.
+    
+    INPUTS
+    ---------------
+        rho : 2-D array-like of complex
+            The density operator in the number states basis
+        q, p : 1-D array-like of float
+            The q and p quadrature values. They must be regularly spaced.
+        max_memory : float (>0)
+            Memory budget [bytes]
+    OUTPUTS
+    --------------
+        W : 2-D array-like of complex, of shape (len(q), len(p))
+            the Wigner function evaluated on q and p (not normalized)
+    """
+    if sp.sparse.issparse(rho):
+        rho = rho.toarray()
+    rho = numpy.asarray(rho)
+    N = rho.shape[0] #dimension of the (truncated) Hilbert space of rho
+    q, p = [numpy.atleast_1d(numpy.asarray(x, dtype=float)) for x in (q, p)]
+    for x in (q, p):
+        if len(x) > 2 and not numpy.allclose(numpy.diff(x), x[1]-x[0], rtol=1e-6, atol=0):
+            raise ValueError("The FFT Wigner function method requires regularly spaced quadrature values")
+    #Extent of the number states wave functions, beyond which they are negligible
+    x_max = numpy.sqrt(2*N+1) + 6
+    #Integration step: it resolves the largest momentum of the state and of the p grid,
+    #and it is a sub-multiple of half the q step, so that q+-y lie on a common position grid
+    dy_max = numpy.pi/(4*max(x_max, numpy.max(numpy.abs(p))))
+    dq = q[1]-q[0] if len(q) > 1 else 2*dy_max
+    r = int(numpy.ceil(numpy.abs(dq)/(2*dy_max)))
+    dy = dq/(2*r)
+    K = int(numpy.ceil(x_max/numpy.abs(dy)))
+    y = dy*numpy.arange(-K, K+1)
+    #Position grid such that q[j]+y[k] = x[2*r*j + k + K]
+    x = q[0] + dy*numpy.arange(-K, 2*r*(len(q)-1) + K + 1)
+    psi = positionWaveFunctions(N, x)
+    psi_rho = psi @ rho #<x|rho|m> = sum_n psi_n(x) rho[n, m], with real psi
+    #Chirp-z transform parameters: X[l] = sum_k C[k] exp(-2i p[l] y[k])
+    dp = p[1]-p[0] if len(p) > 1 else 1
+    a = numpy.exp(2j*p[0]*dy)
+    w = numpy.exp(-2j*dp*dy)
+    phase = numpy.exp(2j*p*K*dy) #accounts for y[0] = -K*dy
+    W = numpy.zeros((len(q), len(p)), dtype=complex)
+    chunk_size = max(1, int(max_memory // (16*len(y)*(N+2))))
+    k = numpy.arange(-K, K+1)
+    for start in range(0, len(q), chunk_size):
+        stop = min(start+chunk_size, len(q))
+        center = 2*r*numpy.arange(start, stop)[:, numpy.newaxis] + K
+        #C[j, k] = <q[j]+y[k]|rho|q[j]-y[k]>
+        C = numpy.einsum("jkn,jkn->jk", psi_rho[center+k], psi[center-k])
+        W[start:stop, :] = dy/numpy.pi * phase * sp.signal.czt(C, m=len(p), w=w, a=a, axis=-1)
+    return W
+#%%
+def WignerFunctionFromDensityMatrix(rho, q, p, method="laguerre"):
     """
     This function computes the Wigner function associated to a density operator, 
     in the basis of number states.
@@ -189,6 +366,9 @@ def WignerFunctionFromDensityMatrix(rho, q, p):
             The density operator in the number states basis
         q, p : 1-D array-like of float
             The q and p quadrature values, on which the Wigner function is computed
+        method : str in WIGNER_METHODS
+            'laguerre' (wignerFunctionOnGrid) or 'fft' (wignerFunctionFFT, 
+            for regularly spaced q and p)
     OUTPUTS
     --------------
         Q, P : 2-D array-like of float
@@ -197,28 +377,15 @@ def WignerFunctionFromDensityMatrix(rho, q, p):
             the Wigner function evaluated on q and p
     """
     
+    if method not in WIGNER_METHODS:
+        raise ValueError("Invalid Wigner function method %s. Valid methods are %s"%(method, WIGNER_METHODS))
     P, Q = numpy.meshgrid(numpy.atleast_1d(p), numpy.atleast_1d(q))
-    W = numpy.zeros((len(p), len(q)), dtype=complex)
-    N = numpy.shape(rho)[0] - 1 #dimension of the (truncated) Hilbert space of rho
-    W_nm = numpy.zeros((len(p), len(q), N+1, N+1), dtype=complex) #expansion coefficients of the Wigner function
-    X = 2*(Q**2 + P**2)
-    #Compute the lower triangle of the matrix W_nm
-    for n in numpy.arange(N+1):
-        for m in numpy.arange(n+1):
-            k=m
-            alpha = float(n-m)
-            W_nm[:, :, n, m] = 1/numpy.pi * numpy.exp(-0.5*X) * (-1)**m \
-                               *(Q+1j*P)**(n-m) * numpy.sqrt( 2**(n-m)*sp.special.gamma(m+1)/sp.special.gamma(n+1) )\
-                               * sp.special.assoc_laguerre(x=X, n=k, k=alpha)     
-    #Compute the upper triangle without the diagonal
-    for m in numpy.arange(N+1):
-        for n in numpy.arange(m):
-            W_nm[:, :, n, m] = numpy.conj(W_nm[:, :, m, n])
-    
-    #Compute the Wigner function
-    for n in numpy.arange(N+1):
-        for m in numpy.arange(N+1):
-            W += W_nm[:, :, n, m] * rho[n, m]
+    #The expansion in this function uses (q+ip) instead of (q-ip), 
+    #which amounts to transposing rho
+    if method == "fft":
+        W = wignerFunctionFFT(numpy.transpose(rho), q, p)
+    else:
+        W = wignerFunctionOnGrid(numpy.transpose(rho), Q, P)
     #Normalize in L1
     dq = q[1] - q[0]
     dp = p[1] - p[0]
@@ -234,25 +401,39 @@ def WignerFuntion_GaussianState(q, p, mean_vector, covariance_matrix):
         q quadrature values, normalized to vacuum noise units.
     p : 1-D array-like of float
         p quadrature values, normalized to vacuum noise units.
-    mean_vector : 1-D array-like of float, length 2N
-        Mean vector containing the mean value of the quadratures (q_1, p_1, ..., q_N, p_N)
-    covariance_matrix : 2-D array-like of float, size 2N x 2N
-        Covariance matrix of the quadratures
+    mean_vector : 1-D array-like of float, length 2, or 2-D array-like of shape (B, 2)
+        Mean vector containing the mean value of the quadratures (q, p), or a batch of B mean vectors
+    covariance_matrix : 2-D array-like of float, size 2 x 2, or 3-D array-like of shape (B, 2, 2)
+        Covariance matrix of the quadratures, or a batch of B covariance matrices
 
     OUTPUTS
     -------
-    Wigner function, evaluated at the points specified by q and p
+    q and p meshgrid values : 2-D arrays-like of float
+    
+    wigner function : 2-D array-like of float, evaluated at the points specified by q and p.
+    If a batch of states is given, the array has shape (B, len(q), len(p))
     
     """
     P, Q = numpy.meshgrid(p, q)
-    W = numpy.zeros((len(p), len(q)))
-    for j in range(len(p)):
-        p_0 = p[j]
-        for k in range(len(q)):
-            q_0 = q[k]
-            x_0 = numpy.array([q_0, p_0])
-            W[j, k] = numpy.exp(-0.5*(x_0-mean_vector).T @ numpy.linalg.inv(covariance_matrix) @ (x_0-mean_vector))
-    W /= 2*numpy.pi*numpy.linalg.det(covariance_matrix)
+    mean_vector = numpy.real(numpy.asarray(mean_vector))
+    covariance_matrix = numpy.real(numpy.asarray(covariance_matrix))
+    is_batch = covariance_matrix.ndim == 3 or mean_vector.ndim == 2
+    #Broadcast to a batch of B states
+    mean_vector = numpy.atleast_2d(mean_vector)
+    covariance_matrix = covariance_matrix.reshape((-1, 2, 2))
+    B = max(mean_vector.shape[0], covariance_matrix.shape[0])
+    mean_vector = numpy.broadcast_to(mean_vector, (B, 2))
+    covariance_matrix = numpy.broadcast_to(covariance_matrix, (B, 2, 2))
+    #Cholesky decomposition V = L L^T: the quadratic form (x-m)^T V^-1 (x-m) is |L^-1 (x-m)|^2 
+    L = numpy.linalg.cholesky(covariance_matrix)
+    L_inverse = numpy.linalg.inv(L)
+    X = numpy.stack([Q, P], axis=-1)
+    Z = numpy.einsum("bij,bqpj->bqpi", L_inverse, X[numpy.newaxis] - mean_vector[:, numpy.newaxis, numpy.newaxis, :])
+    W = numpy.exp(-0.5*numpy.einsum("bqpi,bqpi->bqp", Z, Z))
+    #sqrt(det(V)) = prod(diag(L))
+    W /= (2*numpy.pi*numpy.prod(numpy.diagonal(L, axis1=-2, axis2=-1), axis=-1))[:, numpy.newaxis, numpy.newaxis]
+    if not is_batch:
+        W = W[0]
     return Q, P, W
 
 #Wigner function of the coherent states
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This script tests the RunningCovariance class against numpy.cov, and the spread of its
+bootstrap replicates against the analytic standard deviations of Gaussian covariance estimates.
+"""
+# In[imports]
+from Iaji.Utilities.statistics import RunningCovariance
+import numpy, time
+# In[]
+rng = numpy.random.default_rng(0)
+V = numpy.array([[2, 0, 1.2, 0], [0, 2, 0, -1.1], [1.2, 0, 1.9, 0], [0, -1.1, 0, 2.1]])
+n_samples = 200000
+x = rng.multivariate_normal([5, -3, 1, 0], V, size=n_samples)
+# In[Chunked update]
+statistics = RunningCovariance(4, n_bootstrap=200, rng=1)
+for start in range(0, n_samples, 30011):
+    statistics.Update(x[start:start+30011])
+print("chunked update - max. abs. difference from numpy.cov: %.2e"%numpy.max(numpy.abs(statistics.covariance - numpy.cov(x.T))))
+print("chunked update - max. abs. difference from numpy.mean: %.2e"%numpy.max(numpy.abs(statistics.mean - numpy.mean(x, axis=0))))
+# In[Merge]
+statistics_merged = RunningCovariance(4, n_bootstrap=200, rng=2).Update(x[:70000])\
+    .Merge(RunningCovariance(4, n_bootstrap=200, rng=3).Update(x[70000:]))
+print("merge - max. abs. difference from numpy.cov: %.2e"%numpy.max(numpy.abs(statistics_merged.covariance - numpy.cov(x.T))))
+# In[Bootstrap spread]
+#The standard deviation of the estimate of the covariance C_jk of n Gaussian samples is sqrt((V_jj*V_kk + C_jk^2)/n)
+for j, k in [(0, 0), (0, 2), (1, 3)]:
+    sigma = numpy.sqrt((V[j, j]*V[k, k] + V[j, k]**2)/n_samples)
+    print("V[%d, %d] - bootstrap std: %.5f, analytic std: %.5f"%(j, k, numpy.std(statistics.bootstrap_covariance[:, j, k]), sigma))
+# In[Small blocks]
+#A block of 1000 samples fits into a single bootstrap unit: the replicates where the unit has zero weight 
+#(a fraction exp(-1) of them) contain no samples, and their covariance is not defined
+statistics = RunningCovariance(4, n_bootstrap=1000, rng=4, bootstrap_block_size=2**12).Update(x[:1000])
+print("NaN replicates: %d (expected: about %d)"%(numpy.sum(numpy.isnan(statistics.bootstrap_covariance[:, 0, 0])), 1000*numpy.exp(-1)))
+# In[Runtime]
+y = rng.normal(size=(10**6, 4))
+for n_bootstrap in [0, 100]:
+    start_time = time.time()
+    RunningCovariance(4, n_bootstrap=n_bootstrap).Update(y)
+    print("10^6 samples, %d bootstrap replicates: %.3f s"%(n_bootstrap, time.time() - start_time))
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This module contains a simple content-addressed on-disk cache, used to store
+the results of expensive derivations (e.g., compiled symbolic expressions)
+across sessions. Objects are serialized with cloudpickle, so that dynamically
+generated functions (e.g., the output of sympy.lambdify) can be cached as well.
+"""
+# In[imports]
+import os, hashlib, tempfile
+import cloudpickle
+# In[]
+DEFAULT_CACHE_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "Iaji")
+# In[]
+def cache_key(*contents):
+    """
+    Returns a hexadecimal key that identifies the input contents.
+    The contents are identified through their string representation, so they should
+    be made of strings, numbers and (nested) lists, tuples or dictionaries thereof.
+    """
+    return hashlib.sha256(repr(contents).encode("utf-8")).hexdigest()
+#--------------------------------
+def cache_path(key, directory=None):
+    """
+    Returns the path of the file associated to the input key
+    """
+    if directory is None:
+        directory = DEFAULT_CACHE_DIRECTORY
+    return os.path.join(directory, "%s.pkl"%key)
+#--------------------------------
+def load(key, directory=None):
+    """
+    Returns the object stored under the input key, or None if it is not in the cache.
+    Unreadable cache files are treated as missing.
+    """
+    path = cache_path(key, directory)
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, "rb") as file:
+            return cloudpickle.load(file)
+    except Exception:
+        return None
+#--------------------------------
+def save(key, x, directory=None):
+    """
+    Stores the input object under the input key. The file is written atomically,
+    so that concurrent sessions never read a partially written file.
+    """
+    path = cache_path(key, directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, "wb") as file:
+            cloudpickle.dump(x, file)
+        os.replace(temporary_path, path)
+    except Exception:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+    return path
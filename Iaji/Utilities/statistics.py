@@ -18,3 +18,267 @@ def PDF_histogram(x, x_range, n_bins):
     PDF_values = PDF_bin_edges+half_bin #center the bin values
     PDF_values = PDF_values[1:] #discard the first bin value
     return PDF_values, PDF_histogram
+# In[]
+class DiscreteSampler:
+    """
+    This class samples a discrete probability distribution with the alias method
+    (Walker, Vose). The alias table is built once, with O(K) operations for K outcomes, 
+    and any number of samples is then drawn with a few vectorized numpy calls, 
+    at a constant cost per sample.
+    """
+    # ----------------------------------------------------------
+    def __init__(self, values, probabilities):
+        """
+        INPUTS
+        ----------
+            values : array-like of shape (K, ...)
+                outcome values. The first axis labels the outcomes.
+            probabilities : 1D array-like of shape (K,)
+                outcome probabilities. They are normalized to 1.
+        """
+        probabilities = numpy.abs(numpy.asarray(probabilities, dtype=float))
+        assert probabilities.ndim == 1 and len(probabilities) == len(values), \
+            "Expected one probability for each of the %d outcome values"%len(values)
+        assert numpy.sum(probabilities) > 0, \
+            "The outcome probabilities must not all be zero"
+        self._values = numpy.asarray(values)
+        self._probabilities = probabilities/numpy.sum(probabilities)
+        self._threshold, self._alias = self._AliasTable(self._probabilities)
+    # ----------------------------------------------------------
+    @property
+    def values(self):
+        return self._values
+
+    @values.deleter
+    def values(self):
+        del self._values
+    # ----------------------------------------------------------
+    @property
+    def probabilities(self):
+        return self._probabilities
+
+    @probabilities.deleter
+    def probabilities(self):
+        del self._probabilities
+    # ----------------------------------------------------------
+    def __len__(self):
+        return len(self._probabilities)
+    # ----------------------------------------------------------
+    @staticmethod
+    def _AliasTable(probabilities):
+        """
+        Builds the alias table of the input (normalized) probabilities
+        
+        OUTPUTS
+        -----------
+            threshold : 1D numpy.ndarray of float
+                probability of keeping the drawn column
+            alias : 1D numpy.ndarray of int
+                outcome index returned when the drawn column is not kept
+        """
+        K = len(probabilities)
+        threshold = probabilities*K
+        alias = numpy.arange(K)
+        small = list(numpy.where(threshold < 1)[0])
+        large = list(numpy.where(threshold >= 1)[0])
+        while len(small) > 0 and len(large) > 0:
+            s, l = small.pop(), large[-1]
+            alias[s] = l
+            threshold[l] -= 1 - threshold[s]
+            if threshold[l] < 1:
+                small.append(large.pop())
+        #Residual columns are full, up to rounding errors
+        threshold[small + large] = 1
+        return threshold, alias
+    # ----------------------------------------------------------
+    def Sample(self, ntimes=1, rng=None, return_indices=False):
+        """
+        Draws 'ntimes' independent outcomes
+        
+        INPUTS
+        ----------
+            ntimes : int
+                number of samples
+            rng : None, int or numpy.random.Generator
+                random number generator or seed. If None, the global numpy 
+                random state is used.
+            return_indices : bool
+                If True, the outcome indices are returned as well
+                
+        OUTPUTS
+        -----------
+            outcomes : numpy.ndarray of shape (ntimes, ...)
+            indices : 1D numpy.ndarray of int (only if return_indices is True)
+        """
+        rng = numpy.random if rng is None else numpy.random.default_rng(rng)
+        K = len(self)
+        columns = numpy.minimum((rng.random(ntimes)*K).astype(int), K-1)
+        keep = rng.random(ntimes) < self._threshold[columns]
+        indices = numpy.where(keep, columns, self._alias[columns])
+        if return_indices:
+            return self._values[indices], indices
+        return self._values[indices]
+    # ----------------------------------------------------------
+    def Probability(self, selection):
+        """
+        Returns the total probability of the selected outcomes
+        
+        INPUTS
+        ----------
+            selection : 1D array-like of bool or int
+                mask or indices of the selected outcomes
+        """
+        return numpy.sum(self._probabilities[selection])
+# In[]
+class RunningCovariance:
+    """
+    This class estimates the mean and the covariance matrix of d random variables
+    in a single pass over a stream of samples, in bounded memory. Blocks of samples
+    are merged into the running estimate with the pairwise co-moment update
+    (Welford, Chan et al.), which is numerically stable for long streams.
+    
+    Optionally, the class also keeps n_bootstrap Poisson bootstrap replicates of the
+    estimate. The stream is divided into consecutive units of bootstrap_block_size samples,
+    and each unit enters each replicate with a Poisson(1)-distributed weight, so that the
+    bootstrap neither stores nor resamples the data, and its cost does not depend on the 
+    number of samples per unit.
+    """
+    # ----------------------------------------------------------
+    def __init__(self, n_variables, n_bootstrap=0, rng=None, bootstrap_block_size=2**12):
+        """
+        INPUTS
+        ----------
+            n_variables : int
+                number of random variables d
+            n_bootstrap : int
+                number of Poisson bootstrap replicates
+            rng : None, int or numpy.random.Generator
+                random number generator (or seed) of the bootstrap weights
+            bootstrap_block_size : int
+                number of consecutive samples that share the same bootstrap weights. 
+                It should be much smaller than the total number of samples.
+        """
+        self.n_variables = n_variables
+        self.n_bootstrap = n_bootstrap
+        self.bootstrap_block_size = bootstrap_block_size
+        self._rng = numpy.random.default_rng(rng)
+        self._n = 0.
+        self._mean = numpy.zeros(n_variables)
+        self._comoment = numpy.zeros((n_variables, n_variables))
+        if n_bootstrap > 0:
+            self._bootstrap_n = numpy.zeros(n_bootstrap)
+            self._bootstrap_mean = numpy.zeros((n_bootstrap, n_variables))
+            self._bootstrap_comoment = numpy.zeros((n_bootstrap, n_variables, n_variables))
+            self._NewBootstrapBlock()
+    # ----------------------------------------------------------
+    @property
+    def n(self):
+        return self._n
+
+    @n.deleter
+    def n(self):
+        del self._n
+    # ----------------------------------------------------------
+    @property
+    def mean(self):
+        return self._mean
+
+    @mean.deleter
+    def mean(self):
+        del self._mean
+    # ----------------------------------------------------------
+    @property
+    def covariance(self):
+        """
+        Unbiased estimate of the covariance matrix
+        """
+        return self._comoment/(self._n-1)
+    # ----------------------------------------------------------
+    @property
+    def bootstrap_covariance(self):
+        """
+        Covariance matrices of the bootstrap replicates, as a numpy.ndarray of shape (n_bootstrap, d, d).
+        The replicates that contain less than two samples (e.g., all the weights are zero) are numpy.nan.
+        """
+        n, _, comoment = self._Merge(self._bootstrap_n, self._bootstrap_mean, self._bootstrap_comoment, \
+                                     *self._WeightedBlock(self._block, self._block_weights))
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            covariance = comoment/(n-1)[:, numpy.newaxis, numpy.newaxis]
+        covariance[n < 2] = numpy.nan
+        return covariance
+    # ----------------------------------------------------------
+    @staticmethod
+    def _Merge(n_a, mean_a, comoment_a, n_b, mean_b, comoment_b):
+        """
+        Merges two (batches of) partial estimates, given their sample sizes, means and co-moments
+        """
+        n = n_a + n_b
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            fraction_b = numpy.where(n > 0, n_b/n, 0)
+        delta = mean_b - mean_a
+        mean = mean_a + delta*fraction_b[..., numpy.newaxis]
+        comoment = comoment_a + comoment_b \
+            + (n_a*fraction_b)[..., numpy.newaxis, numpy.newaxis]*delta[..., :, numpy.newaxis]*delta[..., numpy.newaxis, :]
+        return n, mean, comoment
+    # ----------------------------------------------------------
+    @staticmethod
+    def _WeightedBlock(block, weights):
+        """
+        Returns the sample sizes, means and co-moments of a unit of samples, 
+        weighted by the bootstrap weights of each replicate
+        """
+        return weights*block._n, numpy.broadcast_to(block._mean, (len(weights), block.n_variables)), \
+            weights[:, numpy.newaxis, numpy.newaxis]*block._comoment
+    # ----------------------------------------------------------
+    def _NewBootstrapBlock(self):
+        self._block = RunningCovariance(self.n_variables)
+        self._block_weights = self._rng.poisson(1, size=self.n_bootstrap).astype(float)
+    # ----------------------------------------------------------
+    def _MergeBootstrapBlock(self, block, weights):
+        self._bootstrap_n, self._bootstrap_mean, self._bootstrap_comoment = \
+            self._Merge(self._bootstrap_n, self._bootstrap_mean, self._bootstrap_comoment, \
+                        *self._WeightedBlock(block, weights))
+    # ----------------------------------------------------------
+    def Update(self, samples):
+        """
+        Merges a block of samples into the running estimate
+        
+        INPUTS
+        ----------
+            samples : 2D array-like of shape (m, d)
+                one sample of the d variables per row
+        """
+        samples = numpy.asarray(samples, dtype=float).reshape((-1, self.n_variables))
+        m = samples.shape[0]
+        if m == 0:
+            return self
+        mean = numpy.mean(samples, axis=0)
+        centered = samples - mean
+        self._n, self._mean, self._comoment = self._Merge(numpy.float64(self._n), self._mean, self._comoment, \
+                                                          numpy.float64(m), mean, centered.T @ centered)
+        if self.n_bootstrap > 0:
+            start = 0
+            while start < m:
+                step = int(min(m - start, self.bootstrap_block_size - self._block.n))
+                self._block.Update(samples[start:start+step])
+                start += step
+                if self._block.n >= self.bootstrap_block_size:
+                    self._MergeBootstrapBlock(self._block, self._block_weights)
+                    self._NewBootstrapBlock()
+        return self
+    # ----------------------------------------------------------
+    def Merge(self, other):
+        """
+        Merges another RunningCovariance, estimated from different samples of the same variables,
+        into this one (e.g., partial estimates computed in parallel)
+        """
+        assert other.n_variables == self.n_variables and other.n_bootstrap == self.n_bootstrap, \
+            "Only estimates with the same number of variables and bootstrap replicates can be merged"
+        self._n, self._mean, self._comoment = self._Merge(numpy.float64(self._n), self._mean, self._comoment, \
+                                                          numpy.float64(other._n), other._mean, other._comoment)
+        if self.n_bootstrap > 0:
+            self._bootstrap_n, self._bootstrap_mean, self._bootstrap_comoment = \
+                self._Merge(self._bootstrap_n, self._bootstrap_mean, self._bootstrap_comoment, \
+                            other._bootstrap_n, other._bootstrap_mean, other._bootstrap_comoment)
+            self._MergeBootstrapBlock(other._block, other._block_weights)
+        return self